@@ -1,13 +1,94 @@
 import json
-import yaml
 import os
 from datetime import datetime
 import logging
-import copy
 import sys
+import time
+import argparse
+from itertools import islice
+from collections import Counter, OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from bag_store import BagStore, TriggerTimeLookup, close_bag_info, parse_trigger_time
+from case_builder import CaseBuilder, suite_header
+from case_cache import CaseCache
+from case_watcher import DEBOUNCE_SECONDS, POLL_INTERVAL, WatchSession
+from compact_suite import CompactSuiteWriter, load_suite, save_suite
+from hash_bag_files import load_bag_file_index
+from instrumentation import Metrics, add_arguments as add_metrics_arguments
+from log_setup import (CaseLogSampler, configure_worker, console_enabled, log_file_path, setup_logging,
+                       add_arguments as add_log_arguments)
+from shard_suite import (STRATEGIES as SHARD_STRATEGIES, latest_suite, load_bag_seconds, shard_directory, shard_suite,
+                         shard_suite_file)
+from suite_delta import DELTA_FORMATS, delta_path, write_suite_delta
+from suite_writer import StreamingSuiteWriter
+from validate_cases import DEFAULT_WORKERS as VALIDATE_WORKERS, CaseSetValidator, format_report, save_report
+from yaml_header import scan_yaml_header
+
+# extend 文件的解析结果，字段均为 tuple，topic_remaps 中每项为 (from, to)
+ExtendInfo = namedtuple('ExtendInfo', ['output_topics', 'topic_remaps', 'forward_topics'])
+
+# 使用 bag 数据库时，每读入这么多个用例头查询一次其中的 bag_md5
+BAG_PREFETCH_CASES = 500
+
+# 子进程中使用的 CaseProcessor 实例，由 _init_worker 在进程池启动时设置
+_WORKER_PROCESSOR = None
+
+def _init_worker(processor):
+    global _WORKER_PROCESSOR
+    _WORKER_PROCESSOR = processor
+    configure_worker()
+
+def _load_case_in_worker(yaml_file):
+    # 子进程中的异常不直接抛出，而是带回主进程统一汇总
+    start = time.perf_counter()
+    try:
+        case_data, error = _WORKER_PROCESSOR.load_case(yaml_file), None
+    except Exception as e:
+        case_data, error = None, f"{type(e).__name__}: {e}"
+    # 同时带回本进程解析缓存的累计计数和本用例的耗时，供主进程汇总
+    return case_data, error, (os.getpid(), _WORKER_PROCESSOR.parse_cache.stats()), time.perf_counter() - start
+
+class _ParseCache:
+    """extend / topic_list 文件解析结果的 LRU 缓存
+
+    以 (真实路径, mtime, size) 为键，文件被修改后自动失效。缓存的值只包含 tuple 等不可变对象，
+    多个用例共享同一份解析结果也不会互相影响。
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.counts = {}
+
+    def _count(self, kind, name):
+        counter = self.counts.setdefault(kind, {"hits": 0, "misses": 0})
+        counter[name] += 1
+
+    def get(self, kind, path, parse):
+        try:
+            real_path = os.path.realpath(path)
+            st = os.stat(real_path)
+        except OSError:
+            return None
+        key = (kind, real_path, st.st_mtime_ns, st.st_size)
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self._count(kind, "hits")
+            return self.entries[key]
+        self._count(kind, "misses")
+        value = parse(real_path)
+        self.entries[key] = value
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return value
+
+    def stats(self):
+        return {kind: dict(counter) for kind, counter in self.counts.items()}
 
 class CaseProcessor:
-    def __init__(self, config_path='../config/test_case_template.json'):
+    def __init__(self, config_path='../config/test_case_template.json', jobs=1, use_cache=False,
+                 cache_max_entries=20000, stream=False, bag_db=None, metrics=None, log_format='text', log_sample=1,
+                 shards=0, shard_strategy='lpt', compact=False, compress=False, delta=None, delta_baseline=None):
         # 获取脚本所在的目录
         self.script_dir = os.path.dirname(os.path.abspath(__file__))
         # 获取 BenchICT_Scripts 目录
@@ -28,6 +109,8 @@ class CaseProcessor:
         
         self.paths = self.config['paths']
         self.test_case_template = self.config['test_case_template']
+        # 启动时编译用例模板，模板中有无法填写的占位符时直接报错
+        self.case_builder = CaseBuilder(self.test_case_template['test_suite_info']['test_case_infos'][0])
         
         # 调整所有路径
         for key, path in self.paths.items():
@@ -41,95 +124,116 @@ class CaseProcessor:
                 # 对于其他路径，假设它们是相对于 BenchICT_Scripts 目录的
                 self.paths[key] = os.path.normpath(os.path.join(self.bench_ict_dir, path))
         
+        # 并行解析用例的进程数，<= 0 表示使用全部 CPU
+        self.jobs = jobs if jobs > 0 else (os.cpu_count() or 1)
+        # 增量生成缓存，输入文件未变化的用例直接复用上次的结果
+        self.use_cache = use_cache
+        self.cache_max_entries = cache_max_entries
+        self.CACHE_FILE = os.path.join(self.paths['OUTPUT_DIR'], '.case_cache.json')
+        # 可选的 SQLite bag 注册表，未指定时读取 BAG_JSON_PATH
+        self.bag_db = bag_db or self.paths.get('BAG_DB_PATH')
+        # 流式写出生成的 JSON，内存占用不随用例数增长
+        self.stream = stream
+        # 多个用例共享的 extend / topic_list 文件只解析一次
+        self.parse_cache = _ParseCache()
+        # 生成后按估算耗时拆分为多个分片，见 shard_suite.py；本地 bag 的位置来自 hash_bag_files.py 的缓存
+        self.shards = shards
+        self.shard_strategy = shard_strategy
+        self.BAG_INDEX_FILE = os.path.join(self.paths['OUTPUT_DIR'], "bag_md5_cache.json")
+        # 阶段耗时与逐用例延迟记录，见 instrumentation.py
+        self.metrics = metrics or Metrics('BenchICT_Config')
+
         self.TIMESTAMP = datetime.now().strftime("%Y%m%d_%H%M%S")
-        self.OUTPUT_JSON = os.path.join(self.paths['OUTPUT_DIR'], f"generated_json_{self.TIMESTAMP}.json")
-        self.LOG_FILE = os.path.join(self.paths['LOG_DIR'], f"BenchICT_Config_{self.TIMESTAMP}.txt")
+        # 紧凑格式只保存一次用例模板和每个用例的差异，见 compact_suite.py；compress 时输出 gzip 文件
+        self.compact = compact
+        self.compress = compress
+        suffix = (".compact.json" if compact else ".json") + (".gz" if compress else "")
+        self.OUTPUT_JSON = os.path.join(self.paths['OUTPUT_DIR'], f"generated_json_{self.TIMESTAMP}{suffix}")
+        # 生成后与上一次的套件（或 delta_baseline）比较，在 OUTPUT_JSON 旁写出差异文件，见 suite_delta.py
+        self.delta = delta
+        self.delta_baseline = delta_baseline
+        self.log_format = log_format
+        self.LOG_FILE = log_file_path(os.path.join(self.paths['LOG_DIR'], f"BenchICT_Config_{self.TIMESTAMP}.txt"), log_format)
+        # 逐用例的 INFO 日志按 log_sample 采样
+        self.case_log = CaseLogSampler(log_sample)
         
         self._setup_logging()
         self._setup_output_dir()
 
     def _setup_logging(self):
-        os.makedirs(os.path.dirname(self.LOG_FILE), exist_ok=True)
-        logging.basicConfig(filename=self.LOG_FILE, level=logging.INFO,
-                            format='%(asctime)s - %(levelname)s - %(message)s')
-
-        # 添加控制台处理器
-        console = logging.StreamHandler()
-        console.setLevel(logging.INFO)
-        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-        console.setFormatter(formatter)
-        logging.getLogger('').addHandler(console)
+        # 日志同时输出到终端，格式化和写入在后台线程中完成
+        setup_logging(self.LOG_FILE, self.log_format, console=True)
 
     def _setup_output_dir(self):
         os.makedirs(os.path.dirname(self.OUTPUT_JSON), exist_ok=True)
 
     def load_bag_info(self):
         try:
+            if self.bag_db:
+                # 使用数据库时只按需查询用到的 md5，不读取整个注册表
+                logging.info(f"Using bag registry database {self.bag_db}")
+                return TriggerTimeLookup(BagStore(self.bag_db))
             with open(self.paths['BAG_JSON_PATH'], 'r') as file:
                 data = json.load(file)
                 bags = data.get('bags', [])
                 bag_info = {}
                 for bag in bags:
-                    md5 = bag['md5']
-                    trigger_time = bag['trigger_time']
-                    if trigger_time != "None":
-                        bag_info[md5] = float(trigger_time)
-                    else:
-                        bag_info[md5] = None
+                    bag_info[bag['md5']] = parse_trigger_time(bag['trigger_time'])
                 return bag_info
         except Exception as e:
             error_message = f"Error reading bag.json: {str(e)}"
             logging.error(error_message)
-            print(error_message)  # 在终端显示错误信息
             raise
 
+    @staticmethod
+    def _parse_topic_list(topic_list_file):
+        with open(topic_list_file, 'r') as file:
+            return tuple(line.split()[1] for line in file if line.startswith('topic'))
+
+    @staticmethod
+    def _parse_extend_file(extend_file):
+        output_topics, topic_remaps, forward_topics = [], [], []
+        with open(extend_file, 'r') as file:
+            for line in file:
+                if line.startswith('send'):
+                    output_topics.append(line.split()[1])
+                elif line.startswith('forward'):
+                    topic = line.split()[1]
+                    topic_remaps.append((topic, f"/mfl_fake{topic}"))
+                    forward_topics.append(topic)
+        return ExtendInfo(tuple(output_topics), tuple(topic_remaps), tuple(forward_topics))
+
     def process_topic_list(self, topic_list_file):
-        topics = []
-        if os.path.exists(topic_list_file):
-            with open(topic_list_file, 'r') as file:
-                topics = [line.split()[1] for line in file if line.startswith('topic')]
-        else:
+        topics = self.parse_cache.get('topic_list', topic_list_file, self._parse_topic_list)
+        if topics is None:
             warning_message = f"Warning: topic_list file {topic_list_file} does not exist."
             logging.warning(warning_message)
-            print(warning_message)  # 在终端显示警告信息
+            topics = ()
         return topics
 
     def process_extend_file(self, extend_file):
-        output_topics, topic_remaps, forward_topics = [], [], []
-        
-        if os.path.exists(extend_file):
-            with open(extend_file, 'r') as file:
-                for line in file:
-                    if line.startswith('send'):
-                        output_topics.append(line.split()[1])
-                    elif line.startswith('forward'):
-                        topic = line.split()[1]
-                        topic_remaps.append({"from": topic, "to": f"/mfl_fake{topic}"})
-                        forward_topics.append(topic)
-        else:
+        extend_info = self.parse_cache.get('extend', extend_file, self._parse_extend_file)
+        if extend_info is None:
             warning_message = f"Warning: extend file {extend_file} does not exist."
             logging.warning(warning_message)
-            print(warning_message)  # 在终端显示警告信息
-        
-        return {
-            "output_topics": output_topics,
-            "topic_remaps": topic_remaps,
-            "forward_topics": forward_topics
-        }
+            extend_info = ExtendInfo((), (), ())
+        return extend_info
 
-    def process_yaml(self, yaml_file, bag_info):
+    def load_case(self, yaml_file):
+        """读取用例 YAML 及其 extend / topic_list 文件，结果只依赖输入文件，可在子进程中执行"""
         case_code = os.path.splitext(os.path.basename(yaml_file))[0]
-        logging.info(f"Processing file: {yaml_file}")
-        logging.info(f"Case code: {case_code}")
+        self.case_log.info(f"Processing file: {yaml_file}", case=case_code)
+        self.case_log.info(f"Case code: {case_code}", case=case_code)
 
         if not os.path.exists(yaml_file):
             warning_message = f"Warning: {yaml_file} does not exist. Skipping."
             logging.warning(warning_message)
-            print(warning_message)  # 在终端显示警告信息
             return None
 
-        with open(yaml_file, 'r') as file:
-            yaml_data = yaml.safe_load(file)
+        # 只读取需要的四个顶层键，复杂写法才交给完整的 YAML 解析器
+        with self.metrics.phase('yaml_header'):
+            yaml_data, yaml_parser = scan_yaml_header(yaml_file)
+        logging.debug(f"Read header of {yaml_file} via {yaml_parser}")
 
         mfl_case_path = yaml_data.get('mfl_case_path')
         mfl_extend_path = yaml_data.get('mfl_extend_path')
@@ -139,13 +243,40 @@ class CaseProcessor:
         if not all([mfl_case_path, mfl_extend_path, bag_md5, play_topic_list]):
             error_message = f"Error: Unable to extract required information from {yaml_file}."
             logging.error(error_message)
-            print(error_message)  # 在终端显示错误信息
             raise ValueError(error_message)
 
+        extend_file = os.path.join(self.paths['BASE_PATH'], mfl_extend_path)
+        topic_list_file = os.path.join(self.paths['BASE_PATH'], play_topic_list)
+
+        with self.metrics.phase('extend_file'):
+            extend_info = self.process_extend_file(extend_file)
+        with self.metrics.phase('topic_list'):
+            input_topics = self.process_topic_list(topic_list_file)
+
+        return {
+            "case_code": case_code,
+            "mfl_case_path": mfl_case_path,
+            "mfl_extend_path": mfl_extend_path,
+            "bag_md5": bag_md5,
+            "yaml_parser": yaml_parser,
+            "extend_file": extend_file,
+            "topic_list_file": topic_list_file,
+            "extend_info": extend_info,
+            "input_topics": input_topics
+        }
+
+    def build_test_case_info(self, case_data, bag_info):
+        """根据 load_case 的结果和 bag 信息生成 test_case_info"""
+        case_code = case_data['case_code']
+        mfl_case_path = case_data['mfl_case_path']
+        mfl_extend_path = case_data['mfl_extend_path']
+        bag_md5 = case_data['bag_md5']
+        extend_info = case_data['extend_info']
+        input_topics = case_data['input_topics']
+
         if bag_md5 not in bag_info:
             error_message = f"Error: bag_md5 {bag_md5} not found in bag.json for case {case_code}."
             logging.error(error_message)
-            print(error_message)  # 在终端显示错误信息
             raise ValueError(error_message)
 
         trigger_time = bag_info[bag_md5]
@@ -154,71 +285,353 @@ class CaseProcessor:
             logging.error(error_message)
             raise ValueError(error_message)
 
-        extend_file = os.path.join(self.paths['BASE_PATH'], mfl_extend_path)
-        topic_list_file = os.path.join(self.paths['BASE_PATH'], play_topic_list)
+        with self.metrics.phase('fill_template'):
+            # 与集合运算 (input | forward | 固定 topic) - output | {load_mfl_case, clock} 结果相同，
+            # 但用 dict.fromkeys 去重，topic 按首次出现的顺序排列，输出不随 PYTHONHASHSEED 变化
+            output_topic_list = list(dict.fromkeys(list(extend_info.output_topics) + ["/simulator/result"]))
+            excluded = set(output_topic_list)
+            input_topic_list = [topic for topic in dict.fromkeys(list(input_topics) + list(extend_info.forward_topics) +
+                                                                 ["/simulator/load_mfl_case", "/clock", "/mla/egopose"])
+                                if topic not in excluded]
+            input_topic_list = list(dict.fromkeys(input_topic_list + ["/simulator/load_mfl_case", "/clock"]))
+            # 解析结果在用例间共享，这里生成新的 list / dict 写入输出
+            test_case_info = self.case_builder.build(
+                CASE_CODE=case_code,
+                BAG_MD5=[bag_md5],
+                TOPIC_REMAPS=[{"from": source, "to": target} for source, target in extend_info.topic_remaps],
+                INPUT_TOPIC_LIST=input_topic_list,
+                OUTPUT_TOPIC_LIST=output_topic_list,
+                MFL_CASE_PATH=f"cases/{mfl_case_path}" if not mfl_case_path.startswith("cases/") else mfl_case_path,
+                MFL_EXTEND_PATH=f"cases/{mfl_extend_path}" if not mfl_extend_path.startswith("cases/") else mfl_extend_path,
+                TRIGGER_TIME=trigger_time)
 
-        extend_info = self.process_extend_file(extend_file)
-        input_topics = self.process_topic_list(topic_list_file)
-
-        test_case_info = copy.deepcopy(self.test_case_template['test_suite_info']['test_case_infos'][0])
-        test_case_info['case_code'] = case_code
-        test_case_info['bag_urls'] = [bag_md5]
-        test_case_info['config']['topic_remaps'] = extend_info['topic_remaps']
-        test_case_info['config']['function_simulator']['input_topic_list'] = list(set(input_topics + extend_info["forward_topics"] + ["/simulator/load_mfl_case", "/clock", "/mla/egopose"]) - 
-                                                                                  set(extend_info["output_topics"] + ["/simulator/result"]) |
-                                                                                  set(["/simulator/load_mfl_case", "/clock"]))
-        test_case_info['config']['function_simulator']['output_topic_list'] = list(set(extend_info["output_topics"] + ["/simulator/result"]))
-        test_case_info['mfl_function_spec']['spec_names'][0]['path'] = f"cases/{mfl_case_path}" if not mfl_case_path.startswith("cases/") else mfl_case_path
-        test_case_info['mfl_function_spec']['spec_names'][0]['extend_path'] = f"cases/{mfl_extend_path}" if not mfl_extend_path.startswith("cases/") else mfl_extend_path
-        test_case_info['mfl_function_spec']['spec_names'][0]['trigger_time'] = trigger_time
-
-        logging.info(f"Added information for {case_code} to output JSON")
+        self.case_log.info(f"Added information for {case_code} to output JSON", case=case_code)
         return test_case_info
 
+    def process_yaml(self, yaml_file, bag_info):
+        case_data = self.load_case(yaml_file)
+        if case_data is None:
+            return None
+        return self.build_test_case_info(case_data, bag_info)
+
+    def iter_case_data(self, yaml_files):
+        """按 case_list 顺序产出 (yaml_file, case_data, error)
+
+        串行模式下异常直接抛出；并行模式下 load_case 在进程池中执行，
+        结果仍按输入顺序返回，单个用例的异常以 error 字符串带回。
+        """
+        yaml_parsers = Counter()
+        if self.jobs <= 1:
+            for yaml_file in yaml_files:
+                start = time.perf_counter()
+                with self.metrics.phase('load_case'):
+                    case_data = self.load_case(yaml_file)
+                self.metrics.observe('load_case', os.path.splitext(os.path.basename(yaml_file))[0], time.perf_counter() - start)
+                if case_data is not None:
+                    yaml_parsers[case_data['yaml_parser']] += 1
+                yield yaml_file, case_data, None
+            self._log_load_stats([self.parse_cache.stats()], yaml_parsers)
+            return
+
+        logging.info(f"Loading {len(yaml_files)} cases with {self.jobs} worker processes")
+        chunksize = max(1, len(yaml_files) // (self.jobs * 4))
+        with ProcessPoolExecutor(max_workers=self.jobs, initializer=_init_worker, initargs=(self,)) as executor:
+            results = executor.map(_load_case_in_worker, yaml_files, chunksize=chunksize)
+            worker_stats = {}
+            for yaml_file, (case_data, error, (pid, stats), seconds) in zip(yaml_files, results):
+                worker_stats[pid] = stats
+                self.metrics.observe('load_case', os.path.splitext(os.path.basename(yaml_file))[0], seconds)
+                if case_data is not None:
+                    yaml_parsers[case_data['yaml_parser']] += 1
+                yield yaml_file, case_data, error
+        self._log_load_stats(worker_stats.values(), yaml_parsers)
+
+    @staticmethod
+    def _log_load_stats(stats_list, yaml_parsers):
+        if yaml_parsers:
+            counts = ", ".join(f"{count} via {method}" for method, count in sorted(yaml_parsers.items()))
+            logging.info(f"YAML headers read: {counts}")
+        totals = {}
+        for stats in stats_list:
+            for kind, counter in stats.items():
+                total = totals.setdefault(kind, {"hits": 0, "misses": 0})
+                total["hits"] += counter["hits"]
+                total["misses"] += counter["misses"]
+        for kind, total in sorted(totals.items()):
+            logging.info(f"Parse cache ({kind}): {total['hits']} hits, {total['misses']} misses")
+
+    @staticmethod
+    def _prefetch_bags(loaded, bag_info):
+        """原样产出 iter_case_data 的结果；bag_info 为 TriggerTimeLookup 时每读入一批用例，
+        先一次查询这批用例的 bag_md5，而不是生成每个用例时各查询一次"""
+        if not isinstance(bag_info, TriggerTimeLookup):
+            yield from loaded
+            return
+        while True:
+            batch = list(islice(loaded, BAG_PREFETCH_CASES))
+            if not batch:
+                return
+            bag_info.prefetch({case_data['bag_md5'] for _, case_data, _ in batch if case_data is not None})
+            yield from batch
+
+    def iter_test_case_infos(self, yaml_files, bag_info, cache=None, errors=None):
+        """按 case_list 顺序逐个产出 test_case_info
+
+        启用缓存时先查缓存，只有未命中的用例才交给 iter_case_data 解析。
+        传入 errors 列表时，并行模式下失败的用例记录为 (yaml_file, error) 后跳过。
+        """
+        remaining = Counter(yaml_files)
+        cached = {}
+        if cache is not None:
+            with self.metrics.phase('cache_lookup'):
+                if isinstance(bag_info, TriggerTimeLookup):
+                    bag_info.prefetch(cache.entries[yaml_file]['bag_md5'] for yaml_file in remaining
+                                      if yaml_file in cache.entries)
+                for yaml_file in remaining:
+                    cached_info = cache.lookup(yaml_file, bag_info)
+                    if cached_info is not None:
+                        cached[yaml_file] = cached_info
+            self.metrics.count('cache_hits', len(cached))
+        pending = [yaml_file for yaml_file in remaining if yaml_file not in cached]
+        loaded = self._prefetch_bags(self.iter_case_data(pending), bag_info)
+        # 同一个 YAML 在 case_list 中出现多次时，保留结果给后面的重复项使用
+        repeated = {}
+
+        for yaml_file in yaml_files:
+            remaining[yaml_file] -= 1
+            if yaml_file in cached:
+                test_case_info = cached[yaml_file]
+            elif yaml_file in repeated:
+                test_case_info = repeated[yaml_file]
+            else:
+                _, case_data, error = next(loaded)
+                test_case_info = None
+                if error is None and case_data is not None:
+                    try:
+                        start = time.perf_counter()
+                        with self.metrics.phase('build_test_case_info'):
+                            test_case_info = self.build_test_case_info(case_data, bag_info)
+                        self.metrics.observe('build_test_case_info', case_data['case_code'], time.perf_counter() - start)
+                        if cache is not None:
+                            cache.store(yaml_file, case_data, bag_info, test_case_info)
+                    except ValueError as e:
+                        # 串行模式保持遇错即停；并行模式收集全部错误后统一报告
+                        if self.jobs <= 1 or errors is None:
+                            raise
+                        error = f"{type(e).__name__}: {e}"
+                if error is not None:
+                    if errors is None:
+                        raise ValueError(error)
+                    errors.append((yaml_file, error))
+                if remaining[yaml_file] > 0:
+                    repeated[yaml_file] = test_case_info
+            if test_case_info is not None:
+                yield test_case_info
+
+        # 让 iter_case_data 正常结束，关闭进程池并输出解析缓存统计
+        for _ in loaded:
+            pass
+
+    @staticmethod
+    def _raise_case_errors(errors, case_count):
+        if errors:
+            for yaml_file, error in errors:
+                logging.error(f"Failed case {yaml_file}: {error}")
+            raise ValueError(f"{len(errors)} of {case_count} cases failed, see the log above for details")
+
+    def _case_template(self):
+        return self.test_case_template['test_suite_info']['test_case_infos'][0]
+
+    def _open_writer(self, output_json):
+        if self.compact:
+            return CompactSuiteWriter(self.OUTPUT_JSON, output_json, self._case_template())
+        return StreamingSuiteWriter(self.OUTPUT_JSON, output_json)
+
+    def shard_output(self, output_json):
+        """把生成的套件拆分到 <OUTPUT_JSON 去掉扩展名>_shards 目录；流式输出时用例不在内存中，从输出文件读取"""
+        bag_files = load_bag_file_index(self.BAG_INDEX_FILE)
+        if self.stream:
+            return shard_suite_file(self.OUTPUT_JSON, self.shards, bag_files, self.shard_strategy)
+        cases = output_json['test_suite_info']['test_case_infos']
+        durations = load_bag_seconds(bag_files, {md5 for case in cases for md5 in case['bag_urls']})
+        output_dir = shard_directory(self.OUTPUT_JSON)
+        return shard_suite(output_json, output_dir, self.shards, durations, self.shard_strategy, self.OUTPUT_JSON)
+
+    def write_delta(self, output_json):
+        """与 OUTPUT_DIR 中上一次生成的套件（或 delta_baseline）比较并写出差异；流式输出时从输出文件读取用例"""
+        try:
+            baseline_path = self.delta_baseline or latest_suite(self.paths['OUTPUT_DIR'], exclude=self.OUTPUT_JSON)
+        except FileNotFoundError:
+            logging.info("No previous generated suite in OUTPUT_DIR, delta output skipped")
+            return None
+        baseline = load_suite(baseline_path)
+        target = load_suite(self.OUTPUT_JSON) if self.stream else output_json
+        return write_suite_delta(baseline, target, delta_path(self.OUTPUT_JSON, self.delta), self.delta, baseline_path)
+
+    def watch(self, debounce=DEBOUNCE_SECONDS, polling=False, interval=POLL_INTERVAL):
+        """--watch：常驻运行，输入文件变化时只重新生成受影响的用例并原子重写 OUTPUT_JSON，见 case_watcher.py"""
+        logging.info("Watch mode started")
+        WatchSession(self, debounce, polling, interval).run()
+
+    def validate(self):
+        """--validate：一次检查整个用例集并输出报告，不生成测试配置；有 error 级别的问题时返回 False"""
+        logging.info("Validating case set")
+        with self.metrics.phase('load_bag_info', io=True):
+            bag_info = self.load_bag_info()
+        try:
+            with self.metrics.phase('read_case_list', io=True):
+                with open(self.paths['CASE_LIST_JSON'], 'r') as file:
+                    case_list = json.load(file)['case_list']
+            validator = CaseSetValidator(self, self.jobs if self.jobs > 1 else VALIDATE_WORKERS)
+            with self.metrics.phase('validate', io=True):
+                report = validator.validate(case_list, bag_info)
+        finally:
+            close_bag_info(bag_info)
+        lines = format_report(report)
+        for line in lines[1:]:
+            if line.startswith('[ERROR]'):
+                logging.error(line)
+            elif line.startswith('[WARNING]'):
+                logging.warning(line)
+            else:
+                logging.info(line)
+        logging.info(lines[0])
+        json_path, text_path = save_report(report, os.path.join(self.paths['LOG_DIR'], f"validation_{self.TIMESTAMP}"))
+        logging.info(f"Validation report saved to {json_path} and {text_path}")
+        return report['errors'] == 0
+
     def process(self):
+        bag_info = None
         try:
             logging.info("Script execution started")
             
-            bag_info = self.load_bag_info()
+            with self.metrics.phase('load_bag_info', io=True):
+                bag_info = self.load_bag_info()
+
+            with self.metrics.phase('read_case_list', io=True):
+                with open(self.paths['CASE_LIST_JSON'], 'r') as file:
+                    case_list = json.load(file)['case_list']
 
-            with open(self.paths['CASE_LIST_JSON'], 'r') as file:
-                case_list = json.load(file)['case_list']
+            output_json = suite_header(self.test_case_template)
 
-            output_json = copy.deepcopy(self.test_case_template)
-            output_json['test_suite_info']['test_case_infos'] = []
+            yaml_files = [os.path.join(self.paths['YAML_DIR'], yaml_file) for yaml_file in case_list]
+            cache = CaseCache(self.CACHE_FILE, self.test_case_template, self.cache_max_entries) if self.use_cache else None
+            errors = []
+            test_case_infos = self.iter_test_case_infos(yaml_files, bag_info, cache, errors)
 
-            for yaml_file in case_list:
-                full_yaml_path = os.path.join(self.paths['YAML_DIR'], yaml_file)
-                test_case_info = self.process_yaml(full_yaml_path, bag_info)
-                if test_case_info:
-                    output_json['test_suite_info']['test_case_infos'].append(test_case_info)
+            if self.stream:
+                # 流式输出：每个用例生成后立即写入临时文件，全部成功后再 rename
+                with self._open_writer(output_json) as writer:
+                    with self.metrics.phase('cases', io=True):
+                        for test_case_info in test_case_infos:
+                            with self.metrics.phase('write_case'):
+                                writer.write_case(test_case_info)
+                    self._raise_case_errors(errors, len(yaml_files))
+            else:
+                with self.metrics.phase('cases', io=True):
+                    output_json['test_suite_info']['test_case_infos'].extend(test_case_infos)
+                self._raise_case_errors(errors, len(yaml_files))
+                with self.metrics.phase('write_output', io=True):
+                    if self.compact or self.compress:
+                        save_suite(self.OUTPUT_JSON, output_json, self._case_template() if self.compact else None)
+                    else:
+                        with open(self.OUTPUT_JSON, 'w') as outfile:
+                            json.dump(output_json, outfile, indent=2)
+            if self.shards > 1:
+                with self.metrics.phase('shard_output', io=True):
+                    self.shard_output(output_json)
+            if self.delta:
+                with self.metrics.phase('write_delta', io=True):
+                    self.write_delta(output_json)
+            self.metrics.count('cases', len(yaml_files))
+            self.metrics.count('case_errors', len(errors))
 
-            with open(self.OUTPUT_JSON, 'w') as outfile:
-                json.dump(output_json, outfile, indent=2)
+            if cache is not None:
+                with self.metrics.phase('cache_save', io=True):
+                    cache.save()
+                logging.info(cache.summary())
 
+            self.case_log.summary()
             logging.info(f"Generated JSON file saved to {self.OUTPUT_JSON}")
             logging.info(f"Log file saved to {self.LOG_FILE}")
 
         except Exception as e:
             error_message = f"An error occurred: {str(e)}\nError type: {type(e).__name__}\nError occurred in {e.__traceback__.tb_frame.f_code.co_filename}, line {e.__traceback__.tb_lineno}"
             logging.error(error_message)
-            print(error_message)  # 在终端显示错误信息
             sys.exit(1)  # 终止程序
 
         finally:
+            close_bag_info(bag_info)
             logging.info("Script execution completed")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="根据 case_list.json 生成 BenchICT 测试配置")
+    parser.add_argument('--config', default='../config/test_case_template.json',
+                        help="配置文件路径，相对路径以脚本所在目录为基准")
+    parser.add_argument('--jobs', type=int, default=1,
+                        help="并行解析用例 YAML 的进程数，默认 1 为串行，<= 0 表示使用全部 CPU")
+    parser.add_argument('--cache', action='store_true',
+                        help="启用 OUTPUT_DIR 下的增量生成缓存，输入未变化的用例不再重新解析")
+    parser.add_argument('--cache-max-entries', type=int, default=20000,
+                        help="增量生成缓存最多保留的用例条目数，超出时淘汰最久未使用的条目")
+    parser.add_argument('--stream', action='store_true',
+                        help="逐个用例流式写出生成的 JSON（先写临时文件再 rename），内存占用不随用例数增长")
+    parser.add_argument('--bag-db', default=None,
+                        help="使用 SQLite bag 注册表（见 bag_store.py）代替 bag.json，也可在配置文件 paths 中设置 BAG_DB_PATH")
+    parser.add_argument('--validate', action='store_true',
+                        help="只检查整个用例集（YAML 必需键、bag 注册表、trigger_time、extend / topic_list 文件、topic 重叠），"
+                             "汇总全部问题输出报告到 LOG_DIR，不生成测试配置；--jobs 大于 1 时作为检查的线程数")
+    parser.add_argument('--watch', action='store_true',
+                        help="常驻运行：监视 YAML_DIR、BASE_PATH、case_list.json 和 bag 注册表，"
+                             "文件变化时只重新生成受影响的用例并原子重写输出，Ctrl+C 退出")
+    parser.add_argument('--watch-poll', type=float, default=None, metavar='SECONDS',
+                        help="--watch 时不使用 inotify，改为按指定间隔轮询文件的 mtime")
+    parser.add_argument('--debounce', type=float, default=DEBOUNCE_SECONDS,
+                        help=f"--watch 时等待连续的修改结束的时间（秒），默认 {DEBOUNCE_SECONDS}")
+    parser.add_argument('--compact', action='store_true',
+                        help="输出紧凑格式（用例模板只保存一次，每个用例只保存差异，见 compact_suite.py），文件名为 *.compact.json")
+    parser.add_argument('--gzip', action='store_true', help="gzip 压缩输出文件，文件名增加 .gz")
+    parser.add_argument('--shards', type=int, default=0,
+                        help="生成后按估算耗时（本地 bag 时长、topic 数、times）拆分为 N 个分片和 manifest.json，见 shard_suite.py")
+    parser.add_argument('--shard-strategy', choices=SHARD_STRATEGIES, default='lpt',
+                        help="分片方式：lpt 先按耗时从大到小排序再分配（默认），greedy 按原顺序分配")
+    parser.add_argument('--delta', choices=DELTA_FORMATS, default=None,
+                        help="生成后与 OUTPUT_DIR 中上一次的套件比较，按 case_code 在输出旁写出差异："
+                             "compact 为逐用例差异（*.delta.json），patch 为 RFC 6902 JSON Patch（*.patch.json），"
+                             "用 suite_delta.py apply 重建完整套件")
+    parser.add_argument('--delta-baseline', default=None,
+                        help="--delta 的基准套件，默认使用 OUTPUT_DIR 中最新的 generated_json_*")
+    add_metrics_arguments(parser)
+    add_log_arguments(parser, sampling=True)
+    args = parser.parse_args()
+
     try:
-        processor = CaseProcessor()
-        processor.process()
+        metrics = Metrics.from_args(args, 'BenchICT_Config')
+        processor = CaseProcessor(args.config, jobs=args.jobs, use_cache=args.cache,
+                                  cache_max_entries=args.cache_max_entries, stream=args.stream,
+                                  bag_db=args.bag_db, metrics=metrics, log_format=args.log_format,
+                                  log_sample=args.log_sample, shards=args.shards,
+                                  shard_strategy=args.shard_strategy, compact=args.compact,
+                                  compress=args.gzip, delta=args.delta, delta_baseline=args.delta_baseline)
+        with metrics.session(processor.paths['LOG_DIR'], f"BenchICT_Config_{processor.TIMESTAMP}"):
+            if args.validate:
+                valid = processor.validate()
+            elif args.watch:
+                processor.watch(args.debounce, polling=args.watch_poll is not None,
+                                interval=args.watch_poll or POLL_INTERVAL)
+            else:
+                processor.process()
+        if args.validate and not valid:
+            sys.exit(1)
     except FileNotFoundError as e:
         error_message = f"Error: {e}\nPlease make sure the configuration file exists and is accessible."
-        print(error_message)
+        if not console_enabled():
+            print(error_message)
         logging.error(error_message)
         sys.exit(1)
     except Exception as e:
         error_message = f"An unexpected error occurred: {e}"
-        print(error_message)
+        if not console_enabled():
+            print(error_message)
         logging.error(error_message)
         sys.exit(1)
\ No newline at end of file
@@ -0,0 +1,223 @@
+import os
+import json
+import sqlite3
+import argparse
+from collections.abc import Mapping
+from contextlib import contextmanager
+from file_utils import atomic_write
+
+# SQLite 单条语句的参数个数有上限，批量查询时分批执行
+_BATCH_SIZE = 500
+
+
+def parse_trigger_time(trigger_time):
+    """bag.json 中的 trigger_time 为字符串，"None" 表示尚未填写"""
+    return None if trigger_time == "None" else float(trigger_time)
+
+
+def add_bags_to_json(bag_json_path, output_json, md5s):
+    """与 extract_bag_md5s.py 相同的增量合并：读取现有 bag.json，追加新 md5 后写入 output_json
+
+    返回 (新增的 md5 列表, 合并后的 bag 总数)。
+    """
+    existing_bags = {}
+    if bag_json_path and os.path.exists(bag_json_path):
+        with open(bag_json_path, 'r') as file:
+            for bag in json.load(file).get('bags', []):
+                existing_bags[bag['md5']] = bag
+    new_md5s = []
+    for md5 in md5s:
+        if md5 not in existing_bags:
+            existing_bags[md5] = {"md5": md5, "trigger_time": "None"}
+            new_md5s.append(md5)
+    with atomic_write(output_json) as file:
+        json.dump({"bags": list(existing_bags.values())}, file, indent=2)
+    return new_md5s, len(existing_bags)
+
+
+class BagStore:
+    """基于 SQLite 的 bag 注册表
+
+    与 bag.json 保存相同的信息（md5 与 trigger_time），md5 为主键，按 md5 查询和新增
+    都只访问索引，不需要解析和重写整个文件。数据库使用 WAL 模式，多人同时读写时
+    写操作在 BEGIN IMMEDIATE 事务中排队执行。
+    """
+
+    def __init__(self, db_path, timeout=30.0):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        # isolation_level=None 关闭 sqlite3 模块的隐式事务，由 transaction() 显式控制
+        self.conn = sqlite3.connect(db_path, timeout=timeout, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(f"PRAGMA busy_timeout={int(timeout * 1000)}")
+        # seq 记录加入顺序，导出 bag.json 时保持与原文件相同的顺序
+        self.conn.execute("CREATE TABLE IF NOT EXISTS bags ("
+                          "md5 TEXT PRIMARY KEY, "
+                          "trigger_time TEXT NOT NULL DEFAULT 'None', "
+                          "seq INTEGER NOT NULL) WITHOUT ROWID")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS bags_seq ON bags (seq)")
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    @contextmanager
+    def transaction(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield self.conn
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+
+    def _next_seq(self, conn):
+        return conn.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM bags").fetchone()[0]
+
+    def add_bags(self, md5s):
+        """登记新的 bag（trigger_time 为 "None"），已存在的 md5 保持不变，返回新增的 md5 列表"""
+        new_md5s = []
+        with self.transaction() as conn:
+            seq = self._next_seq(conn)
+            for md5 in dict.fromkeys(md5s):
+                cursor = conn.execute("INSERT OR IGNORE INTO bags (md5, trigger_time, seq) VALUES (?, 'None', ?)",
+                                      (md5, seq))
+                if cursor.rowcount:
+                    new_md5s.append(md5)
+                    seq += 1
+        return new_md5s
+
+    def upsert(self, bags):
+        """写入 bag.json 格式的条目列表，已存在的 md5 更新 trigger_time，返回新增条目数"""
+        new_count = 0
+        with self.transaction() as conn:
+            seq = self._next_seq(conn)
+            for bag in bags:
+                trigger_time = str(bag.get('trigger_time', "None"))
+                cursor = conn.execute("UPDATE bags SET trigger_time = ? WHERE md5 = ?", (trigger_time, bag['md5']))
+                if not cursor.rowcount:
+                    conn.execute("INSERT INTO bags (md5, trigger_time, seq) VALUES (?, ?, ?)",
+                                 (bag['md5'], trigger_time, seq))
+                    seq += 1
+                    new_count += 1
+        return new_count
+
+    def lookup(self, md5s):
+        """批量查询，返回 {md5: trigger_time 字符串}，不存在的 md5 不出现在结果中"""
+        md5s = list(dict.fromkeys(md5s))
+        result = {}
+        for start in range(0, len(md5s), _BATCH_SIZE):
+            batch = md5s[start:start + _BATCH_SIZE]
+            placeholders = ",".join("?" * len(batch))
+            rows = self.conn.execute(f"SELECT md5, trigger_time FROM bags WHERE md5 IN ({placeholders})", batch)
+            result.update(rows)
+        return result
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM bags").fetchone()[0]
+
+    def iter_bags(self):
+        for md5, trigger_time in self.conn.execute("SELECT md5, trigger_time FROM bags ORDER BY seq"):
+            yield {"md5": md5, "trigger_time": trigger_time}
+
+    def import_json(self, json_path):
+        with open(json_path, 'r') as file:
+            bags = json.load(file).get('bags', [])
+        return self.upsert(bags)
+
+    def export_json(self, json_path):
+        bags = list(self.iter_bags())
+        with atomic_write(json_path) as file:
+            json.dump({"bags": bags}, file, indent=2)
+        return len(bags)
+
+
+class TriggerTimeLookup(Mapping):
+    """以 md5 -> trigger_time（float 或 None）的只读映射形式访问 BagStore
+
+    与 CaseProcessor.load_bag_info 返回的 dict 用法相同，但只查询实际用到的 md5，
+    查询结果在本对象内缓存；已知要用到的 md5 可以先调用 prefetch 批量查询。
+    用完后调用 close（或用 with 语句）关闭数据库连接。
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._cache = {}
+
+    def prefetch(self, md5s):
+        missing = [md5 for md5 in md5s if md5 not in self._cache]
+        found = self.store.lookup(missing)
+        for md5 in missing:
+            self._cache[md5] = parse_trigger_time(found[md5]) if md5 in found else KeyError
+        return self
+
+    def __getitem__(self, md5):
+        if md5 not in self._cache:
+            self.prefetch([md5])
+        value = self._cache[md5]
+        if value is KeyError:
+            raise KeyError(md5)
+        return value
+
+    def __iter__(self):
+        for bag in self.store.iter_bags():
+            yield bag['md5']
+
+    def __len__(self):
+        return self.store.count()
+
+    def close(self):
+        self.store.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def close_bag_info(bag_info):
+    """关闭 load_bag_info 返回的 TriggerTimeLookup；从 bag.json 读出的 dict 不需要关闭"""
+    if isinstance(bag_info, TriggerTimeLookup):
+        bag_info.close()
+
+
+if __name__ == "__main__":
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="SQLite bag 注册表的导入、导出与查询")
+    parser.add_argument('--db', default=os.path.normpath(os.path.join(script_dir, '../config/bag.db')),
+                        help="bag 数据库路径，默认为 config/bag.db")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    import_parser = subparsers.add_parser('import', help="将 bag.json 导入数据库（已存在的 md5 更新 trigger_time）")
+    import_parser.add_argument('json_path')
+    export_parser = subparsers.add_parser('export', help="将数据库导出为 bag.json 格式")
+    export_parser.add_argument('json_path')
+    get_parser = subparsers.add_parser('get', help="按 md5 查询 trigger_time")
+    get_parser.add_argument('md5s', nargs='+')
+    set_parser = subparsers.add_parser('set', help="设置 bag 的 trigger_time，md5 不存在时新增")
+    set_parser.add_argument('md5')
+    set_parser.add_argument('trigger_time')
+    args = parser.parse_args()
+
+    with BagStore(args.db) as store:
+        if args.command == 'import':
+            new_count = store.import_json(args.json_path)
+            print(f"Imported {args.json_path} into {args.db}: {new_count} new bags, {store.count()} bags in total.")
+        elif args.command == 'export':
+            count = store.export_json(args.json_path)
+            print(f"Exported {count} bags from {args.db} to {args.json_path}")
+        elif args.command == 'get':
+            found = store.lookup(args.md5s)
+            for md5 in args.md5s:
+                print(f"{md5}: {found.get(md5, 'not found')}")
+        elif args.command == 'set':
+            parse_trigger_time(args.trigger_time)  # 非法的 trigger_time 直接报错，不写入数据库
+            store.upsert([{"md5": args.md5, "trigger_time": args.trigger_time}])
+            print(f"Set trigger_time of {args.md5} to {args.trigger_time}")
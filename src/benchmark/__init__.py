@@ -0,0 +1,10 @@
+"""工具链的性能基准测试
+
+generate.py 按 test_case_template.json 的目录结构生成指定规模的合成用例集，
+runner.py 在不同规模下测量 BagMD5Extractor.process、CaseProcessor.process 和
+JsonModifier.modify_topic_lists 的耗时、峰值内存和打开的文件数，并与基线结果比较。
+bags.py 写出合成的 rosbag v2.0 文件（包括截断和损坏的文件）并检查 rosbag_index.py 的读取结果。
+determinism.py 用不同的 PYTHONHASHSEED 生成两次，检查 --delta 报告的修改用例数为 0。
+
+在 src 目录下运行：python -m benchmark.runner --scales 100:50:10 1000:200:50
+"""
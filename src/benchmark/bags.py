@@ -0,0 +1,132 @@
+import os
+import struct
+import argparse
+from rosbag_index import (BAG_MAGIC, OP_BAG_HEADER, OP_CHUNK, OP_CHUNK_INFO, OP_CONNECTION, OP_INDEX_DATA,
+                          OP_MSG_DATA, RosbagIndex)
+
+# 合成 bag 的 topic 和消息时间：每个 chunk 中每个 topic 一条消息，chunk 之间相隔 CHUNK_SECONDS 秒
+TOPICS = ("/bench/trigger", "/bench/other")
+START_TIME = (1700000000, 250000000)
+CHUNK_SECONDS = 10
+
+
+def _field(name, value):
+    field = name.encode() + b'=' + value
+    return struct.pack('<I', len(field)) + field
+
+
+def _record(fields, data=b''):
+    header = b''.join(_field(name, value) for name, value in fields)
+    return struct.pack('<I', len(header)) + header + struct.pack('<I', len(data)) + data
+
+
+def _time(sec, nsec):
+    return struct.pack('<II', sec, nsec)
+
+
+def build_bag(topics=TOPICS, chunks=2, start_time=START_TIME):
+    """返回一个未压缩、已建立索引的 rosbag v2.0 文件的内容
+
+    每个 chunk 中每个 topic 一条 std_msgs/String 消息；第 i 个 topic 的消息比 chunk 开始时间晚 i 秒，
+    因此 topics[0] 的第一条消息时间为 start_time。
+    """
+    connections = [
+        [('op', bytes([OP_CONNECTION])), ('conn', struct.pack('<I', conn)), ('topic', topic.encode())]
+        for conn, topic in enumerate(topics)
+    ]
+    connection_data = [b''.join(_field(name, value) for name, value in [
+        ('topic', topic.encode()), ('type', b'std_msgs/String'), ('md5sum', b'992ce8a1687cec8c8bd883ec73ca41d1')])
+        for topic in topics]
+
+    body = b''
+    chunk_infos = []
+    header_size = len(_bag_header(0, 0, 0))
+    for index in range(chunks):
+        chunk_pos = len(BAG_MAGIC) + header_size + len(body)
+        sec = start_time[0] + index * CHUNK_SECONDS
+        messages = b''
+        offsets = []
+        for conn, data in enumerate(connection_data):
+            messages += _record(connections[conn], data)
+        for conn in range(len(topics)):
+            offsets.append(len(messages))
+            messages += _record([('op', bytes([OP_MSG_DATA])), ('conn', struct.pack('<I', conn)),
+                                 ('time', _time(sec + conn, start_time[1]))], b'\x05\x00\x00\x00hello')
+        chunk = _record([('op', bytes([OP_CHUNK])), ('compression', b'none'),
+                         ('size', struct.pack('<I', len(messages)))], messages)
+        for conn in range(len(topics)):
+            chunk += _record([('op', bytes([OP_INDEX_DATA])), ('ver', struct.pack('<I', 1)),
+                              ('conn', struct.pack('<I', conn)), ('count', struct.pack('<I', 1))],
+                             struct.pack('<III', sec + conn, start_time[1], offsets[conn]))
+        body += chunk
+        end_sec = sec + len(topics) - 1
+        chunk_infos.append(_record(
+            [('op', bytes([OP_CHUNK_INFO])), ('ver', struct.pack('<I', 1)), ('chunk_pos', struct.pack('<Q', chunk_pos)),
+             ('start_time', _time(sec, start_time[1])), ('end_time', _time(end_sec, start_time[1])),
+             ('count', struct.pack('<I', len(topics)))],
+            b''.join(struct.pack('<II', conn, 1) for conn in range(len(topics)))))
+
+    index_pos = len(BAG_MAGIC) + header_size + len(body)
+    index = b''.join(_record(connections[conn], data) for conn, data in enumerate(connection_data))
+    index += b''.join(chunk_infos)
+    return BAG_MAGIC + _bag_header(index_pos, len(topics), chunks) + body + index
+
+
+def _bag_header(index_pos, conn_count, chunk_count):
+    return _record([('op', bytes([OP_BAG_HEADER])), ('index_pos', struct.pack('<Q', index_pos)),
+                    ('conn_count', struct.pack('<I', conn_count)), ('chunk_count', struct.pack('<I', chunk_count))])
+
+
+def write_bag_fixtures(directory):
+    """在 directory 下写出一个完整的 bag 和几种损坏的 bag，返回 {文件名: 读取 TOPICS[0] 时预期的结果}
+
+    预期结果为第一条消息的时间（秒），或 ValueError 表示应当作为格式错误逐个 bag 报告。
+    """
+    os.makedirs(directory, exist_ok=True)
+    data = build_bag()
+    header_end = len(BAG_MAGIC) + len(_bag_header(0, 0, 0))
+    fixtures = {
+        "valid.bag": (data, START_TIME[0] + START_TIME[1] / 1e9),
+        # 复制时丢失了最后几个字节
+        "truncated_tail.bag": (data[:-3], ValueError),
+        # 只剩文件头和一部分 bag header 记录
+        "truncated_header.bag": (data[:len(BAG_MAGIC) + 10], ValueError),
+        # 索引区被截掉，index_pos 指向文件之外
+        "truncated_index.bag": (data[:header_end + 8], ValueError),
+        # bag header 中第一个字段的长度超出 header
+        "corrupt_field_length.bag": (data[:len(BAG_MAGIC) + 4] + struct.pack('<I', 0xFFFF) + data[len(BAG_MAGIC) + 8:],
+                                     ValueError),
+        "empty.bag": (b'', ValueError),
+    }
+    results = {}
+    for name, (content, expected) in fixtures.items():
+        with open(os.path.join(directory, name), 'wb') as file:
+            file.write(content)
+        results[name] = expected
+    return results
+
+
+def check_bag_fixtures(directory):
+    """用 RosbagIndex 读取 write_bag_fixtures 写出的 bag，返回与预期不符的文件名列表"""
+    failures = []
+    for name, expected in write_bag_fixtures(directory).items():
+        try:
+            with RosbagIndex(os.path.join(directory, name)) as bag:
+                result = bag.first_message_time(TOPICS[0])
+        except ValueError:
+            result = ValueError
+        except Exception as e:
+            # struct.error 等其他异常会中断整批 bag 的处理
+            result = type(e)
+        status = "ok" if result == expected else "FAILED"
+        if result != expected:
+            failures.append(name)
+        print(f"{status:6} {name}: {getattr(result, '__name__', result)}")
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="写出合成的 rosbag v2.0 文件（包括截断的文件）并检查 rosbag_index.py 的读取结果")
+    parser.add_argument('directory', help="输出目录")
+    args = parser.parse_args()
+    raise SystemExit(1 if check_bag_fixtures(args.directory) else 0)
@@ -0,0 +1,55 @@
+import os
+import sys
+import glob
+import json
+import shutil
+import argparse
+import tempfile
+import subprocess
+from benchmark.generate import generate_case_set
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 两次生成使用的 PYTHONHASHSEED，set / dict 的遍历顺序依赖它
+HASH_SEEDS = ("1", "2")
+
+
+def _generate(config_path, hash_seed, extra_args=()):
+    environment = dict(os.environ, PYTHONHASHSEED=hash_seed)
+    command = [sys.executable, 'BenchICT_Config.py', '--config', config_path] + list(extra_args)
+    process = subprocess.run(command, cwd=SRC_DIR, env=environment, stdout=subprocess.DEVNULL,
+                             stderr=subprocess.PIPE, universal_newlines=True)
+    if process.returncode != 0:
+        raise RuntimeError(f"Generation with PYTHONHASHSEED={hash_seed} failed: {process.stderr.strip()}")
+
+
+def check_determinism(root, cases=200, topics=20, bags=10):
+    """在 root 下生成合成用例集，用不同的 PYTHONHASHSEED 各生成一次，第二次用 --delta 与第一次比较
+
+    返回差异文件中的 summary；输入没有变化，added / removed / modified 都应为 0。
+    """
+    config_path = generate_case_set(root, cases, topics, bags)
+    output_dir = os.path.join(root, "output")
+    _generate(config_path, HASH_SEEDS[0])
+    # 两次生成可能在同一秒内完成，先把第一次的输出改名作为显式的基准
+    baseline_path = os.path.join(output_dir, "baseline.json")
+    os.rename(max(glob.glob(os.path.join(output_dir, "generated_json_*.json")), key=os.path.getmtime), baseline_path)
+    _generate(config_path, HASH_SEEDS[1], ['--delta', 'compact', '--delta-baseline', baseline_path])
+    with open(glob.glob(os.path.join(output_dir, "generated_json_*.delta.json"))[0], 'r') as file:
+        return json.load(file)['summary']
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="检查输入不变时，不同 PYTHONHASHSEED 下生成的套件是否完全相同（--delta 报告 0 个修改）")
+    parser.add_argument('--cases', type=int, default=200, help="合成用例个数")
+    parser.add_argument('--workdir', default=None, help="临时目录的位置，默认使用系统临时目录")
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix='benchict_determinism_', dir=args.workdir)
+    try:
+        summary = check_determinism(root, args.cases)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    changed = summary['added'] + summary['removed'] + summary['modified']
+    print(f"{'ok' if not changed else 'FAILED':6} {summary['added']} added, {summary['removed']} removed, "
+          f"{summary['modified']} modified, {summary['unchanged']} unchanged")
+    raise SystemExit(1 if changed else 0)
@@ -0,0 +1,122 @@
+import json
+import os
+import random
+import argparse
+
+# 合成用例集的目录结构与 config/test_case_template.json 中的 paths 一致
+CASE_SET_DIR = "BYUNS/case_set"
+CASES_DIR = "BYUNS/cases"
+TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                             "template", "test_case_template.json")
+
+
+def _topic_name(index):
+    return f"/bench/topic_{index:05d}"
+
+
+def _write_topic_list(path, topics):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as file:
+        for topic in topics:
+            file.write(f"topic {topic} std_msgs/String\n")
+
+
+def _write_extend(path, send_topics, forward_topics):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as file:
+        for topic in send_topics:
+            file.write(f"send {topic} 10\n")
+        for topic in forward_topics:
+            file.write(f"forward {topic}\n")
+
+
+def generate_case_set(root, cases, topics, bags, shared_files=10, shared_ratio=0.8, seed=0):
+    """在 root 下生成合成用例集，返回生成的配置文件路径
+
+    cases 个用例 YAML 中，约 shared_ratio 比例的用例引用 shared_files 组共享的 extend / topic_list 文件，
+    其余用例各自使用独立的文件；每个 topic_list 包含 topics 个 topic，bag.json 中有 bags 个 bag，
+    全部已填写 trigger_time。相同参数和 seed 生成的内容完全相同。
+    """
+    if cases < 1 or topics < 1 or bags < 1:
+        raise ValueError("cases, topics and bags must all be at least 1")
+    rng = random.Random(seed)
+    case_set_dir = os.path.join(root, CASE_SET_DIR)
+    cases_dir = os.path.join(root, CASES_DIR)
+    os.makedirs(case_set_dir, exist_ok=True)
+    os.makedirs(cases_dir, exist_ok=True)
+
+    bag_list = [{"md5": "%032x" % rng.getrandbits(128), "trigger_time": str(1700000000 + rng.random() * 1e6)}
+                for _ in range(bags)]
+    all_topics = [_topic_name(index) for index in range(topics * 2)]
+
+    def make_files(name):
+        topic_list = rng.sample(all_topics, topics)
+        # extend 文件 send 的 topic 部分与 topic_list 重叠，forward 的 topic 取自 topic_list
+        send_topics = rng.sample(all_topics, max(1, topics // 10))
+        forward_topics = topic_list[:max(1, topics // 20)]
+        extend_path = f"extend/{name}.extend"
+        topic_list_path = f"topic_list/{name}.txt"
+        _write_extend(os.path.join(cases_dir, extend_path), send_topics, forward_topics)
+        _write_topic_list(os.path.join(cases_dir, topic_list_path), topic_list)
+        return extend_path, topic_list_path
+
+    shared = [make_files(f"shared_{index:03d}") for index in range(shared_files)]
+    case_list = []
+    for index in range(cases):
+        case_name = f"BENCH_{index:06d}"
+        if shared and rng.random() < shared_ratio:
+            extend_path, topic_list_path = rng.choice(shared)
+        else:
+            extend_path, topic_list_path = make_files(case_name)
+        yaml_name = f"{case_name}.yaml"
+        with open(os.path.join(case_set_dir, yaml_name), 'w') as file:
+            file.write(f"# synthetic benchmark case {index}\n"
+                       f"mfl_case_path: mfl/{case_name}.mfl\n"
+                       f"mfl_extend_path: {extend_path}\n"
+                       f"bag_md5: {bag_list[index % bags]['md5']}\n"
+                       f"play_topic_list: {topic_list_path}\n"
+                       f"description: synthetic case for performance measurement\n"
+                       f"steps:\n"
+                       f"  - action: load\n"
+                       f"    timeout: 30\n"
+                       f"  - action: check\n"
+                       f"    expected: pass\n")
+        case_list.append(yaml_name)
+
+    with open(os.path.join(case_set_dir, "case_list.json"), 'w') as file:
+        json.dump({"case_list": case_list}, file, indent=2)
+    os.makedirs(os.path.join(root, "config"), exist_ok=True)
+    with open(os.path.join(root, "config", "bag.json"), 'w') as file:
+        json.dump({"bags": bag_list}, file, indent=2)
+
+    with open(TEMPLATE_PATH, 'r') as file:
+        config = json.load(file)
+    # 使用绝对路径，脚本无论从哪里运行都指向合成用例集
+    config['paths'] = {
+        "CASE_LIST_JSON": os.path.join(case_set_dir, "case_list.json"),
+        "YAML_DIR": case_set_dir,
+        "BASE_PATH": cases_dir,
+        "OUTPUT_DIR": os.path.join(root, "output"),
+        "LOG_DIR": os.path.join(root, "log"),
+        "BAG_JSON_PATH": os.path.join(root, "config", "bag.json")
+    }
+    config_path = os.path.join(root, "config", "test_case_template.json")
+    with open(config_path, 'w') as file:
+        json.dump(config, file, indent=2)
+    return config_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="生成用于性能测试的合成用例集")
+    parser.add_argument('root', help="输出目录")
+    parser.add_argument('--cases', type=int, default=1000, help="用例 YAML 个数")
+    parser.add_argument('--topics', type=int, default=200, help="每个 topic_list 中的 topic 个数")
+    parser.add_argument('--bags', type=int, default=50, help="bag.json 中的 bag 个数")
+    parser.add_argument('--shared-files', type=int, default=10, help="共享的 extend / topic_list 文件组数")
+    parser.add_argument('--shared-ratio', type=float, default=0.8, help="引用共享文件的用例比例")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    config_path = generate_case_set(args.root, args.cases, args.topics, args.bags,
+                                    shared_files=args.shared_files, shared_ratio=args.shared_ratio, seed=args.seed)
+    print(f"Generated {args.cases} cases under {args.root}, configuration file: {config_path}")
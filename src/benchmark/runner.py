@@ -0,0 +1,207 @@
+import json
+import os
+import sys
+import glob
+import time
+import shutil
+import resource
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime
+from benchmark.generate import generate_case_set
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_OUTPUT_DIR = os.path.join(os.path.dirname(SRC_DIR), "output")
+TARGETS = ('extract_bag_md5s', 'generate', 'edit_topics')
+# edit_topics 向所有用例的 input_topic_list 添加的 topic
+EDIT_TOPICS = ["/bench/edit/topic_a", "/bench/edit/topic_b", "/bench/edit/topic_c"]
+# 结果格式变化时递增，与不同版本的基线比较时给出提示
+RESULT_VERSION = 1
+
+
+def parse_scale(text):
+    """解析 CASES:TOPICS:BAGS 形式的规模参数"""
+    try:
+        cases, topics, bags = (int(value) for value in text.split(':'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid scale {text!r}, expected CASES:TOPICS:BAGS")
+    return {"cases": cases, "topics": topics, "bags": bags}
+
+
+def _latest_suite(output_dir):
+    suites = glob.glob(os.path.join(output_dir, "generated_json_*.json"))
+    if not suites:
+        raise FileNotFoundError(f"No generated suite in {output_dir}")
+    return max(suites, key=os.path.getmtime)
+
+
+def measure(target, config_path, jobs=1):
+    """在当前进程中执行一次 target，返回耗时、峰值内存和打开的文件数
+
+    导入模块、构造对象和读取输入在计时之外完成。打开的文件数通过审计钩子统计当前进程中的 open
+    事件，--jobs 大于 1 时子进程中打开的文件不计入；峰值内存取本进程与子进程中的较大值。
+    """
+    counting = False
+    files_opened = 0
+
+    def audit(event, args):
+        nonlocal files_opened
+        if counting and event == 'open':
+            files_opened += 1
+
+    sys.addaudithook(audit)
+    if target == 'extract_bag_md5s':
+        from extract_bag_md5s import BagMD5Extractor
+        run = BagMD5Extractor(config_path).process
+    elif target == 'generate':
+        from BenchICT_Config import CaseProcessor
+        run = CaseProcessor(config_path, jobs=jobs).process
+    elif target == 'edit_topics':
+        from edit_case_config import JsonModifier
+        modifier = JsonModifier(config_path)
+        with open(_latest_suite(modifier.paths['OUTPUT_DIR']), 'r', encoding='utf-8') as file:
+            data = json.load(file)
+        run = lambda: modifier.modify_topic_lists(data, ['all'], 'add', 'input', EDIT_TOPICS)
+    else:
+        raise ValueError(f"Unknown benchmark target: {target}")
+
+    counting = True
+    start = time.perf_counter()
+    run()
+    wall_time = time.perf_counter() - start
+    counting = False
+    # Linux 上 ru_maxrss 的单位为 KiB
+    peak_rss_kb = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                      resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return {"wall_time": wall_time, "peak_rss_kb": peak_rss_kb, "files_opened": files_opened}
+
+
+def run_isolated(target, config_path, jobs=1):
+    """在新的 Python 进程中执行一次测量，使峰值内存不受之前测量的影响"""
+    with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as result_file:
+        result_path = result_file.name
+    try:
+        command = [sys.executable, '-m', 'benchmark.runner', '--measure', target,
+                   '--config', config_path, '--jobs', str(jobs), '--result', result_path]
+        process = subprocess.run(command, cwd=SRC_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                                 universal_newlines=True)
+        with open(result_path, 'r') as file:
+            content = file.read()
+        if process.returncode != 0 or not content:
+            raise RuntimeError(f"Benchmark {target} failed: {process.stderr.strip()}")
+        return json.loads(content)
+    finally:
+        os.remove(result_path)
+
+
+def run_benchmarks(scales, targets=TARGETS, repeat=3, jobs=1, workdir=None, keep=False):
+    results = []
+    for scale in scales:
+        root = tempfile.mkdtemp(prefix='benchict_bench_', dir=workdir)
+        try:
+            print(f"Generating {scale['cases']} cases, {scale['topics']} topics per list, {scale['bags']} bags in {root}")
+            config_path = generate_case_set(root, **scale)
+            # edit_topics 需要 generate 的输出作为输入
+            if 'edit_topics' in targets and 'generate' not in targets:
+                run_isolated('generate', config_path, jobs)
+            for target in TARGETS:
+                if target not in targets:
+                    continue
+                runs = [run_isolated(target, config_path, jobs) for _ in range(repeat)]
+                wall_times = sorted(run["wall_time"] for run in runs)
+                result = dict(scale, target=target, jobs=jobs,
+                              wall_time=wall_times[0],
+                              wall_time_median=wall_times[len(wall_times) // 2],
+                              peak_rss_kb=max(run["peak_rss_kb"] for run in runs),
+                              files_opened=runs[-1]["files_opened"])
+                print(f"  {target:<18} {result['wall_time']:9.3f}s  {result['peak_rss_kb'] / 1024:8.1f} MiB  "
+                      f"{result['files_opened']:7d} files")
+                results.append(result)
+        finally:
+            if keep:
+                print(f"Kept benchmark data in {root}")
+            else:
+                shutil.rmtree(root, ignore_errors=True)
+    return results
+
+
+def _result_key(result):
+    return (result['target'], result['cases'], result['topics'], result['bags'], result['jobs'])
+
+
+def compare_with_baseline(results, baseline, threshold=0.2):
+    """返回相对基线变慢、内存增长超过 threshold 或打开文件数增加的项 [(key, 指标, 基线值, 当前值)]"""
+    baseline_results = {_result_key(result): result for result in baseline.get('results', [])}
+    regressions = []
+    for result in results:
+        key = _result_key(result)
+        previous = baseline_results.get(key)
+        if previous is None:
+            continue
+        for metric in ('wall_time', 'peak_rss_kb'):
+            if result[metric] > previous[metric] * (1 + threshold):
+                regressions.append((key, metric, previous[metric], result[metric]))
+        if result['files_opened'] > previous['files_opened']:
+            regressions.append((key, 'files_opened', previous['files_opened'], result['files_opened']))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="在合成用例集上测量工具链各步骤的性能")
+    parser.add_argument('--scales', nargs='+', type=parse_scale, default=[parse_scale('100:50:10'),
+                                                                          parse_scale('1000:200:50')],
+                        metavar='CASES:TOPICS:BAGS', help="测试规模，默认 100:50:10 1000:200:50")
+    parser.add_argument('--targets', nargs='+', choices=TARGETS, default=list(TARGETS))
+    parser.add_argument('--repeat', type=int, default=3, help="每项重复次数，耗时取最小值和中位数")
+    parser.add_argument('--jobs', type=int, default=1, help="传给 CaseProcessor 的 --jobs")
+    parser.add_argument('--output', default=None,
+                        help="结果 JSON 文件，默认 output/benchmark_<时间戳>.json")
+    parser.add_argument('--baseline', default=None, help="与之前保存的结果比较，出现回退时返回非零退出码")
+    parser.add_argument('--threshold', type=float, default=0.2, help="判定为回退的相对增长，默认 0.2")
+    parser.add_argument('--workdir', default=None, help="生成合成用例集的目录，默认为系统临时目录")
+    parser.add_argument('--keep', action='store_true', help="保留生成的合成用例集")
+    # 以下参数由 run_isolated 在子进程中使用
+    parser.add_argument('--measure', choices=TARGETS, help=argparse.SUPPRESS)
+    parser.add_argument('--config', help=argparse.SUPPRESS)
+    parser.add_argument('--result', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        result = measure(args.measure, args.config, args.jobs)
+        with open(args.result, 'w') as file:
+            json.dump(result, file)
+        return 0
+
+    results = run_benchmarks(args.scales, args.targets, max(1, args.repeat), args.jobs, args.workdir, args.keep)
+    report = {
+        "version": RESULT_VERSION,
+        "created": datetime.now().isoformat(timespec='seconds'),
+        "python": sys.version.split()[0],
+        "platform": sys.platform,
+        "results": results
+    }
+    output_path = args.output or os.path.join(DEFAULT_OUTPUT_DIR,
+                                              f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, 'w') as file:
+        json.dump(report, file, indent=2)
+    print(f"Benchmark results saved to {output_path}")
+
+    if args.baseline:
+        with open(args.baseline, 'r') as file:
+            baseline = json.load(file)
+        if baseline.get('version') != RESULT_VERSION:
+            print(f"Warning: baseline {args.baseline} has result version {baseline.get('version')}, "
+                  f"expected {RESULT_VERSION}")
+        regressions = compare_with_baseline(results, baseline, args.threshold)
+        for (target, cases, topics, bags, jobs), metric, previous, current in regressions:
+            print(f"Regression: {target} at {cases}:{topics}:{bags} (jobs={jobs}) {metric} {previous:g} -> {current:g}")
+        if regressions:
+            return 1
+        print(f"No regressions compared with {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
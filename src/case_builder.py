@@ -0,0 +1,85 @@
+import re
+
+# 模板中的占位符，例如 "<CASE_CODE>"
+PLACEHOLDER_PATTERN = re.compile(r'<[A-Z][A-Z0-9_]*>')
+
+# 每个用例填写的字段：名称 -> 在 test_case_info 中的路径，与 CaseProcessor.build_test_case_info 写入的字段一致
+SLOTS = {
+    "CASE_CODE": ("case_code",),
+    "BAG_MD5": ("bag_urls",),
+    "TOPIC_REMAPS": ("config", "topic_remaps"),
+    "INPUT_TOPIC_LIST": ("config", "function_simulator", "input_topic_list"),
+    "OUTPUT_TOPIC_LIST": ("config", "function_simulator", "output_topic_list"),
+    "MFL_CASE_PATH": ("mfl_function_spec", "spec_names", 0, "path"),
+    "MFL_EXTEND_PATH": ("mfl_function_spec", "spec_names", 0, "extend_path"),
+    "TRIGGER_TIME": ("mfl_function_spec", "spec_names", 0, "trigger_time"),
+}
+
+
+def _pointer(path):
+    return "/" + "/".join(str(key) for key in path)
+
+
+def _find_placeholders(value, path=()):
+    """依次返回 (路径, 占位符) """
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from _find_placeholders(item, path + (key,))
+    elif isinstance(value, list):
+        for index, item in enumerate(value):
+            yield from _find_placeholders(item, path + (index,))
+    elif isinstance(value, str) and PLACEHOLDER_PATTERN.fullmatch(value):
+        yield path, value
+
+
+class CaseBuilder:
+    """预先编译的 test_case_info 生成器，代替对每个用例 deepcopy 模板
+
+    编译时检查 SLOTS 中的每个字段在模板中都存在，且模板中的每个 "<...>" 占位符都位于某个字段内，
+    不会有占位符原样留在输出中。build() 只为通向各字段的 dict / list 创建新对象，
+    其余部分（checker_infos、config 中的开关等）在所有用例间共享，生成后不应再修改。
+    """
+
+    def __init__(self, case_template):
+        self.case_template = case_template
+        # 字段路径组成的前缀树：键 -> 子树，叶子为字段名
+        self._tree = {}
+        for name, path in SLOTS.items():
+            self._resolve(name, path)
+            node = self._tree
+            for key in path[:-1]:
+                node = node.setdefault(key, {})
+            node[path[-1]] = name
+        for path, placeholder in _find_placeholders(case_template):
+            if not any(path[:len(slot)] == slot for slot in SLOTS.values()):
+                raise ValueError(f"Placeholder {placeholder} at {_pointer(path)} in test_case_template "
+                                 f"is not filled by the case builder")
+
+    def _resolve(self, name, path):
+        value = self.case_template
+        for key in path:
+            try:
+                value = value[key]
+            except (KeyError, IndexError, TypeError):
+                raise ValueError(f"test_case_template has no {_pointer(path)} for {name}")
+
+    def _build(self, template, tree, values):
+        result = dict(template) if isinstance(template, dict) else list(template)
+        for key, child in tree.items():
+            result[key] = values[child] if isinstance(child, str) else self._build(template[key], child, values)
+        return result
+
+    def build(self, **values):
+        """values 为 SLOTS 中每个字段名对应的值，返回新的 test_case_info"""
+        missing = SLOTS.keys() - values.keys()
+        if missing:
+            raise ValueError(f"Missing values for {', '.join(sorted(missing))}")
+        return self._build(self.case_template, self._tree, values)
+
+
+def suite_header(suite_template):
+    """返回输出套件的表头：test_case_infos 为新的空列表，其余部分与模板共享"""
+    header = dict(suite_template)
+    header['test_suite_info'] = dict(suite_template['test_suite_info'])
+    header['test_suite_info']['test_case_infos'] = []
+    return header
@@ -0,0 +1,133 @@
+import json
+import os
+import hashlib
+import logging
+from file_utils import atomic_write
+
+# 生成逻辑变化时递增，使旧缓存整体失效
+CACHE_VERSION = 2
+
+
+def file_fingerprint(path, previous=None):
+    """返回文件指纹 [size, mtime_ns, sha1]，文件不存在时返回 None
+
+    previous 为上次记录的指纹，size 和 mtime 均未变化时直接复用其中的哈希，避免重新读取文件。
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if previous and previous[0] == st.st_size and previous[1] == st.st_mtime_ns:
+        return list(previous)
+    digest = hashlib.sha1()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(block)
+    return [st.st_size, st.st_mtime_ns, digest.hexdigest()]
+
+
+def _same_content(current, stored):
+    # 只比较 size 和哈希，仅 mtime 变化（例如 touch、重新 checkout）仍视为命中
+    if current is None or stored is None:
+        return current is None and stored is None
+    return current[0] == stored[0] and current[2] == stored[2]
+
+
+class CaseCache:
+    """BenchICT_Config 的增量生成缓存
+
+    每个用例以 YAML 路径为键，记录 YAML、extend 文件、topic_list 文件的指纹、
+    所用 bag 的 trigger_time 以及模板哈希。所有输入均未变化时直接复用上次生成的 test_case_info。
+    条目数超过 max_entries 时按最近使用时间淘汰。
+    """
+
+    def __init__(self, cache_file, template, max_entries=20000):
+        self.cache_file = cache_file
+        self.max_entries = max_entries
+        self.template_hash = hashlib.sha1(
+            json.dumps([CACHE_VERSION, template], sort_keys=True).encode('utf-8')).hexdigest()
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        # 同一次运行中共享的 extend / topic_list 文件只取一次指纹
+        self._fingerprints = {}
+
+        self.run = 0
+        self.entries = {}
+        if os.path.exists(cache_file):
+            try:
+                with open(cache_file, 'r') as file:
+                    data = json.load(file)
+                if data.get('version') == CACHE_VERSION:
+                    self.run = data.get('run', 0)
+                    self.entries = data.get('entries', {})
+                else:
+                    logging.info(f"Case cache {cache_file} has an old format, rebuilding it")
+            except (OSError, ValueError) as e:
+                logging.warning(f"Warning: ignoring unreadable case cache {cache_file}: {e}")
+        self.run += 1
+
+    def _fingerprint(self, path, previous=None):
+        if path not in self._fingerprints:
+            self._fingerprints[path] = file_fingerprint(path, previous)
+        return self._fingerprints[path]
+
+    def lookup(self, yaml_file, bag_info):
+        entry = self.entries.get(yaml_file)
+        if entry is not None and self._is_valid(yaml_file, entry, bag_info):
+            entry['last_used'] = self.run
+            self.hits += 1
+            return entry['test_case_info']
+        self.misses += 1
+        return None
+
+    def _is_valid(self, yaml_file, entry, bag_info):
+        if entry.get('template') != self.template_hash:
+            return False
+        key = entry['key']
+        bag_md5 = entry['bag_md5']
+        if bag_md5 not in bag_info or bag_info[bag_md5] != entry['trigger_time']:
+            return False
+        for path, name in ((yaml_file, 'yaml'), (entry['extend_file'], 'extend'),
+                           (entry['topic_list_file'], 'topic_list')):
+            current = self._fingerprint(path, key[name])
+            if not _same_content(current, key[name]):
+                return False
+            # 内容相同但 mtime 变化时更新记录，下次可以走 stat 快速路径
+            key[name] = current
+        return True
+
+    def store(self, yaml_file, case_data, bag_info, test_case_info):
+        previous = self.entries.get(yaml_file, {}).get('key', {})
+        key = {}
+        for path, name in ((yaml_file, 'yaml'), (case_data['extend_file'], 'extend'),
+                           (case_data['topic_list_file'], 'topic_list')):
+            key[name] = self._fingerprint(path, previous.get(name))
+        self.entries[yaml_file] = {
+            "key": key,
+            "extend_file": case_data['extend_file'],
+            "topic_list_file": case_data['topic_list_file'],
+            "bag_md5": case_data['bag_md5'],
+            "trigger_time": bag_info[case_data['bag_md5']],
+            "template": self.template_hash,
+            "last_used": self.run,
+            "test_case_info": test_case_info
+        }
+
+    def _evict(self):
+        overflow = len(self.entries) - self.max_entries
+        if overflow <= 0:
+            return
+        oldest = sorted(self.entries, key=lambda name: self.entries[name]['last_used'])[:overflow]
+        for name in oldest:
+            del self.entries[name]
+        self.evicted += len(oldest)
+
+    def save(self):
+        self._evict()
+        with atomic_write(self.cache_file) as file:
+            json.dump({"version": CACHE_VERSION, "run": self.run, "entries": self.entries}, file)
+
+    def summary(self):
+        return (f"Case cache: {self.hits} hits, {self.misses} misses, {self.evicted} evicted, "
+                f"{len(self.entries)} entries in {self.cache_file}")
@@ -0,0 +1,217 @@
+import os
+import sys
+import json
+import logging
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from bag_store import close_bag_info
+from compact_suite import read_suite, save_suite
+from shard_suite import latest_suite
+from yaml_header import scan_yaml_header
+
+# 读取 YAML 顶层键时的线程数
+DEFAULT_WORKERS = 16
+
+
+def _normalize(path):
+    return os.path.normpath(os.path.abspath(path))
+
+
+def changed_paths_from_git(repo, commit_range):
+    """返回 git 提交范围（例如 HEAD~3..HEAD 或 A..B）内改动的文件绝对路径，重命名的旧路径和新路径都包括在内"""
+    top = subprocess.run(['git', 'rev-parse', '--show-toplevel'], cwd=repo, check=True,
+                         stdout=subprocess.PIPE, universal_newlines=True).stdout.strip()
+    output = subprocess.run(['git', 'diff', '--name-only', '--no-renames', '-z', commit_range], cwd=top, check=True,
+                            stdout=subprocess.PIPE, universal_newlines=True).stdout
+    return [_normalize(os.path.join(top, path)) for path in output.split('\0') if path]
+
+
+class CaseDependencyGraph:
+    """用例与其引用文件之间的依赖图
+
+    每个用例（以 YAML 路径为键）记录 YAML 本身、mfl_case_path、mfl_extend_path、play_topic_list
+    对应的文件和 bag_md5，同时保存文件 -> 用例、目录 -> 用例、bag_md5 -> 用例的反向索引，
+    给出改动的文件或目录即可找到受影响的用例。文件路径与 CaseProcessor.load_case 读取的路径一致。
+    """
+
+    def __init__(self, processor):
+        self.processor = processor
+        self.paths = processor.paths
+        self.case_list = []
+        self.case_codes = {}
+        self.files = {}
+        self.bag_md5s = {}
+        self.dependents = {}
+        # 目录 -> 依赖该目录下（任意层级）文件的用例，改动的路径为目录时不需要扫描全部依赖
+        self.directory_dependents = {}
+        self.bag_dependents = {}
+
+    def _case_file(self, mfl_case_path):
+        # 生成的配置中 spec 路径以 cases/ 开头，相对于 BASE_PATH 的上一级目录
+        base_path = self.paths['BASE_PATH']
+        if mfl_case_path.startswith("cases/"):
+            return os.path.join(os.path.dirname(base_path), mfl_case_path)
+        return os.path.join(base_path, mfl_case_path)
+
+    def add_case(self, yaml_file, header):
+        self.case_codes[yaml_file] = os.path.splitext(os.path.basename(yaml_file))[0]
+        files = [yaml_file]
+        if header.get('mfl_case_path'):
+            files.append(self._case_file(str(header['mfl_case_path'])))
+        for key in ('mfl_extend_path', 'play_topic_list'):
+            if header.get(key):
+                files.append(os.path.join(self.paths['BASE_PATH'], str(header[key])))
+        self.files[yaml_file] = [_normalize(path) for path in files]
+        for path in self.files[yaml_file]:
+            self.dependents.setdefault(path, set()).add(yaml_file)
+            directory, parent = path, os.path.dirname(path)
+            while parent != directory:
+                cases = self.directory_dependents.setdefault(parent, set())
+                if yaml_file in cases:
+                    # 同一用例的其他文件已经登记过这一级及以上的目录
+                    break
+                cases.add(yaml_file)
+                directory, parent = parent, os.path.dirname(parent)
+        if header.get('bag_md5'):
+            bag_md5 = header['bag_md5']
+            self.bag_md5s[yaml_file] = bag_md5
+            self.bag_dependents.setdefault(bag_md5, set()).add(yaml_file)
+
+    @classmethod
+    def from_case_set(cls, processor, workers=DEFAULT_WORKERS):
+        """读取 case_list.json 和每个用例 YAML 的顶层键建立依赖图，不解析 extend / topic_list 文件"""
+        graph = cls(processor)
+        with open(graph.paths['CASE_LIST_JSON'], 'r') as file:
+            case_list = json.load(file)['case_list']
+        graph.case_list = [_normalize(os.path.join(graph.paths['YAML_DIR'], yaml_file)) for yaml_file in case_list]
+
+        def read_header(yaml_file):
+            try:
+                return scan_yaml_header(yaml_file)[0]
+            except (OSError, ValueError) as e:
+                # YAML 不存在或无法解析时只依赖 YAML 本身，生成时会给出具体的错误
+                logging.warning(f"Warning: unable to read {yaml_file}: {e}")
+                return {}
+
+        unique = list(dict.fromkeys(graph.case_list))
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            for yaml_file, header in zip(unique, executor.map(read_header, unique)):
+                graph.add_case(yaml_file, header)
+        return graph
+
+    def affected_by_paths(self, changed_paths):
+        """返回受改动文件影响的用例 YAML 路径集合；改动的路径为目录时包括其中的所有文件"""
+        affected = set()
+        for path in map(_normalize, changed_paths):
+            affected.update(self.dependents.get(path, ()))
+            affected.update(self.directory_dependents.get(path, ()))
+        return affected
+
+    def affected_by_bags(self, md5s):
+        affected = set()
+        for md5 in md5s:
+            affected.update(self.bag_dependents.get(md5, ()))
+        return affected
+
+    def case_list_changed(self, changed_paths):
+        return _normalize(self.paths['CASE_LIST_JSON']) in map(_normalize, changed_paths)
+
+    def bag_registry_changed(self, changed_paths):
+        registry = self.processor.bag_db or self.paths['BAG_JSON_PATH']
+        return _normalize(registry) in map(_normalize, changed_paths)
+
+    def changed_bags(self, suite, bag_info):
+        """比较现有套件中的 trigger_time 与当前 bag 注册表，返回 trigger_time 有变化的 bag_md5"""
+        changed = set()
+        for case in suite['test_suite_info']['test_case_infos']:
+            for bag_md5 in case.get('bag_urls') or []:
+                spec_names = case.get('mfl_function_spec', {}).get('spec_names') or [{}]
+                if bag_md5 not in bag_info or bag_info[bag_md5] != spec_names[0].get('trigger_time'):
+                    changed.add(bag_md5)
+        return changed
+
+
+def rebuild_suite(processor, graph, suite, affected, bag_info):
+    """在现有套件中只重新生成 affected 中的用例
+
+    结果按当前 case_list 的顺序排列：新增的用例和 affected 中的用例重新生成，其余用例沿用套件中的条目，
+    已从 case_list 删除的用例被去掉，与完整重新生成的结果相同。返回 (新的套件, 重新生成的用例数)。
+    """
+    existing = {case['case_code']: case for case in suite['test_suite_info']['test_case_infos']}
+    rebuilt = {}
+    cases = []
+    for yaml_file in graph.case_list:
+        case_code = graph.case_codes[yaml_file]
+        if yaml_file not in affected and case_code in existing:
+            cases.append(existing[case_code])
+            continue
+        if yaml_file not in rebuilt:
+            rebuilt[yaml_file] = processor.process_yaml(yaml_file, bag_info)
+        if rebuilt[yaml_file] is not None:
+            cases.append(rebuilt[yaml_file])
+    result = dict(suite)
+    result['test_suite_info'] = dict(suite['test_suite_info'])
+    result['test_suite_info']['test_case_infos'] = cases
+    return result, len(rebuilt)
+
+
+if __name__ == "__main__":
+    from BenchICT_Config import CaseProcessor
+
+    parser = argparse.ArgumentParser(description="根据改动的文件找出受影响的用例，并只在现有的生成套件中重新生成这些用例")
+    parser.add_argument('--config', default='../config/test_case_template.json',
+                        help="配置文件路径，相对路径以脚本所在目录为基准")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--paths', nargs='+', help="改动的文件或目录，相对路径以当前目录为基准")
+    source.add_argument('--git-range', help="function_spec 仓库中的提交范围，例如 HEAD~1..HEAD")
+    parser.add_argument('--repo', default=None, help="--git-range 使用的仓库，默认为工具链所在的仓库")
+    parser.add_argument('--suite', default=None, help="现有的生成套件，默认使用 OUTPUT_DIR 中最新的套件")
+    parser.add_argument('--rebuild', action='store_true', help="在套件中重新生成受影响的用例并写回")
+    parser.add_argument('--output', default=None, help="--rebuild 的输出路径，默认覆盖 --suite")
+    parser.add_argument('--json', action='store_true', help="以 JSON 格式输出受影响的用例")
+    args = parser.parse_args()
+
+    bag_info = None
+    try:
+        processor = CaseProcessor(args.config)
+        if args.git_range:
+            changed = changed_paths_from_git(args.repo or processor.parent_dir, args.git_range)
+        else:
+            changed = [_normalize(path) for path in args.paths]
+        logging.info(f"{len(changed)} changed paths")
+        graph = CaseDependencyGraph.from_case_set(processor)
+        affected = graph.affected_by_paths(changed)
+
+        suite_path = args.suite
+        if suite_path is None and (args.rebuild or graph.bag_registry_changed(changed)):
+            suite_path = latest_suite(processor.paths['OUTPUT_DIR'])
+        suite, case_template = read_suite(suite_path) if suite_path else (None, None)
+        if graph.bag_registry_changed(changed):
+            bag_info = processor.load_bag_info()
+            affected |= graph.affected_by_bags(graph.changed_bags(suite, bag_info))
+        if suite is not None:
+            # case_list 中新增的用例在套件中还没有条目
+            existing = {case['case_code'] for case in suite['test_suite_info']['test_case_infos']}
+            affected |= {yaml_file for yaml_file in graph.case_list if graph.case_codes[yaml_file] not in existing}
+
+        affected_codes = sorted({graph.case_codes[yaml_file] for yaml_file in affected})
+        logging.info(f"{len(affected_codes)} of {len(graph.case_codes)} cases affected")
+        if args.json:
+            print(json.dumps({"changed_paths": changed, "case_codes": affected_codes,
+                              "case_list_changed": graph.case_list_changed(changed)}, indent=2, ensure_ascii=False))
+        else:
+            for case_code in affected_codes:
+                print(case_code)
+
+        if args.rebuild:
+            bag_info = bag_info if bag_info is not None else processor.load_bag_info()
+            result, count = rebuild_suite(processor, graph, suite, affected, bag_info)
+            output_path = args.output or suite_path
+            save_suite(output_path, result, case_template)
+            logging.info(f"Regenerated {count} cases in {output_path}")
+    except Exception as e:
+        logging.error(f"An error occurred: {type(e).__name__}: {e}")
+        sys.exit(1)
+    finally:
+        close_bag_info(bag_info)
@@ -0,0 +1,334 @@
+import os
+import json
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+import logging
+from bag_store import TriggerTimeLookup, close_bag_info
+from case_builder import suite_header
+
+# inotify 事件掩码，见 <sys/inotify.h>
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_ATTRIB | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+_EVENT = struct.Struct('iIII')
+
+# 收到第一个事件后，连续 DEBOUNCE_SECONDS 没有新事件才开始重新生成，最多等待 MAX_DEBOUNCE_SECONDS
+DEBOUNCE_SECONDS = 0.2
+MAX_DEBOUNCE_SECONDS = 2.0
+POLL_INTERVAL = 1.0
+# 表示需要全部重新检查（inotify 队列溢出等）
+RESCAN = object()
+
+
+class InotifyWatcher:
+    """通过 ctypes 调用 inotify 递归监视目录，不依赖第三方库；不支持的系统在构造时抛出 OSError"""
+
+    def __init__(self, directories):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError(errno.ENOSYS, "inotify is not available")
+        self._libc = libc
+        self._fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._paths = {}
+        for directory in directories:
+            self._add_tree(directory)
+
+    def _add_watch(self, directory):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            error = ctypes.get_errno()
+            # 目录在扫描和添加之间被删除时忽略
+            if error in (errno.ENOENT, errno.ENOTDIR):
+                return
+            raise OSError(error, f"inotify_add_watch failed for {directory}")
+        self._paths[wd] = directory
+
+    def _add_tree(self, directory):
+        for root, dirs, _ in os.walk(directory):
+            self._add_watch(root)
+
+    def close(self):
+        os.close(self._fd)
+
+    def wait(self, timeout):
+        """等待最多 timeout 秒，返回发生变化的路径集合（可能包含 RESCAN）"""
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set()
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            name = data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b'\0')
+            offset += _EVENT.size + length
+            if mask & IN_Q_OVERFLOW:
+                changed.add(RESCAN)
+                continue
+            directory = self._paths.get(wd)
+            if directory is None:
+                continue
+            if mask & IN_IGNORED:
+                del self._paths[wd]
+                continue
+            path = os.path.join(directory, os.fsdecode(name)) if name else directory
+            if mask & IN_ISDIR:
+                # 新建或移入的目录需要加入监视，目录中已有的文件全部视为变化
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self._add_tree(path)
+                changed.add(RESCAN)
+                continue
+            changed.add(path)
+        return changed
+
+
+class PollingWatcher:
+    """不支持 inotify 时按 mtime 和 size 轮询目录"""
+
+    def __init__(self, directories, interval=POLL_INTERVAL):
+        self.directories = directories
+        self.interval = interval
+        self._snapshot = self._scan()
+
+    def _scan(self):
+        snapshot = {}
+        for directory in self.directories:
+            for root, _, files in os.walk(directory):
+                for name in files:
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    snapshot[path] = (st.st_mtime_ns, st.st_size)
+        return snapshot
+
+    def close(self):
+        pass
+
+    def wait(self, timeout):
+        time.sleep(min(timeout, self.interval))
+        snapshot = self._scan()
+        changed = {path for path in snapshot.keys() | self._snapshot.keys()
+                   if snapshot.get(path) != self._snapshot.get(path)}
+        self._snapshot = snapshot
+        return changed
+
+
+def create_watcher(directories, polling=False, interval=POLL_INTERVAL):
+    if not polling:
+        try:
+            return InotifyWatcher(directories)
+        except OSError as e:
+            logging.warning(f"Warning: inotify is not available ({e}), polling every {interval}s instead")
+    return PollingWatcher(directories, interval)
+
+
+class WatchSession:
+    """--watch 模式：用例集常驻内存，输入文件变化时只重新生成受影响的用例并原子重写输出
+
+    监视 YAML_DIR、BASE_PATH 以及 CASE_LIST_JSON、BAG_JSON_PATH 所在的目录。每个用例记录它的 YAML、
+    extend、topic_list 文件和 bag_md5，变化的文件通过反向索引找到对应的用例。case_list 变化时增删用例，
+    bag 注册表变化时只重新生成 trigger_time 有变化的用例。有用例生成失败时不写输出，修复后再写。
+    """
+
+    def __init__(self, processor, debounce=DEBOUNCE_SECONDS, polling=False, interval=POLL_INTERVAL):
+        self.processor = processor
+        self.paths = processor.paths
+        self.debounce = debounce
+        self.polling = polling
+        self.interval = interval
+        self.case_list = []
+        self.bag_info = {}
+        # yaml_file -> load_case 的结果（YAML 不存在时为 None）、test_case_info 与错误信息
+        self.case_data = {}
+        self.infos = {}
+        self.errors = {}
+        # 文件路径 -> 引用该文件的 yaml_file 集合
+        self.dependents = {}
+
+    @staticmethod
+    def _normalize(path):
+        return os.path.normpath(os.path.abspath(path))
+
+    def _read_case_list(self):
+        with open(self.paths['CASE_LIST_JSON'], 'r') as file:
+            case_list = json.load(file)['case_list']
+        return [self._normalize(os.path.join(self.paths['YAML_DIR'], yaml_file)) for yaml_file in case_list]
+
+    def _unlink(self, yaml_file):
+        data = self.case_data.get(yaml_file)
+        if data:
+            for path in (data['extend_file'], data['topic_list_file']):
+                cases = self.dependents.get(self._normalize(path))
+                if cases is not None:
+                    cases.discard(yaml_file)
+
+    def _load(self, yaml_file):
+        self._unlink(yaml_file)
+        self.infos.pop(yaml_file, None)
+        self.errors.pop(yaml_file, None)
+        try:
+            data = self.processor.load_case(yaml_file)
+        except Exception as e:
+            self.case_data[yaml_file] = None
+            self.errors[yaml_file] = f"{type(e).__name__}: {e}"
+            return
+        self.case_data[yaml_file] = data
+        if data is not None:
+            for path in (data['extend_file'], data['topic_list_file']):
+                self.dependents.setdefault(self._normalize(path), set()).add(yaml_file)
+
+    def _build(self, yaml_file):
+        data = self.case_data.get(yaml_file)
+        self.infos.pop(yaml_file, None)
+        if data is None:
+            return
+        try:
+            self.infos[yaml_file] = self.processor.build_test_case_info(data, self.bag_info)
+            self.errors.pop(yaml_file, None)
+        except ValueError as e:
+            self.errors[yaml_file] = f"{type(e).__name__}: {e}"
+
+    def _forget(self, yaml_file):
+        self._unlink(yaml_file)
+        for table in (self.case_data, self.infos, self.errors):
+            table.pop(yaml_file, None)
+
+    def _bag_registry_paths(self):
+        # 使用 SQLite 注册表时写入可能只落在 WAL 文件中
+        if self.processor.bag_db:
+            db_path = self._normalize(self.processor.bag_db)
+            return {db_path, db_path + '-wal'}
+        return {self._normalize(self.paths['BAG_JSON_PATH'])}
+
+    def _prefetch_bags(self):
+        # 使用 bag 数据库时一次查询全部用例的 bag_md5
+        if isinstance(self.bag_info, TriggerTimeLookup):
+            self.bag_info.prefetch({data['bag_md5'] for data in self.case_data.values() if data is not None})
+
+    def load_all(self):
+        close_bag_info(self.bag_info)
+        self.bag_info = self.processor.load_bag_info()
+        self.case_list = self._read_case_list()
+        self.case_data, self.infos, self.errors, self.dependents = {}, {}, {}, {}
+        for yaml_file in dict.fromkeys(self.case_list):
+            self._load(yaml_file)
+        self._prefetch_bags()
+        for yaml_file in self.case_data:
+            self._build(yaml_file)
+
+    def write_output(self):
+        if self.errors:
+            for yaml_file, error in self.errors.items():
+                logging.error(f"Failed case {yaml_file}: {error}")
+            logging.error(f"{len(self.errors)} cases failed, output not updated")
+            return False
+        with self.processor._open_writer(suite_header(self.processor.test_case_template)) as writer:
+            for yaml_file in self.case_list:
+                if yaml_file in self.infos:
+                    writer.write_case(self.infos[yaml_file])
+        return True
+
+    def apply_changes(self, changed):
+        """根据变化的路径更新内存中的用例，返回重新生成的用例数"""
+        if RESCAN in changed:
+            logging.info("Rescanning the whole case set")
+            self.load_all()
+            return len(self.case_data)
+        case_list_json = self._normalize(self.paths['CASE_LIST_JSON'])
+        reload, rebuild = set(), set()
+
+        if case_list_json in changed:
+            case_list = self._read_case_list()
+            for yaml_file in set(self.case_list) - set(case_list):
+                self._forget(yaml_file)
+            reload.update(set(case_list) - set(self.case_list))
+            self.case_list = case_list
+
+        if changed & self._bag_registry_paths():
+            previous = self.bag_info
+            self.bag_info = self.processor.load_bag_info()
+            self._prefetch_bags()
+            for yaml_file, data in self.case_data.items():
+                if data is not None and previous.get(data['bag_md5']) != self.bag_info.get(data['bag_md5']):
+                    rebuild.add(yaml_file)
+            close_bag_info(previous)
+
+        for path in changed:
+            if path in self.case_data:
+                reload.add(path)
+            reload.update(self.dependents.get(path, ()))
+
+        for yaml_file in reload:
+            self._load(yaml_file)
+        for yaml_file in reload | rebuild:
+            self._build(yaml_file)
+        return len(reload | rebuild)
+
+    def _collect(self, watcher):
+        """等待第一批变化，然后继续收集，直到 debounce 秒内没有新的变化"""
+        changed = set()
+        while not changed:
+            changed = {self._filter(path) for path in watcher.wait(self.interval)} - {None}
+        deadline = time.monotonic() + MAX_DEBOUNCE_SECONDS
+        while time.monotonic() < deadline:
+            more = {self._filter(path) for path in watcher.wait(self.debounce)} - {None}
+            if not more:
+                break
+            changed |= more
+        return changed
+
+    def _filter(self, path):
+        if path is RESCAN:
+            return path
+        # 编辑器和 atomic_write 的临时文件不影响结果
+        name = os.path.basename(path)
+        if name.startswith('.') or name.endswith(('~', '.swp', '.tmp')):
+            return None
+        return self._normalize(path)
+
+    def run(self):
+        start = time.perf_counter()
+        self.load_all()
+        if self.write_output():
+            logging.info(f"Generated {len(self.infos)} cases in {(time.perf_counter() - start) * 1000:.0f} ms, "
+                         f"output {self.processor.OUTPUT_JSON}")
+        directories = [self.paths['YAML_DIR'], self.paths['BASE_PATH'], os.path.dirname(self.paths['CASE_LIST_JSON'])]
+        directories += [os.path.dirname(path) for path in self._bag_registry_paths()]
+        # 去掉重复的和包含在其他目录中的目录
+        directories = sorted({self._normalize(directory) for directory in directories})
+        directories = [directory for directory in directories
+                       if not any(directory.startswith(other + os.sep) for other in directories if other != directory)]
+        watcher = create_watcher(directories, self.polling, self.interval)
+        logging.info(f"Watching {', '.join(directories)} with {type(watcher).__name__}, press Ctrl+C to stop")
+        try:
+            while True:
+                changed = self._collect(watcher)
+                start = time.perf_counter()
+                count = self.apply_changes(changed)
+                if count and self.write_output():
+                    logging.info(f"{len(changed)} changed paths, regenerated {count} cases in "
+                                 f"{(time.perf_counter() - start) * 1000:.1f} ms")
+        except KeyboardInterrupt:
+            logging.info("Watch mode stopped")
+        finally:
+            watcher.close()
+            close_bag_info(self.bag_info)
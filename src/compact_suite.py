@@ -0,0 +1,210 @@
+import copy
+import gzip
+import json
+import argparse
+from suite_writer import open_suite_output
+
+# 紧凑格式的标识和版本，格式变化时递增 COMPACT_VERSION
+COMPACT_FORMAT = "benchict-compact"
+COMPACT_VERSION = 1
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+def _escape(key):
+    # JSON Pointer（RFC 6901）的转义
+    return key.replace('~', '~0').replace('/', '~1')
+
+
+def _unescape(token):
+    return token.replace('~1', '/').replace('~0', '~')
+
+
+def _same_type(a, b):
+    # True == 1、1 == 1.0，只比较值会把它们当成相同而丢失类型
+    return type(a) is type(b)
+
+
+def _diff(template, value, path, delta):
+    if _same_type(template, value):
+        if isinstance(value, dict):
+            # 键和顺序都相同时逐个比较，否则整体替换以保留键的顺序
+            if list(template) == list(value):
+                for key in value:
+                    _diff(template[key], value[key], f"{path}/{_escape(key)}", delta)
+                return
+        elif isinstance(value, list):
+            if len(template) == len(value):
+                for index, (template_item, item) in enumerate(zip(template, value)):
+                    _diff(template_item, item, f"{path}/{index}", delta)
+                return
+        elif template == value:
+            return
+    delta[path] = value
+
+
+def case_delta(case_template, test_case_info):
+    """返回 test_case_info 相对 case_template 的差异 {JSON Pointer: 新值}，只包含不同的叶子或子树"""
+    delta = {}
+    _diff(case_template, test_case_info, "", delta)
+    return delta
+
+
+def apply_case_delta(case_template, delta):
+    """case_delta 的逆操作，返回新的 test_case_info，不修改 case_template"""
+    if "" in delta:
+        return copy.deepcopy(delta[""])
+    test_case_info = copy.deepcopy(case_template)
+    for path, value in delta.items():
+        tokens = [_unescape(token) for token in path.split('/')[1:]]
+        target = test_case_info
+        for token in tokens[:-1]:
+            target = target[int(token)] if isinstance(target, list) else target[token]
+        last = tokens[-1]
+        if isinstance(target, list):
+            target[int(last)] = value
+        else:
+            target[last] = value
+    return test_case_info
+
+
+def _suite_header(suite):
+    # test_case_infos 用 None 占位，展开时保持它在 test_suite_info 中的位置
+    header = dict(suite)
+    header['test_suite_info'] = dict(suite['test_suite_info'])
+    header['test_suite_info']['test_case_infos'] = None
+    return header
+
+
+def is_compact(data):
+    return isinstance(data, dict) and data.get('format') == COMPACT_FORMAT
+
+
+def default_case_template(suite):
+    cases = suite['test_suite_info']['test_case_infos']
+    return cases[0] if cases else {}
+
+
+def compact_suite(suite, case_template=None):
+    """把完整的测试套件转换为紧凑格式：套件表头和用例模板只保存一次，每个用例只保存与模板的差异
+
+    case_template 默认使用第一个用例；BenchICT_Config 使用配置文件中的用例模板。
+    """
+    cases = suite['test_suite_info']['test_case_infos']
+    if case_template is None:
+        case_template = default_case_template(suite)
+    return {
+        "format": COMPACT_FORMAT,
+        "version": COMPACT_VERSION,
+        "suite": _suite_header(suite),
+        "case_template": case_template,
+        "case_deltas": [case_delta(case_template, case) for case in cases]
+    }
+
+
+def expand_suite(data):
+    """compact_suite 的逆操作，重建与原套件完全相同（包括键的顺序）的 JSON 数据"""
+    if data.get('version') != COMPACT_VERSION:
+        raise ValueError(f"Unsupported compact suite version {data.get('version')}, expected {COMPACT_VERSION}")
+    suite = dict(data['suite'])
+    suite['test_suite_info'] = dict(suite['test_suite_info'])
+    case_template = data['case_template']
+    suite['test_suite_info']['test_case_infos'] = [apply_case_delta(case_template, delta)
+                                                   for delta in data['case_deltas']]
+    return suite
+
+
+def read_json(path):
+    """读取 JSON 文件，按文件头判断是否为 gzip 压缩"""
+    with open(path, 'rb') as file:
+        compressed = file.read(len(GZIP_MAGIC)) == GZIP_MAGIC
+    opener = gzip.open if compressed else open
+    with opener(path, 'rt', encoding='utf-8') as file:
+        return json.load(file)
+
+
+def read_suite(path):
+    """读取完整或紧凑格式、可选 gzip 压缩的套件文件，返回 (完整的套件, 紧凑格式的用例模板或 None)"""
+    data = read_json(path)
+    if is_compact(data):
+        return expand_suite(data), data['case_template']
+    return data, None
+
+
+def load_suite(path):
+    return read_suite(path)[0]
+
+
+def save_suite(path, suite, case_template=None, ensure_ascii=True):
+    """原子写入套件文件：指定 case_template 时写为紧凑格式，路径以 .gz 结尾时 gzip 压缩"""
+    if case_template is not None:
+        with CompactSuiteWriter(path, suite, case_template, ensure_ascii) as writer:
+            for test_case_info in suite['test_suite_info']['test_case_infos']:
+                writer.write_case(test_case_info)
+        return
+    with open_suite_output(path) as file:
+        json.dump(suite, file, indent=2, ensure_ascii=ensure_ascii)
+
+
+class CompactSuiteWriter:
+    """逐个写出用例的紧凑格式写入器，接口与 StreamingSuiteWriter 相同
+
+    表头和用例模板写在文件开头，之后每个用例的差异占一行，内存占用与用例总数无关。
+    """
+
+    def __init__(self, output_path, suite_header, case_template, ensure_ascii=True):
+        self.output_path = output_path
+        self.case_template = case_template
+        self.ensure_ascii = ensure_ascii
+        self.case_count = 0
+        self._context = open_suite_output(output_path)
+        self._file = self._context.__enter__()
+        self._file.write(
+            f'{{"format": {json.dumps(COMPACT_FORMAT)}, "version": {COMPACT_VERSION},\n'
+            f'"suite": {self._dumps(_suite_header(suite_header))},\n'
+            f'"case_template": {self._dumps(case_template)},\n'
+            f'"case_deltas": [')
+
+    def _dumps(self, value):
+        return json.dumps(value, separators=(',', ':'), ensure_ascii=self.ensure_ascii)
+
+    def write_case(self, test_case_info):
+        separator = ',\n' if self.case_count else '\n'
+        self._file.write(separator + self._dumps(case_delta(self.case_template, test_case_info)))
+        self.case_count += 1
+
+    def close(self):
+        self._file.write('\n]}\n')
+        self._context.__exit__(None, None, None)
+
+    def abort(self):
+        error = RuntimeError(f"Aborted writing {self.output_path}")
+        self._context.__exit__(RuntimeError, error, None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="在完整格式和紧凑格式（模板 + 逐用例差异）之间转换生成的测试套件")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    compact_parser = subparsers.add_parser('compact', help="转换为紧凑格式，输出路径以 .gz 结尾时 gzip 压缩")
+    compact_parser.add_argument('input')
+    compact_parser.add_argument('output')
+    expand_parser = subparsers.add_parser('expand', help="还原为与 BenchICT_Config.py 输出相同的完整 JSON")
+    expand_parser.add_argument('input')
+    expand_parser.add_argument('output')
+    args = parser.parse_args()
+
+    suite, case_template = read_suite(args.input)
+    if args.command == 'compact':
+        save_suite(args.output, suite, case_template or default_case_template(suite))
+    else:
+        save_suite(args.output, suite)
+    print(f"Saved {len(suite['test_suite_info']['test_case_infos'])} cases to {args.output}")
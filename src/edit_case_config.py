@@ -1,10 +1,241 @@
 import json
 import os
+import sys
+import gzip
+import time
 import logging
+import argparse
+from collections import Counter
 from datetime import datetime
+from compact_suite import read_suite, save_suite
+from file_utils import atomic_write
+from instrumentation import Metrics, add_arguments as add_metrics_arguments
+from log_setup import log_file_path, setup_logging, add_arguments as add_log_arguments
+from suite_stream import dumps_case, iter_suite_parts
+from topic_index import TopicIndex, case_has_topic
+
+# case_codes 中以这些前缀开头的项按 topic 选择用例，例如 input:/mla/egopose
+TOPIC_SELECTORS = {'input': 'input', 'output': 'output', 'remap': 'remap', 'topic': 'any'}
+
+
+class _TopicList:
+    """包装用例中的 topic 列表：保持原有顺序，成员判断使用 Counter，删除延迟到 flush 时一次完成"""
+
+    def __init__(self, items):
+        self.items = items
+        self.counts = Counter(items)
+        self.removed = Counter()
+
+    def __contains__(self, topic):
+        return self.counts[topic] > 0
+
+    def add(self, topic):
+        self.items.append(topic)
+        self.counts[topic] += 1
+
+    def remove(self, topic):
+        # 与 list.remove 一致，只删除最早出现的一个
+        self.counts[topic] -= 1
+        self.removed[topic] += 1
+
+    def to_list(self):
+        if not self.removed:
+            return list(self.items)
+        skip = Counter(self.removed)
+        result = []
+        for topic in self.items:
+            if skip[topic] > 0:
+                skip[topic] -= 1
+            else:
+                result.append(topic)
+        return result
+
+    def flush(self):
+        if self.removed:
+            self.items[:] = self.to_list()
+            self.removed.clear()
+
+
+def parse_operation(line):
+    """解析批量编辑脚本中的一行
+
+    支持 JSON 对象（{"case_codes": [...], "action": "add", "topic_type": "input", "topics": [...]}）
+    或空白分隔的文本：<add|remove> <input|output> <case_code,...|all> <topic,...>
+    case_code 也可以写成 input:/topic、output:/topic、remap:/topic、topic:/topic，按 topic 选择用例。
+    """
+    if line.startswith('{'):
+        operation = json.loads(line)
+    else:
+        parts = line.split(None, 3)
+        if len(parts) != 4:
+            raise ValueError(f"无法解析的编辑操作: {line}")
+        operation = {"action": parts[0], "topic_type": parts[1], "case_codes": parts[2], "topics": parts[3]}
+    return normalize_operation(operation)
+
+
+def normalize_operation(operation):
+    case_codes = operation['case_codes']
+    topics = operation['topics']
+    if isinstance(case_codes, str):
+        case_codes = case_codes.split(',')
+    if isinstance(topics, str):
+        topics = topics.split(',')
+    action = operation['action'].strip().lower()
+    topic_type = operation['topic_type'].strip().lower()
+    if action not in ['add', 'remove']:
+        raise ValueError(f"无效的操作类型: {action}")
+    if topic_type not in ['input', 'output']:
+        raise ValueError(f"无效的Topic列表类型: {topic_type}")
+    return {
+        "case_codes": [code.strip() for code in case_codes if code.strip()],
+        "action": action,
+        "topic_type": topic_type,
+        "topics": [topic.strip().strip('"') for topic in topics if topic.strip()]
+    }
+
+
+def load_operations(file):
+    """从文件对象读取批量编辑脚本：整个文件为 JSON 数组，或每行一个操作（# 开头为注释）"""
+    text = file.read()
+    if text.lstrip().startswith('['):
+        return [normalize_operation(operation) for operation in json.loads(text)]
+    operations = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line and not line.startswith('#'):
+            operations.append(parse_operation(line))
+    return operations
+
+
+def save_json(file_path, data, case_template=None):
+    # 先写临时文件再替换，写入失败时原文件保持不变；读取时为紧凑格式（case_template 不为 None）的仍写回紧凑格式
+    if case_template is None and not file_path.endswith('.gz'):
+        with atomic_write(file_path, encoding='utf-8') as file:
+            json.dump(data, file, indent=2, ensure_ascii=False)
+    else:
+        save_suite(file_path, data, case_template, ensure_ascii=False)
+
+
+def edit_file(file_path, operations, output_path=None, metrics=None):
+    """批量编辑的 Python 接口：读取套件文件，一次应用所有操作后原子写回（或写入 output_path）
+
+    套件文件可以是紧凑格式或 gzip 压缩的（见 compact_suite.py），写回时保持原来的格式。
+    """
+    metrics = metrics or Metrics()
+    with metrics.phase('load_json', io=True):
+        data, case_template = read_suite(file_path)
+    with metrics.phase('apply_operations'):
+        JsonModifier.apply_operations(data, [normalize_operation(operation) for operation in operations], metrics)
+    with metrics.phase('save_json', io=True):
+        save_json(output_path or file_path, data, case_template)
+    return data
+
+class StreamingSuiteEditor:
+    """流式编辑完整格式的套件文件，内存占用由最大的单个用例决定，与文件大小无关
+
+    由 suite_stream.iter_suite_parts 增量扫描输入，只解码可能被编辑操作选中的用例：case_code 匹配、
+    case_codes 为 all，或按 topic 选择时元素的原始字节中包含该 topic。每个用例依次应用全部操作，
+    结果与 JsonModifier.apply_operations 对整个套件的编辑相同；未改动的用例和其余字节原样复制，
+    改动的用例按原来的缩进重新序列化。
+    """
+
+    def __init__(self, operations, metrics=None):
+        self.operations = [normalize_operation(operation) for operation in operations]
+        self.metrics = metrics or Metrics()
+        # 逐用例调用 apply_operations 时不记录逐操作的延迟
+        self._case_metrics = Metrics()
+        self.selectors = []
+        self.case_codes = set()
+        self.topic_patterns = []
+        for operation in self.operations:
+            selectors = []
+            for case_code in operation["case_codes"]:
+                prefix, _, topic = case_code.partition(':')
+                if topic and prefix in TOPIC_SELECTORS:
+                    selectors.append((case_code, topic, TOPIC_SELECTORS[prefix]))
+                    # 文件中的字符串可能是 UTF-8 或 \uXXXX 转义的形式
+                    self.topic_patterns.append(topic.encode('utf-8'))
+                    self.topic_patterns.append(json.dumps(topic)[1:-1].encode('ascii'))
+                elif case_code != 'all':
+                    self.case_codes.add(case_code)
+            self.selectors.append(selectors)
+        self.any_case = any(operation["case_codes"] == ['all'] for operation in self.operations)
+        self.found = set()
+        self.selected = Counter()
+        self.decoded = 0
+        self.modified = 0
+
+    def _may_select(self, raw, case_code):
+        if self.any_case or case_code in self.case_codes:
+            return True
+        return any(pattern in raw for pattern in self.topic_patterns)
+
+    def edit_case(self, test_case_info):
+        """依次对单个用例应用全部操作，返回是否有改动"""
+        suite = {"test_suite_info": {"test_case_infos": [test_case_info]}}
+        simulator = test_case_info["config"]["function_simulator"]
+        original = (list(simulator["input_topic_list"]), list(simulator["output_topic_list"]))
+        case_code = test_case_info["case_code"]
+        for index, (operation, selectors) in enumerate(zip(self.operations, self.selectors)):
+            selected = operation["case_codes"] == ['all'] or case_code in operation["case_codes"]
+            if case_code in operation["case_codes"]:
+                self.found.add(case_code)
+            # 只有一个用例，直接检查它的 topic 列表，不需要建立索引
+            for selector, topic, kind in selectors:
+                if case_has_topic(test_case_info, topic, kind):
+                    self.selected[(index, selector)] += 1
+                    selected = True
+            if selected:
+                JsonModifier.apply_operations(suite, [dict(operation, case_codes=[case_code])], self._case_metrics)
+        return (simulator["input_topic_list"], simulator["output_topic_list"]) != original
+
+    def edit_stream(self, input_file, output_file):
+        for part in iter_suite_parts(input_file):
+            if part[0] == 'raw':
+                output_file.write(part[1])
+                continue
+            _, raw, case_code, indent = part
+            if not self._may_select(raw, case_code):
+                output_file.write(raw)
+                continue
+            self.decoded += 1
+            test_case_info = json.loads(raw)
+            if self.edit_case(test_case_info):
+                self.modified += 1
+                output_file.write(dumps_case(test_case_info, indent).encode('utf-8'))
+            else:
+                output_file.write(raw)
+
+    def edit(self, file_path, output_path=None):
+        """编辑 file_path，先写入临时文件再 rename 到 output_path（默认覆盖原文件）；路径以 .gz 结尾时按 gzip 读写"""
+        output_path = output_path or file_path
+        opener = gzip.open if file_path.endswith('.gz') else open
+        with self.metrics.phase('stream_edit', io=True):
+            with opener(file_path, 'rb') as input_file, atomic_write(output_path, 'wb') as output_file:
+                if output_path.endswith('.gz'):
+                    with gzip.GzipFile(fileobj=output_file, mode='wb', mtime=0) as compressed:
+                        self.edit_stream(input_file, compressed)
+                else:
+                    self.edit_stream(input_file, output_file)
+        for case_code in sorted(self.case_codes - self.found):
+            logging.warning(f"未找到测试用例: {case_code}")
+        for index, selectors in enumerate(self.selectors):
+            for selector, _, _ in selectors:
+                logging.info(f"{selector} 选中 {self.selected[(index, selector)]} 个测试用例")
+        self.metrics.count('cases_decoded', self.decoded)
+        self.metrics.count('cases_modified', self.modified)
+        logging.info(f"流式编辑完成：解码 {self.decoded} 个测试用例，修改 {self.modified} 个")
+
+
+def edit_file_streaming(file_path, operations, output_path=None, metrics=None):
+    """edit_file 的流式版本，只支持完整格式（可为 gzip 压缩）的套件文件"""
+    editor = StreamingSuiteEditor(operations, metrics)
+    editor.edit(file_path, output_path)
+    return editor
 
 class JsonModifier:
-    def __init__(self, config_path='../config/test_case_template.json'):
+    def __init__(self, config_path='../config/test_case_template.json', metrics=None, log_format='text',
+                 stream=False):
         # 获取脚本所在的目录
         self.script_dir = os.path.dirname(os.path.abspath(__file__))
         # 获取 BenchICT_Scripts 目录
@@ -36,19 +267,27 @@ class JsonModifier:
                 self.paths[key] = os.path.normpath(os.path.join(self.bench_ict_dir, path))
         
         self.TIMESTAMP = datetime.now().strftime("%Y%m%d_%H%M%S")
+        # 阶段耗时与逐个编辑操作的延迟记录，见 instrumentation.py
+        self.metrics = metrics or Metrics('edit_case_config')
+        self.log_format = log_format
+        # 流式编辑：不把整个套件读入内存，见 StreamingSuiteEditor
+        self.stream = stream
         self._setup_logging()
 
     def _setup_logging(self):
-        os.makedirs(self.paths['LOG_DIR'], exist_ok=True)
-        log_file = os.path.join(self.paths['LOG_DIR'], f"json_modification_{self.TIMESTAMP}.log")
-        logging.basicConfig(filename=log_file, level=logging.INFO,
-                            format='%(asctime)s - %(levelname)s - %(message)s')
+        log_file = log_file_path(os.path.join(self.paths['LOG_DIR'], f"json_modification_{self.TIMESTAMP}.log"),
+                                 self.log_format)
+        setup_logging(log_file, self.log_format)
         logging.info(f"Log file created at: {log_file}")
 
     @staticmethod
     def check_duplicates(case, topic_type, topics):
         existing_input_topics = case["config"]["function_simulator"]["input_topic_list"]
         existing_output_topics = case["config"]["function_simulator"]["output_topic_list"]
+        return JsonModifier._find_duplicates(existing_input_topics, existing_output_topics, topic_type, topics)
+
+    @staticmethod
+    def _find_duplicates(existing_input_topics, existing_output_topics, topic_type, topics):
         existing_topics = existing_input_topics if topic_type == "input" else existing_output_topics
         other_topics = existing_output_topics if topic_type == "input" else existing_input_topics
         duplicates = []
@@ -60,42 +299,113 @@ class JsonModifier:
         return duplicates
 
     def modify_topic_lists(self, json_data, case_codes, action, topic_type, topics):
-        if case_codes == ['all']:
-            case_codes = [case["case_code"] for case in json_data["test_suite_info"]["test_case_infos"]]
+        operation = {"case_codes": case_codes, "action": action, "topic_type": topic_type, "topics": topics}
+        with self.metrics.phase('apply_operations'):
+            return self.apply_operations(json_data, [operation], self.metrics)
+
+    @staticmethod
+    def apply_operations(json_data, operations, metrics=None):
+        """一次遍历应用多个编辑操作
+
+        case_code 索引只建立一次，topic 列表使用 _TopicList 包装，成员判断为 O(1)，
+        删除在全部操作完成后一次性写回列表。每个操作的语义与逐个调用 modify_topic_lists 相同。
+        """
+        cases = json_data["test_suite_info"]["test_case_infos"]
+        positions = {}
+        for position, case in enumerate(cases):
+            positions.setdefault(case["case_code"], []).append(position)
+        topic_lists = {}
+        # 按 topic 选择用例时才建立 topic 索引，之后随编辑操作同步更新
+        topic_index = None
 
-        for case in json_data["test_suite_info"]["test_case_infos"]:
-            if case["case_code"] in case_codes:
+        def get_topic_list(position, topic_type):
+            key = (position, topic_type)
+            if key not in topic_lists:
+                simulator = cases[position]["config"]["function_simulator"]
+                topic_lists[key] = _TopicList(simulator[f"{topic_type}_topic_list"])
+            return topic_lists[key]
+
+        metrics = metrics or Metrics()
+        for operation in operations:
+            case_codes = operation["case_codes"]
+            action = operation["action"]
+            topic_type = operation["topic_type"]
+            topics = operation["topics"]
+            start = time.perf_counter()
+
+            if case_codes == ['all']:
+                selected = range(len(cases))
+            else:
+                selected = set()
+                for case_code in case_codes:
+                    prefix, _, topic = case_code.partition(':')
+                    if topic and prefix in TOPIC_SELECTORS:
+                        if topic_index is None:
+                            # 先写回前面的操作延迟的删除，索引才与当前的 topic 列表一致
+                            for topic_list in topic_lists.values():
+                                topic_list.flush()
+                            topic_index = TopicIndex.from_suite(json_data)
+                        matched = topic_index.positions_with_topic(topic, TOPIC_SELECTORS[prefix])
+                        logging.info(f"{case_code} 选中 {len(matched)} 个测试用例")
+                        selected.update(matched)
+                        continue
+                    if case_code not in positions:
+                        logging.warning(f"未找到测试用例: {case_code}")
+                    selected.update(positions.get(case_code, []))
+                selected = sorted(selected)
+
+            for position in selected:
+                case = cases[position]
+                topic_list = get_topic_list(position, topic_type)
                 if action == 'add':
-                    duplicates = self.check_duplicates(case, topic_type, topics)
+                    duplicates = JsonModifier._find_duplicates(get_topic_list(position, "input"),
+                                                               get_topic_list(position, "output"),
+                                                               topic_type, topics)
                     if duplicates:
                         logging.warning(f"测试用例 {case['case_code']} 存在重复Topic:")
                         for topic, reason in duplicates:
                             logging.warning(f"  - Topic {topic}: {reason}")
                         logging.warning("请先解决重复问题再进行添加操作。")
                         continue
-                topic_list = case["config"]["function_simulator"][f"{topic_type}_topic_list"]
-                original_list = topic_list.copy()
+                original_list = topic_list.to_list()
                 if action == 'add':
                     for topic in topics:
                         if topic not in topic_list:
-                            topic_list.append(topic)
+                            topic_list.add(topic)
+                            if topic_index is not None:
+                                topic_index.add_topic(position, topic_type, topic)
                 elif action == 'remove':
                     for topic in topics:
                         if topic in topic_list:
                             topic_list.remove(topic)
+                            if topic_index is not None and topic not in topic_list:
+                                topic_index.remove_topic(position, topic_type, topic)
                 # 记录日志
                 logging.info(f"测试用例: {case['case_code']}, 操作: {action}, Topic列表类型: {topic_type}, "
                              f"修改内容: {topics}, 原始内容: {original_list}")
+            metrics.observe('operation', f"{action} {topic_type} {','.join(topics)} @ {','.join(case_codes)}",
+                            time.perf_counter() - start)
+            metrics.count('cases_selected', len(selected))
 
+        with metrics.phase('flush_topic_lists'):
+            for topic_list in topic_lists.values():
+                topic_list.flush()
         return json_data
 
     def run(self):
         # 获取 JSON 文件路径
         while True:
             file_path = input("请输入 JSON 文件的绝对路径：")
+            if self.stream:
+                # 流式编辑时只记录操作，保存时再一次扫描文件
+                if os.path.isfile(file_path):
+                    operations = []
+                    break
+                logging.error(f"未找到文件: {file_path}，请重新输入。")
+                continue
             try:
-                with open(file_path, 'r', encoding='utf-8') as file:
-                    data = json.load(file)
+                with self.metrics.phase('load_json', io=True):
+                    data, case_template = read_suite(file_path)
                 break
             except FileNotFoundError:
                 logging.error(f"未找到文件: {file_path}，请重新输入。")
@@ -104,7 +414,8 @@ class JsonModifier:
 
         while True:
             # 获取要修改的测试用例代码
-            case_codes_input = input("请输入要修改的测试用例代码（多个代码用逗号分隔，输入 'all' 表示所有测试用例）：")
+            case_codes_input = input("请输入要修改的测试用例代码（多个代码用逗号分隔，输入 'all' 表示所有测试用例，"
+                                     "输入 input:/topic、output:/topic、remap:/topic 或 topic:/topic 按 Topic 选择测试用例）：")
             case_codes = [code.strip() for code in case_codes_input.split(',')]
 
             # 获取操作类型
@@ -129,7 +440,10 @@ class JsonModifier:
             topics = [topic.strip().strip('"') for topic in topics_input.split(',')]
 
             # 执行修改操作
-            data = self.modify_topic_lists(data, case_codes, action, topic_type, topics)
+            if self.stream:
+                operations.append({"case_codes": case_codes, "action": action, "topic_type": topic_type, "topics": topics})
+            else:
+                data = self.modify_topic_lists(data, case_codes, action, topic_type, topics)
 
             # 询问是否继续
             continue_choice = input("是否继续修改？(y/n)：").strip().lower()
@@ -138,18 +452,58 @@ class JsonModifier:
 
         # 将修改后的数据写回文件
         try:
-            with open(file_path, 'w', encoding='utf-8') as file:
-                json.dump(data, file, indent=2, ensure_ascii=False)
+            if self.stream:
+                edit_file_streaming(file_path, operations, metrics=self.metrics)
+            else:
+                with self.metrics.phase('save_json', io=True):
+                    save_json(file_path, data, case_template)
             logging.info("JSON 文件已成功修改并保存。")
         except Exception as e:
             logging.error(f"保存文件时出错: {e}")
 
+    def run_batch(self, file_path, script, output_path=None):
+        """非交互模式：从脚本文件（'-' 表示标准输入）读取全部编辑操作，一次应用后写回"""
+        if script == '-':
+            operations = load_operations(sys.stdin)
+        else:
+            with open(script, 'r', encoding='utf-8') as file:
+                operations = load_operations(file)
+        logging.info(f"从 {script} 读取了 {len(operations)} 个编辑操作，目标文件: {file_path}")
+        if self.stream:
+            edit_file_streaming(file_path, operations, output_path, self.metrics)
+        else:
+            edit_file(file_path, operations, output_path, self.metrics)
+        logging.info(f"JSON 文件已成功修改并保存到 {output_path or file_path}。")
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="修改生成的测试配置中的 Topic 列表")
+    parser.add_argument('--config', default='../config/test_case_template.json',
+                        help="配置文件路径，相对路径以脚本所在目录为基准")
+    parser.add_argument('--batch', default=None,
+                        help="非交互模式：编辑脚本路径，'-' 表示从标准输入读取")
+    parser.add_argument('--file', default=None, help="非交互模式下要修改的 JSON 文件")
+    parser.add_argument('--output', default=None, help="非交互模式下的输出路径，默认覆盖 --file")
+    parser.add_argument('--stream', action='store_true',
+                        help="流式编辑：逐块扫描文件，只解码被选中的测试用例，其余内容原样复制，"
+                             "内存占用与文件大小无关；只支持完整格式（可为 .gz）的文件")
+    add_metrics_arguments(parser)
+    add_log_arguments(parser)
+    args = parser.parse_args()
+    if args.batch and not args.file:
+        parser.error("--batch 需要同时指定 --file")
+
     try:
-        modifier = JsonModifier()
-        modifier.run()
+        metrics = Metrics.from_args(args, 'edit_case_config')
+        modifier = JsonModifier(args.config, metrics=metrics, log_format=args.log_format, stream=args.stream)
+        with metrics.session(modifier.paths['LOG_DIR'], f"json_modification_{modifier.TIMESTAMP}"):
+            if args.batch:
+                modifier.run_batch(args.file, args.batch, args.output)
+            else:
+                modifier.run()
     except FileNotFoundError as e:
         print(f"Error: {e}")
         print("Please make sure the configuration file exists and is accessible.")
+        sys.exit(1)
     except Exception as e:
-        print(f"An unexpected error occurred: {e}")
\ No newline at end of file
+        print(f"An unexpected error occurred: {e}")
+        sys.exit(1)
\ No newline at end of file
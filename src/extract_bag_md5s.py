@@ -1,10 +1,25 @@
 import json
 import os
+import time
 from datetime import datetime
 import logging
+import yaml
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from yaml_header import scan_yaml_header
+from bag_store import BagStore
+from instrumentation import Metrics, add_arguments as add_metrics_arguments
+from log_setup import CaseLogSampler, log_file_path, setup_logging, add_arguments as add_log_arguments
+
+# 读取时间超过中位数 OUTLIER_FACTOR 倍且不少于 OUTLIER_MIN_SECONDS 的 YAML 视为慢文件，日志中最多列出 OUTLIER_COUNT 个
+OUTLIER_FACTOR = 10
+OUTLIER_MIN_SECONDS = 0.05
+OUTLIER_COUNT = 10
 
 class BagMD5Extractor:
-    def __init__(self, config_path='../config/test_case_template.json'):
+    def __init__(self, config_path='../config/test_case_template.json', bag_db=None, metrics=None,
+                 log_format='text', log_sample=1, threads=1):
         # 获取脚本所在的目录
         self.script_dir = os.path.dirname(os.path.abspath(__file__))
         # 获取 BenchICT_Scripts 目录
@@ -42,21 +57,91 @@ class BagMD5Extractor:
         if not self.BAG_JSON_PATH:
             logging.warning("BAG_JSON_PATH is not defined in the configuration file")
         
+        # 可选的 SQLite bag 注册表，指定后新 bag 直接写入数据库，不再生成 bag.json
+        self.bag_db = bag_db or self.paths.get('BAG_DB_PATH')
+        # 并发读取 YAML 的线程数，每个线程同时只打开一个文件，1 为串行
+        self.threads = max(1, threads)
+        # 阶段耗时与逐个 YAML 的读取延迟记录，见 instrumentation.py
+        self.metrics = metrics or Metrics('extract_bag_md5s')
+
         self.TIMESTAMP = datetime.now().strftime("%Y%m%d_%H%M%S")
         self.OUTPUT_JSON = os.path.join(self.paths['OUTPUT_DIR'], "bag.json")
-        self.LOG_FILE = os.path.join(self.paths['LOG_DIR'], f"extract_bag_md5s_{self.TIMESTAMP}.txt")
+        self.log_format = log_format
+        self.LOG_FILE = log_file_path(os.path.join(self.paths['LOG_DIR'], f"extract_bag_md5s_{self.TIMESTAMP}.txt"), log_format)
+        # 逐个 YAML / md5 的 INFO 日志按 log_sample 采样
+        self.case_log = CaseLogSampler(log_sample)
         
         self._setup_logging()
         self._setup_output_dir()
 
     def _setup_logging(self):
-        os.makedirs(os.path.dirname(self.LOG_FILE), exist_ok=True)
-        logging.basicConfig(filename=self.LOG_FILE, level=logging.INFO,
-                            format='%(asctime)s - %(levelname)s - %(message)s')
+        setup_logging(self.LOG_FILE, self.log_format)
 
     def _setup_output_dir(self):
         os.makedirs(os.path.dirname(self.OUTPUT_JSON), exist_ok=True)
 
+    @staticmethod
+    def read_bag_md5(full_path):
+        """返回 (md5 或 None, 警告信息或 None, 耗时)，不写日志，可在线程中执行"""
+        start = time.perf_counter()
+        # 与 BenchICT_Config.py 共用的 YAML 顶层键扫描器，找到 bag_md5 后立即停止读取；
+        # 直接打开文件，不存在时由 FileNotFoundError 判断，网络存储上省去一次 stat
+        try:
+            values, method = scan_yaml_header(full_path, ('bag_md5',))
+        except FileNotFoundError:
+            return None, f"Warning: The file {full_path} does not exist.", time.perf_counter() - start
+        except yaml.YAMLError as e:
+            return None, f"Warning: Unable to parse {full_path}: {e}", time.perf_counter() - start
+        return values['bag_md5'], None, time.perf_counter() - start
+
+    def iter_bag_md5s(self, full_paths):
+        """按输入顺序产出 read_bag_md5 的结果
+
+        threads > 1 时用线程池并发读取，最多同时提交 threads * 4 个任务，
+        打开的文件数不超过线程数；结果仍按 case_list 顺序合并，与串行完全一致。
+        """
+        if self.threads <= 1:
+            for full_path in full_paths:
+                yield self.read_bag_md5(full_path)
+            return
+        with ThreadPoolExecutor(max_workers=self.threads) as executor:
+            pending = deque()
+            for full_path in full_paths:
+                if len(pending) >= self.threads * 4:
+                    yield pending.popleft().result()
+                pending.append(executor.submit(self.read_bag_md5, full_path))
+            while pending:
+                yield pending.popleft().result()
+
+    @staticmethod
+    def log_latency_outliers(latencies):
+        """latencies 为 [(秒, 路径)]，记录明显慢于中位数的文件"""
+        if not latencies:
+            return
+        median = sorted(seconds for seconds, _ in latencies)[len(latencies) // 2]
+        threshold = max(median * OUTLIER_FACTOR, OUTLIER_MIN_SECONDS)
+        outliers = sorted((item for item in latencies if item[0] > threshold), reverse=True)
+        if outliers:
+            slowest = ", ".join(f"{path} ({seconds * 1000:.0f} ms)" for seconds, path in outliers[:OUTLIER_COUNT])
+            logging.warning(f"{len(outliers)} YAML files took more than {threshold * 1000:.0f} ms to read "
+                            f"(median {median * 1000:.1f} ms), slowest: {slowest}")
+
+    def merge_into_db(self, found_md5s):
+        # 只查询和插入本次找到的 md5，不读取或重写整个注册表
+        with BagStore(self.bag_db) as store:
+            new_md5s = set(store.add_bags(found_md5s))
+            md5_count = store.count()
+        for md5 in dict.fromkeys(found_md5s):
+            if md5 in new_md5s:
+                logging.info(f"Found new bag_md5: {md5}")
+                print(f"Found new bag_md5: {md5}")
+            else:
+                self.case_log.info(f"Found existing bag_md5: {md5}")
+        logging.info(f"Processing completed. The bag information has been saved to {self.bag_db}")
+        logging.info(f"A total of {md5_count} bags were found, including {len(new_md5s)} new bags.")
+        print(f"Processing completed. The bag information has been saved to {self.bag_db}")
+        print(f"A total of {md5_count} bags were found, including {len(new_md5s)} new bags.")
+
     def process(self):
         try:
             logging.info("Script execution started")
@@ -65,40 +150,57 @@ class BagMD5Extractor:
             if not os.path.exists(self.paths['CASE_LIST_JSON']):
                 raise FileNotFoundError(f"The {self.paths['CASE_LIST_JSON']} file does not exist.")
 
+            with self.metrics.phase('read_case_list', io=True):
+                with open(self.paths['CASE_LIST_JSON'], 'r') as file:
+                    case_list = json.load(file)['case_list']
+
+            found_md5s = []
+            latencies = []
+            logging.info("Starting to process YAML files:")
+            print("Starting to process YAML files:")
+            if self.threads > 1:
+                logging.info(f"Reading {len(case_list)} YAML files with {self.threads} threads")
+            full_paths = [os.path.join(self.paths['YAML_DIR'], yaml_file) for yaml_file in case_list]
+            with self.metrics.phase('read_bag_md5s', io=True):
+                # 日志和结果都在主线程中按 case_list 顺序处理
+                for yaml_file, full_path, (md5, warning, seconds) in zip(case_list, full_paths,
+                                                                         self.iter_bag_md5s(full_paths)):
+                    self.case_log.info(f"Processing file: {full_path}", case=yaml_file)
+                    if warning is not None:
+                        logging.warning(warning)
+                        print(warning)
+                    if md5 is not None:
+                        found_md5s.append(md5)
+                    latencies.append((seconds, full_path))
+                    self.metrics.observe('read_bag_md5', yaml_file, seconds)
+            self.log_latency_outliers(latencies)
+            self.metrics.count('yaml_files', len(case_list))
+            self.metrics.count('bag_md5s_found', len(found_md5s))
+
+            if self.bag_db:
+                with self.metrics.phase('merge_into_db', io=True):
+                    self.merge_into_db(found_md5s)
+                return
+
             # 读取现有的 bag.json 文件（如果存在）
             existing_bags = {}
             if self.BAG_JSON_PATH and os.path.exists(self.BAG_JSON_PATH):
-                with open(self.BAG_JSON_PATH, 'r') as infile:
-                    existing_data = json.load(infile)
-                    for bag in existing_data.get('bags', []):
-                        existing_bags[bag['md5']] = bag
-
-            with open(self.paths['CASE_LIST_JSON'], 'r') as file:
-                case_list = json.load(file)['case_list']
+                with self.metrics.phase('load_bag_json', io=True):
+                    with open(self.BAG_JSON_PATH, 'r') as infile:
+                        existing_data = json.load(infile)
+                        for bag in existing_data.get('bags', []):
+                            existing_bags[bag['md5']] = bag
 
             new_bags = []
-            logging.info("Starting to process YAML files:")
-            print("Starting to process YAML files:")
-            for yaml_file in case_list:
-                full_path = os.path.join(self.paths['YAML_DIR'], yaml_file)
-                logging.info(f"Processing file: {full_path}")
-                if os.path.exists(full_path):
-                    with open(full_path, 'r') as file:
-                        for line in file:
-                            if line.startswith('bag_md5:'):
-                                md5 = line.split(':')[1].strip()
-                                if md5 not in existing_bags:
-                                    new_bag = {"md5": md5, "trigger_time": "None"}
-                                    existing_bags[md5] = new_bag
-                                    new_bags.append(new_bag)
-                                    logging.info(f"Found new bag_md5: {md5}")
-                                    print(f"Found new bag_md5: {md5}")
-                                else:
-                                    logging.info(f"Found existing bag_md5: {md5}")
-                                break
+            for md5 in found_md5s:
+                if md5 not in existing_bags:
+                    new_bag = {"md5": md5, "trigger_time": "None"}
+                    existing_bags[md5] = new_bag
+                    new_bags.append(new_bag)
+                    logging.info(f"Found new bag_md5: {md5}")
+                    print(f"Found new bag_md5: {md5}")
                 else:
-                    logging.warning(f"Warning: The file {full_path} does not exist.")
-                    print(f"Warning: The file {full_path} does not exist.")
+                    self.case_log.info(f"Found existing bag_md5: {md5}")
 
             # 将字典转换回列表
             all_bags = list(existing_bags.values())
@@ -112,11 +214,14 @@ class BagMD5Extractor:
                 output_json = {"bags": all_bags}
 
             # 写入JSON文件
-            with open(self.OUTPUT_JSON, 'w') as outfile:
-                json.dump(output_json, outfile, indent=2)
+            with self.metrics.phase('write_bag_json', io=True):
+                with open(self.OUTPUT_JSON, 'w') as outfile:
+                    json.dump(output_json, outfile, indent=2)
 
-            logging.info("Generated JSON content:")
-            logging.info(json.dumps(output_json, indent=2))
+            # 只记录注册表的统计信息，不再把整个 bag.json 写入日志
+            pending_count = sum(1 for bag in all_bags if bag['trigger_time'] == "None")
+            logging.info(f"Registry summary: {len(all_bags)} bags, {len(new_bags)} new, "
+                         f"{pending_count} without trigger_time")
 
             md5_count = len(all_bags)
             new_md5_count = len(new_bags)
@@ -132,17 +237,33 @@ class BagMD5Extractor:
             print(f"An error occurred: {str(e)}")
 
         finally:
+            output_path = self.bag_db or self.OUTPUT_JSON
+            self.case_log.summary()
             logging.info("Script execution completed")
-            logging.info(f"The generated JSON file has been saved to {self.OUTPUT_JSON}")
+            logging.info(f"The bag information has been saved to {output_path}")
             logging.info(f"The log file has been saved to {self.LOG_FILE}")
             print("Script execution completed")
-            print(f"The generated JSON file has been saved to {self.OUTPUT_JSON}")
+            print(f"The bag information has been saved to {output_path}")
             print(f"The log file has been saved to {self.LOG_FILE}")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="从用例 YAML 中提取 bag_md5 并增量更新 bag 注册表")
+    parser.add_argument('--config', default='../config/test_case_template.json',
+                        help="配置文件路径，相对路径以脚本所在目录为基准")
+    parser.add_argument('--bag-db', default=None,
+                        help="写入 SQLite bag 注册表（见 bag_store.py）而不是生成 bag.json，也可在配置文件 paths 中设置 BAG_DB_PATH")
+    parser.add_argument('--threads', type=int, default=1,
+                        help="并发读取用例 YAML 的线程数，网络存储上可以重叠文件打开的延迟；默认 1 为串行，结果与串行完全相同")
+    add_metrics_arguments(parser)
+    add_log_arguments(parser, sampling=True)
+    args = parser.parse_args()
+
     try:
-        extractor = BagMD5Extractor()
-        extractor.process()
+        metrics = Metrics.from_args(args, 'extract_bag_md5s')
+        extractor = BagMD5Extractor(args.config, bag_db=args.bag_db, metrics=metrics, log_format=args.log_format,
+                                    log_sample=args.log_sample, threads=args.threads)
+        with metrics.session(extractor.paths['LOG_DIR'], f"extract_bag_md5s_{extractor.TIMESTAMP}"):
+            extractor.process()
     except FileNotFoundError as e:
         print(f"Error: {e}")
         print("Please make sure the configuration file exists and is accessible.")
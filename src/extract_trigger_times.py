@@ -0,0 +1,166 @@
+import json
+import os
+import logging
+import argparse
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from bag_store import BagStore
+from file_utils import atomic_write
+from log_setup import setup_logging
+from hash_bag_files import load_bag_file_index
+from rosbag_index import RosbagIndex
+
+
+def read_trigger_time(bag_path, trigger_topic):
+    """返回 (trigger_time 字符串或 None, 错误信息或 None)，在子进程中执行"""
+    try:
+        with RosbagIndex(bag_path) as bag:
+            first_time = bag.first_message_time(trigger_topic)
+    except (OSError, ValueError, KeyError) as e:
+        return None, f"{type(e).__name__}: {e}"
+    if first_time is None:
+        return None, f"topic {trigger_topic} not found"
+    return str(first_time), None
+
+
+class TriggerTimeExtractor:
+    def __init__(self, config_path='../config/test_case_template.json', trigger_topic=None, workers=4,
+                 bag_db=None, overwrite=False):
+        # 获取脚本所在的目录
+        self.script_dir = os.path.dirname(os.path.abspath(__file__))
+        # 获取 BenchICT_Scripts 目录
+        self.bench_ict_dir = os.path.dirname(self.script_dir)
+        # 获取 BenchICT_Scripts 的父目录
+        self.parent_dir = os.path.dirname(self.bench_ict_dir)
+
+        # 构造配置文件的完整路径
+        full_config_path = os.path.normpath(os.path.join(self.script_dir, config_path))
+
+        # 检查配置文件是否存在
+        if not os.path.exists(full_config_path):
+            raise FileNotFoundError(f"Configuration file not found: {full_config_path}")
+
+        # 从配置文件加载路径
+        with open(full_config_path, 'r') as config_file:
+            self.config = json.load(config_file)
+
+        self.paths = self.config['paths']
+
+        # 调整所有路径
+        for key, path in self.paths.items():
+            if path.startswith('../'):
+                # 对于以 '../' 开头的路径，从 BenchICT_Scripts 的父目录开始
+                self.paths[key] = os.path.normpath(os.path.join(self.parent_dir, path[3:]))
+            elif path.startswith('./'):
+                # 对于以 './' 开头的路径，从 BenchICT_Scripts 目录开始
+                self.paths[key] = os.path.normpath(os.path.join(self.bench_ict_dir, path[2:]))
+            else:
+                # 对于其他路径，假设它们是相对于 BenchICT_Scripts 目录的
+                self.paths[key] = os.path.normpath(os.path.join(self.bench_ict_dir, path))
+
+        # 触发 topic 可以在命令行指定，也可以在配置文件中设置 trigger_topic
+        self.trigger_topic = trigger_topic or self.config.get('trigger_topic')
+        if not self.trigger_topic:
+            raise ValueError("No trigger topic given, use --trigger-topic or set trigger_topic in the configuration file")
+        self.workers = max(1, workers)
+        self.bag_db = bag_db or self.paths.get('BAG_DB_PATH')
+        self.overwrite = overwrite
+
+        self.TIMESTAMP = datetime.now().strftime("%Y%m%d_%H%M%S")
+        # 本地 bag 文件的位置来自 hash_bag_files.py 生成的 md5 缓存
+        self.BAG_INDEX_FILE = os.path.join(self.paths['OUTPUT_DIR'], "bag_md5_cache.json")
+        self.LOG_FILE = os.path.join(self.paths['LOG_DIR'], f"extract_trigger_times_{self.TIMESTAMP}.txt")
+
+        self._setup_logging()
+
+    def _setup_logging(self):
+        setup_logging(self.LOG_FILE)
+
+    def load_bags(self):
+        if self.bag_db:
+            with BagStore(self.bag_db) as store:
+                return list(store.iter_bags())
+        with open(self.paths['BAG_JSON_PATH'], 'r') as file:
+            return json.load(file).get('bags', [])
+
+    def save_trigger_times(self, bags, trigger_times):
+        if self.bag_db:
+            with BagStore(self.bag_db) as store:
+                store.upsert([{"md5": md5, "trigger_time": value} for md5, value in trigger_times.items()])
+            return self.bag_db
+        for bag in bags:
+            if bag['md5'] in trigger_times:
+                bag['trigger_time'] = trigger_times[bag['md5']]
+        with atomic_write(self.paths['BAG_JSON_PATH']) as file:
+            json.dump({"bags": bags}, file, indent=2)
+        return self.paths['BAG_JSON_PATH']
+
+    def process(self):
+        try:
+            logging.info("Script execution started")
+            bags = self.load_bags()
+            bag_files = load_bag_file_index(self.BAG_INDEX_FILE)
+
+            targets = {}
+            for bag in bags:
+                if bag['trigger_time'] != "None" and not self.overwrite:
+                    continue
+                if bag['md5'] in bag_files:
+                    targets[bag['md5']] = bag_files[bag['md5']]
+                else:
+                    logging.warning(f"Warning: no local bag file for bag_md5 {bag['md5']}, run hash_bag_files.py first")
+                    print(f"Warning: no local bag file for bag_md5 {bag['md5']}, run hash_bag_files.py first")
+
+            logging.info(f"Reading {self.trigger_topic} from {len(targets)} bags with {self.workers} processes")
+            print(f"Reading {self.trigger_topic} from {len(targets)} bags")
+            trigger_times = {}
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                md5s = list(targets)
+                results = executor.map(read_trigger_time, [targets[md5] for md5 in md5s],
+                                       [self.trigger_topic] * len(md5s))
+                for md5, (trigger_time, error) in zip(md5s, results):
+                    if error is not None:
+                        logging.warning(f"Warning: unable to read trigger_time of {targets[md5]} ({md5}): {error}")
+                        print(f"Warning: unable to read trigger_time of {targets[md5]} ({md5}): {error}")
+                        continue
+                    trigger_times[md5] = trigger_time
+                    logging.info(f"bag_md5 {md5}: trigger_time {trigger_time}")
+
+            if trigger_times:
+                output_path = self.save_trigger_times(bags, trigger_times)
+                logging.info(f"Updated {len(trigger_times)} trigger times in {output_path}")
+                print(f"Updated {len(trigger_times)} trigger times in {output_path}")
+            else:
+                logging.info("No trigger times were updated")
+                print("No trigger times were updated")
+
+        except Exception as e:
+            logging.error(f"An error occurred: {str(e)}")
+            logging.error(f"Error type: {type(e).__name__}")
+            print(f"An error occurred: {str(e)}")
+
+        finally:
+            logging.info("Script execution completed")
+            logging.info(f"The log file has been saved to {self.LOG_FILE}")
+            print("Script execution completed")
+            print(f"The log file has been saved to {self.LOG_FILE}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="从本地 rosbag 的索引中读取触发 topic 的第一条消息时间，写入 bag 注册表")
+    parser.add_argument('--config', default='../config/test_case_template.json',
+                        help="配置文件路径，相对路径以脚本所在目录为基准")
+    parser.add_argument('--trigger-topic', default=None,
+                        help="用于确定 trigger_time 的 topic，默认使用配置文件中的 trigger_topic")
+    parser.add_argument('--workers', type=int, default=4, help="并行读取 bag 的进程数")
+    parser.add_argument('--bag-db', default=None, help="使用 SQLite bag 注册表（见 bag_store.py）代替 bag.json")
+    parser.add_argument('--overwrite', action='store_true', help="重新计算已有 trigger_time 的 bag")
+    args = parser.parse_args()
+
+    try:
+        extractor = TriggerTimeExtractor(args.config, trigger_topic=args.trigger_topic, workers=args.workers,
+                                         bag_db=args.bag_db, overwrite=args.overwrite)
+        extractor.process()
+    except (FileNotFoundError, ValueError) as e:
+        print(f"Error: {e}")
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}")
@@ -0,0 +1,36 @@
+import os
+import tempfile
+from contextlib import contextmanager
+
+
+def _current_umask():
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+@contextmanager
+def atomic_write(path, mode='w', encoding=None, newline=None):
+    """先写入同目录下的临时文件，成功后再 rename 到目标路径
+
+    写入过程中出错时删除临时文件，目标文件保持原样，不会出现写了一半的 JSON。
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix='.tmp', dir=directory)
+    try:
+        # mkstemp 创建的文件权限为 0600，改为与普通 open 创建的文件一致
+        os.chmod(tmp_path, 0o666 & ~_current_umask())
+        if 'b' in mode:
+            file = os.fdopen(fd, mode)
+        else:
+            file = os.fdopen(fd, mode, encoding=encoding, newline=newline)
+        with file:
+            yield file
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
@@ -0,0 +1,257 @@
+import json
+import os
+import hashlib
+import logging
+import yaml
+import argparse
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from bag_store import BagStore, add_bags_to_json
+from file_utils import atomic_write
+from log_setup import setup_logging
+from yaml_header import scan_yaml_header
+
+# 生成缓存格式变化时递增，使旧缓存失效
+CACHE_VERSION = 1
+# 每次读取 8 MiB，hashlib 处理大块数据时会释放 GIL，多线程可以并行计算
+CHUNK_SIZE = 8 * 1024 * 1024
+# 缓存条目中用于判断文件是否变化的 stat 字段
+STAT_KEYS = ("dev", "ino", "size", "mtime_ns")
+
+
+def md5_of_file(path, chunk_size=CHUNK_SIZE):
+    digest = hashlib.md5()
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    with open(path, 'rb', buffering=0) as file:
+        while True:
+            size = file.readinto(buffer)
+            if not size:
+                break
+            digest.update(view[:size])
+    return digest.hexdigest()
+
+
+def load_bag_file_index(cache_file):
+    """读取 hash_bag_files.py 生成的缓存，返回 {md5: 本地 bag 文件路径}"""
+    if not os.path.exists(cache_file):
+        return {}
+    with open(cache_file, 'r') as file:
+        data = json.load(file)
+    if data.get('version') != CACHE_VERSION:
+        return {}
+    index = {}
+    for path, entry in sorted(data.get('files', {}).items()):
+        index.setdefault(entry['md5'], path)
+    return index
+
+
+class BagFileHasher:
+    def __init__(self, config_path='../config/test_case_template.json', bag_dir=None, workers=4, bag_db=None):
+        # 获取脚本所在的目录
+        self.script_dir = os.path.dirname(os.path.abspath(__file__))
+        # 获取 BenchICT_Scripts 目录
+        self.bench_ict_dir = os.path.dirname(self.script_dir)
+        # 获取 BenchICT_Scripts 的父目录
+        self.parent_dir = os.path.dirname(self.bench_ict_dir)
+
+        # 构造配置文件的完整路径
+        full_config_path = os.path.normpath(os.path.join(self.script_dir, config_path))
+
+        # 检查配置文件是否存在
+        if not os.path.exists(full_config_path):
+            raise FileNotFoundError(f"Configuration file not found: {full_config_path}")
+
+        # 从配置文件加载路径
+        with open(full_config_path, 'r') as config_file:
+            self.config = json.load(config_file)
+
+        self.paths = self.config['paths']
+
+        # 调整所有路径
+        for key, path in self.paths.items():
+            if path.startswith('../'):
+                # 对于以 '../' 开头的路径，从 BenchICT_Scripts 的父目录开始
+                self.paths[key] = os.path.normpath(os.path.join(self.parent_dir, path[3:]))
+            elif path.startswith('./'):
+                # 对于以 './' 开头的路径，从 BenchICT_Scripts 目录开始
+                self.paths[key] = os.path.normpath(os.path.join(self.bench_ict_dir, path[2:]))
+            else:
+                # 对于其他路径，假设它们是相对于 BenchICT_Scripts 目录的
+                self.paths[key] = os.path.normpath(os.path.join(self.bench_ict_dir, path))
+
+        # bag 目录可以在命令行指定，也可以在配置文件 paths 中设置 BAG_DIR
+        self.bag_dir = bag_dir or self.paths.get('BAG_DIR')
+        if not self.bag_dir:
+            raise ValueError("No bag directory given, use --bag-dir or set BAG_DIR in the configuration file")
+        self.workers = max(1, workers)
+        self.bag_db = bag_db or self.paths.get('BAG_DB_PATH')
+
+        self.TIMESTAMP = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.OUTPUT_JSON = os.path.join(self.paths['OUTPUT_DIR'], "bag.json")
+        self.CACHE_FILE = os.path.join(self.paths['OUTPUT_DIR'], "bag_md5_cache.json")
+        self.LOG_FILE = os.path.join(self.paths['LOG_DIR'], f"hash_bag_files_{self.TIMESTAMP}.txt")
+
+        self._setup_logging()
+
+    def _setup_logging(self):
+        setup_logging(self.LOG_FILE)
+
+    def find_bag_files(self):
+        bag_files = []
+        for root, dirs, files in os.walk(self.bag_dir):
+            dirs.sort()
+            for name in sorted(files):
+                if name.endswith('.bag'):
+                    bag_files.append(os.path.join(root, name))
+        return bag_files
+
+    def load_cache(self):
+        if os.path.exists(self.CACHE_FILE):
+            try:
+                with open(self.CACHE_FILE, 'r') as file:
+                    data = json.load(file)
+                if data.get('version') == CACHE_VERSION:
+                    return data.get('files', {})
+            except (OSError, ValueError) as e:
+                logging.warning(f"Warning: ignoring unreadable md5 cache {self.CACHE_FILE}: {e}")
+        return {}
+
+    def save_cache(self, files):
+        with atomic_write(self.CACHE_FILE) as file:
+            json.dump({"version": CACHE_VERSION, "files": files}, file, indent=2)
+
+    def hash_files(self, bag_files):
+        """计算 bag 文件的 md5，(设备号, inode, 大小, mtime) 均未变化的文件直接使用缓存
+
+        缓存按这四项而不是路径查找，移动或重命名过的 bag 不需要重新计算。
+        """
+        cache = {}
+        for entry in self.load_cache().values():
+            cache[tuple(entry.get(name) for name in STAT_KEYS)] = entry
+        files = {}
+        pending = []
+        for path in bag_files:
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                # 扫描目录之后被删除或移走的文件
+                logging.warning(f"Warning: {path} disappeared before it could be hashed, skipping it")
+                print(f"Warning: {path} disappeared before it could be hashed, skipping it")
+                continue
+            key = dict(zip(STAT_KEYS, (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)))
+            entry = cache.get(tuple(key.values()))
+            if entry and 'md5' in entry:
+                files[path] = dict(entry)
+            else:
+                files[path] = key
+                pending.append(path)
+
+        logging.info(f"{len(files) - len(pending)} bag files unchanged, {len(pending)} to hash "
+                     f"with {self.workers} threads")
+        print(f"{len(files) - len(pending)} bag files unchanged, {len(pending)} to hash")
+        failed = []
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(md5_of_file, path): path for path in pending}
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    files[path]['md5'] = future.result()
+                    logging.info(f"Hashed {path}: {files[path]['md5']}")
+                except OSError as e:
+                    logging.error(f"Error hashing {path}: {e}")
+                    print(f"Error hashing {path}: {e}")
+                    failed.append(path)
+        for path in failed:
+            del files[path]
+
+        # 缓存中只保留本次仍然存在的文件
+        self.save_cache(files)
+        return {path: entry['md5'] for path, entry in files.items()}
+
+    def register(self, md5s):
+        if self.bag_db:
+            with BagStore(self.bag_db) as store:
+                new_md5s = store.add_bags(md5s)
+                total = store.count()
+            output_path = self.bag_db
+        else:
+            new_md5s, total = add_bags_to_json(self.paths.get('BAG_JSON_PATH'), self.OUTPUT_JSON, md5s)
+            output_path = self.OUTPUT_JSON
+        for md5 in new_md5s:
+            logging.info(f"Registered new bag_md5: {md5}")
+        logging.info(f"A total of {total} bags in {output_path}, including {len(new_md5s)} new bags.")
+        print(f"A total of {total} bags in {output_path}, including {len(new_md5s)} new bags.")
+
+    def find_missing_bags(self, local_md5s):
+        """返回 bag_md5 在 bag 目录中找不到对应文件的用例 [(yaml_file, bag_md5)]"""
+        case_list_json = self.paths.get('CASE_LIST_JSON')
+        if not case_list_json or not os.path.exists(case_list_json):
+            logging.warning(f"Warning: case list {case_list_json} does not exist, skipping the YAML check")
+            return []
+        with open(case_list_json, 'r') as file:
+            case_list = json.load(file)['case_list']
+        missing = []
+        for yaml_file in case_list:
+            full_path = os.path.join(self.paths['YAML_DIR'], yaml_file)
+            if not os.path.exists(full_path):
+                continue
+            try:
+                md5 = scan_yaml_header(full_path, ('bag_md5',))[0]['bag_md5']
+            except yaml.YAMLError as e:
+                logging.warning(f"Warning: Unable to parse {full_path}: {e}")
+                print(f"Warning: Unable to parse {full_path}: {e}")
+                continue
+            if md5 is not None and md5 not in local_md5s:
+                missing.append((yaml_file, md5))
+        return missing
+
+    def process(self):
+        try:
+            logging.info("Script execution started")
+            bag_files = self.find_bag_files()
+            logging.info(f"Found {len(bag_files)} bag files under {self.bag_dir}")
+            print(f"Found {len(bag_files)} bag files under {self.bag_dir}")
+
+            md5_by_path = self.hash_files(bag_files)
+            self.register(list(md5_by_path.values()))
+
+            missing = self.find_missing_bags(set(md5_by_path.values()))
+            cases_by_md5 = {}
+            for yaml_file, md5 in missing:
+                cases_by_md5.setdefault(md5, []).append(yaml_file)
+            for md5, yaml_files in cases_by_md5.items():
+                message = f"Warning: no local bag file for bag_md5 {md5}, used by {len(yaml_files)} cases: {', '.join(yaml_files)}"
+                logging.warning(message)
+                print(message)
+            logging.info(f"{len(missing)} cases reference {len(cases_by_md5)} bags that are not in {self.bag_dir}")
+            print(f"{len(missing)} cases reference {len(cases_by_md5)} bags that are not in {self.bag_dir}")
+
+        except Exception as e:
+            logging.error(f"An error occurred: {str(e)}")
+            logging.error(f"Error type: {type(e).__name__}")
+            print(f"An error occurred: {str(e)}")
+
+        finally:
+            logging.info("Script execution completed")
+            logging.info(f"The log file has been saved to {self.LOG_FILE}")
+            print("Script execution completed")
+            print(f"The log file has been saved to {self.LOG_FILE}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="计算本地 rosbag 文件的 md5 并登记到 bag 注册表")
+    parser.add_argument('--config', default='../config/test_case_template.json',
+                        help="配置文件路径，相对路径以脚本所在目录为基准")
+    parser.add_argument('--bag-dir', default=None, help="存放 .bag 文件的目录，默认使用配置文件 paths 中的 BAG_DIR")
+    parser.add_argument('--workers', type=int, default=4, help="并行计算 md5 的线程数")
+    parser.add_argument('--bag-db', default=None,
+                        help="写入 SQLite bag 注册表（见 bag_store.py）而不是生成 bag.json")
+    args = parser.parse_args()
+
+    try:
+        hasher = BagFileHasher(args.config, bag_dir=args.bag_dir, workers=args.workers, bag_db=args.bag_db)
+        hasher.process()
+    except (FileNotFoundError, ValueError) as e:
+        print(f"Error: {e}")
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}")
@@ -0,0 +1,207 @@
+import os
+import sys
+import math
+import json
+import time
+import pstats
+import logging
+import cProfile
+from contextlib import contextmanager, nullcontext
+from file_utils import atomic_write
+from log_setup import console_enabled
+
+# 报告格式变化时递增
+REPORT_VERSION = 1
+# 报告中列出的最慢用例个数和 cProfile 函数个数
+SLOWEST_COUNT = 10
+PROFILE_TOP = 25
+# 延迟直方图的桶上界（毫秒），最后一个桶收集更大的值
+HISTOGRAM_BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+_NULL_CONTEXT = nullcontext()
+
+
+def add_arguments(parser):
+    """为命令行工具添加 --profile 和 --metrics-out 参数"""
+    parser.add_argument('--metrics-out', nargs='?', const='', default=None, metavar='PATH',
+                        help="记录各阶段耗时、逐用例延迟和文件 I/O 并输出 JSON 报告，"
+                             "默认保存到 LOG_DIR 中与日志同名的 *_metrics.json")
+    parser.add_argument('--profile', action='store_true',
+                        help="同时使用 cProfile 记录函数级耗时，.prof 文件与 JSON 报告保存在一起")
+
+
+def _read_process_io():
+    """读取 /proc/self/io 中本进程读写的字节数，不支持的系统返回 None"""
+    try:
+        with open('/proc/self/io', 'rb') as file:
+            fields = dict(line.split(b': ') for line in file.read().splitlines())
+        return int(fields[b'rchar']), int(fields[b'wchar'])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def _percentile(sorted_values, fraction):
+    # nearest-rank 百分位
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+class _Phase:
+    __slots__ = ('name', 'seconds', 'count', 'files_opened', 'read_bytes', 'write_bytes', 'children')
+
+    def __init__(self, name):
+        self.name = name
+        self.seconds = 0.0
+        self.count = 0
+        self.files_opened = 0
+        self.read_bytes = None
+        self.write_bytes = None
+        self.children = {}
+
+    def to_dict(self):
+        data = {"name": self.name, "seconds": round(self.seconds, 6), "count": self.count,
+                "files_opened": self.files_opened}
+        if self.read_bytes is not None:
+            data["read_bytes"] = self.read_bytes
+            data["write_bytes"] = self.write_bytes
+        if self.children:
+            data["children"] = [child.to_dict() for child in self.children.values()]
+        return data
+
+
+class Metrics:
+    """各工具共用的性能记录
+
+    phase() 记录嵌套的阶段耗时，同一父阶段下同名的阶段合并累计（count 为进入次数）；
+    io=True 的阶段额外记录本进程读写的字节数（/proc/self/io 的 rchar / wchar）。
+    observe() 记录逐用例的延迟，报告中给出 p50 / p95 / max、直方图和最慢的用例。
+    打开的文件数通过审计钩子统计。未启用时 phase() 返回空的上下文管理器，开销可以忽略。
+    对象被传入子进程时变为未启用状态，子进程内的阶段不计入报告。
+    """
+
+    def __init__(self, tool='', enabled=False, profile=False, metrics_out=None):
+        self.tool = tool
+        self.enabled = enabled or profile
+        self.profile = profile
+        self.metrics_out = metrics_out or None
+        self.root = _Phase(tool)
+        self._stack = [self.root]
+        self.series = {}
+        self.counters = {}
+        self._files_opened = 0
+        self._profiler = None
+        if self.enabled:
+            sys.addaudithook(self._audit)
+
+    @classmethod
+    def from_args(cls, args, tool):
+        return cls(tool, enabled=args.metrics_out is not None, profile=args.profile, metrics_out=args.metrics_out)
+
+    def __reduce__(self):
+        return (Metrics, (self.tool,))
+
+    def _audit(self, event, args):
+        if event == 'open':
+            self._files_opened += 1
+
+    def phase(self, name, io=False):
+        if not self.enabled:
+            return _NULL_CONTEXT
+        return self._phase(name, io)
+
+    @contextmanager
+    def _phase(self, name, io):
+        parent = self._stack[-1]
+        node = parent.children.get(name)
+        if node is None:
+            node = parent.children[name] = _Phase(name)
+        self._stack.append(node)
+        files_before = self._files_opened
+        io_before = _read_process_io() if io else None
+        start = time.perf_counter()
+        try:
+            yield node
+        finally:
+            node.seconds += time.perf_counter() - start
+            node.count += 1
+            node.files_opened += self._files_opened - files_before
+            if io_before is not None:
+                io_after = _read_process_io()
+                node.read_bytes = (node.read_bytes or 0) + io_after[0] - io_before[0]
+                node.write_bytes = (node.write_bytes or 0) + io_after[1] - io_before[1]
+            self._stack.pop()
+
+    def observe(self, series, label, seconds):
+        if self.enabled:
+            self.series.setdefault(series, []).append((seconds, label))
+
+    def count(self, name, value=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    @staticmethod
+    def _summarize(samples):
+        values = sorted(seconds for seconds, _ in samples)
+        buckets = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+        bound_index = 0
+        for seconds in values:
+            while bound_index < len(HISTOGRAM_BOUNDS_MS) and seconds * 1000 > HISTOGRAM_BOUNDS_MS[bound_index]:
+                bound_index += 1
+            buckets[bound_index] += 1
+        slowest = sorted(samples, key=lambda sample: sample[0], reverse=True)[:SLOWEST_COUNT]
+        return {
+            "count": len(values),
+            "total_seconds": round(sum(values), 6),
+            "p50_ms": round(_percentile(values, 0.50) * 1000, 3),
+            "p95_ms": round(_percentile(values, 0.95) * 1000, 3),
+            "max_ms": round(values[-1] * 1000, 3),
+            "histogram_ms": [{"le": bound, "count": count}
+                             for bound, count in zip(HISTOGRAM_BOUNDS_MS + ("inf",), buckets)],
+            "slowest": [{"name": label, "ms": round(seconds * 1000, 3)} for seconds, label in slowest]
+        }
+
+    def _profile_summary(self, prof_path):
+        stats = pstats.Stats(self._profiler)
+        rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:PROFILE_TOP]
+        return {
+            "file": prof_path,
+            "top_cumulative": [{"function": f"{os.path.basename(filename)}:{line}({function})",
+                                "calls": calls, "total_seconds": round(total, 6), "cumulative_seconds": round(cumulative, 6)}
+                               for (filename, line, function), (_, calls, total, cumulative, _) in rows]
+        }
+
+    def report(self):
+        return {
+            "version": REPORT_VERSION,
+            "tool": self.tool,
+            "phases": [child.to_dict() for child in self.root.children.values()],
+            "latency": {name: self._summarize(samples) for name, samples in self.series.items() if samples},
+            "counters": dict(self.counters)
+        }
+
+    @contextmanager
+    def session(self, log_dir, base_name):
+        """记录整个运行过程（作为根阶段 total），结束时（包括异常和 sys.exit）保存报告"""
+        if not self.enabled:
+            yield self
+            return
+        report_path = self.metrics_out or os.path.join(log_dir, f"{base_name}_metrics.json")
+        if self.profile:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        try:
+            with self.phase('total', io=True):
+                yield self
+        finally:
+            if self._profiler is not None:
+                self._profiler.disable()
+            report = self.report()
+            if self._profiler is not None:
+                prof_path = os.path.splitext(report_path)[0] + '.prof'
+                self._profiler.dump_stats(prof_path)
+                report["profile"] = self._profile_summary(prof_path)
+            os.makedirs(os.path.dirname(os.path.abspath(report_path)), exist_ok=True)
+            with atomic_write(report_path) as file:
+                json.dump(report, file, indent=2, ensure_ascii=False)
+            logging.info(f"Metrics report saved to {report_path}")
+            if not console_enabled():
+                print(f"Metrics report saved to {report_path}")
@@ -0,0 +1,124 @@
+import os
+import json
+import queue
+import atexit
+import logging
+from logging.handlers import QueueHandler, QueueListener
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+LOG_FORMATS = ('text', 'jsonl')
+# 逐用例日志采样时，前 SAMPLE_FIRST 条总是全部记录
+SAMPLE_FIRST = 100
+
+_listener = None
+_console = False
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """每条日志输出为一行 JSON：time、level、message，以及通过 extra 传入的 case"""
+
+    def format(self, record):
+        data = {"time": self.formatTime(record, self.datefmt), "level": record.levelname,
+                "message": record.getMessage()}
+        case = getattr(record, 'case', None)
+        if case is not None:
+            data["case"] = case
+        return json.dumps(data, ensure_ascii=False)
+
+
+def add_arguments(parser, sampling=False):
+    """为命令行工具添加 --log-format（以及逐用例日志较多的工具的 --log-sample）参数"""
+    parser.add_argument('--log-format', choices=LOG_FORMATS, default='text',
+                        help="日志文件格式：text 为原有的文本格式，jsonl 为每行一条 JSON（文件扩展名为 .jsonl）")
+    if sampling:
+        parser.add_argument('--log-sample', type=int, default=1, metavar='N',
+                            help=f"逐用例的 INFO 日志在前 {SAMPLE_FIRST} 条之后每 N 条记录一条，"
+                                 f"结束时记录未输出的条数；警告和错误总是记录，默认 1 为全部记录")
+
+
+def log_file_path(log_file, log_format):
+    """jsonl 格式的日志文件使用 .jsonl 扩展名"""
+    if log_format == 'jsonl':
+        return os.path.splitext(log_file)[0] + '.jsonl'
+    return log_file
+
+
+def setup_logging(log_file, log_format='text', console=False, console_format=TEXT_FORMAT, datefmt=None):
+    """配置各工具共用的日志：根 logger 只把记录放入队列，格式化和写文件在 QueueListener 线程中完成
+
+    与 logging.basicConfig 相同，根 logger 已经配置过时不再重复配置。
+    """
+    global _listener, _console
+    root = logging.getLogger()
+    if _listener is not None or root.handlers:
+        return
+    os.makedirs(os.path.dirname(log_file), exist_ok=True)
+    file_handler = logging.FileHandler(log_file, encoding='utf-8')
+    if log_format == 'jsonl':
+        file_handler.setFormatter(JsonLinesFormatter(datefmt=datefmt))
+    else:
+        file_handler.setFormatter(logging.Formatter(TEXT_FORMAT, datefmt))
+    handlers = [file_handler]
+    if console:
+        console_handler = logging.StreamHandler()
+        console_handler.setLevel(logging.INFO)
+        console_handler.setFormatter(logging.Formatter(console_format, datefmt))
+        handlers.append(console_handler)
+        _console = True
+
+    root.setLevel(logging.INFO)
+    root.addHandler(QueueHandler(queue.SimpleQueue()))
+    _listener = QueueListener(root.handlers[0].queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    # atexit 按注册的相反顺序执行，先于 logging 自身的 shutdown 停止监听线程并写完队列中的记录
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def console_enabled():
+    """日志是否同时输出到终端；为 True 时不需要再用 print 输出同样的内容"""
+    return _console
+
+
+def configure_worker():
+    """在 fork 出的子进程中调用：子进程中没有监听线程，改为直接写入继承的文件和终端 handler"""
+    root = logging.getLogger()
+    if _listener is None:
+        return
+    for handler in list(root.handlers):
+        if isinstance(handler, QueueHandler):
+            root.removeHandler(handler)
+    for handler in _listener.handlers:
+        root.addHandler(handler)
+
+
+class CaseLogSampler:
+    """逐用例 INFO 日志的采样
+
+    前 SAMPLE_FIRST 条全部记录，之后每 every 条记录一条，未记录的条数在 summary() 中汇总；
+    every 为 1 时全部记录。警告和错误不经过采样。判断在创建 LogRecord 之前完成，被跳过的消息不进入日志队列。
+    """
+
+    def __init__(self, every=1, logger=None):
+        self.every = max(1, every)
+        self.logger = logger or logging.getLogger()
+        self.total = 0
+        self.suppressed = 0
+
+    def info(self, message, case=None):
+        self.total += 1
+        if self.every == 1 or self.total <= SAMPLE_FIRST or self.total % self.every == 0:
+            self.logger.info(message, extra={"case": case} if case is not None else None)
+        else:
+            self.suppressed += 1
+
+    def summary(self):
+        if self.suppressed:
+            self.logger.info(f"Per-case log sampling: {self.suppressed} of {self.total} messages were not logged "
+                             f"(first {SAMPLE_FIRST}, then every {self.every})")
@@ -0,0 +1,188 @@
+import mmap
+import struct
+
+# rosbag v2.0 格式：http://wiki.ros.org/Bags/Format/2.0
+BAG_MAGIC = b"#ROSBAG V2.0\n"
+
+OP_MSG_DATA = 0x02
+OP_BAG_HEADER = 0x03
+OP_INDEX_DATA = 0x04
+OP_CHUNK = 0x05
+OP_CHUNK_INFO = 0x06
+OP_CONNECTION = 0x07
+
+_UINT32 = struct.Struct('<I')
+_UINT64 = struct.Struct('<Q')
+_TIME = struct.Struct('<II')
+_INDEX_ENTRY = struct.Struct('<III')
+_CHUNK_INFO_ENTRY = struct.Struct('<II')
+
+
+def _to_seconds(sec, nsec):
+    # 与 rospy.Time.to_sec() 的计算方式一致
+    return float(sec) + float(nsec) / 1e9
+
+
+class RosbagIndex:
+    """只读取 rosbag v2.0 索引记录的轻量读取器，不依赖 ROS
+
+    打开时只解析文件头和文件末尾的连接记录、chunk 信息记录。查询某个 topic 的第一条消息时间时，
+    只读取包含该 topic 的 chunk 后面的索引记录，不解压也不读取任何消息数据。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # 空文件无法 mmap
+            self._file.close()
+            raise ValueError(f"{path} is not a rosbag v2.0 file")
+        try:
+            self._read_index()
+        except Exception:
+            self.close()
+            raise
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def _truncated(self, pos):
+        # 文件被截断或长度字段损坏，与其他格式错误一样抛出 ValueError，由调用方逐个 bag 给出警告
+        return ValueError(f"{self.path}: truncated record at offset {pos}")
+
+    def _read_record(self, pos):
+        """读取 pos 处的记录，返回 (header 字段, 数据起始位置, 数据长度, 下一条记录位置)
+
+        每个长度字段都先与文件大小（字段长度与 header 的结束位置）比较，越界时抛出 ValueError。
+        """
+        data = self._map
+        if pos + 4 > len(data):
+            raise self._truncated(pos)
+        header_len = _UINT32.unpack_from(data, pos)[0]
+        header_end = pos + 4 + header_len
+        if header_end + 4 > len(data):
+            raise self._truncated(pos)
+        fields = {}
+        field_pos = pos + 4
+        while field_pos < header_end:
+            if field_pos + 4 > header_end:
+                raise self._truncated(pos)
+            field_len = _UINT32.unpack_from(data, field_pos)[0]
+            if field_pos + 4 + field_len > header_end:
+                raise self._truncated(pos)
+            field = data[field_pos + 4:field_pos + 4 + field_len]
+            name, _, value = field.partition(b'=')
+            fields[name] = value
+            field_pos += 4 + field_len
+        data_len = _UINT32.unpack_from(data, header_end)[0]
+        data_pos = header_end + 4
+        if data_pos + data_len > len(data):
+            raise self._truncated(pos)
+        return fields, data_pos, data_len, data_pos + data_len
+
+    def _field(self, fields, name, fmt):
+        """按 fmt 解析 header 字段，字段缺失或长度不符时抛出 ValueError"""
+        value = fields.get(name)
+        if value is None or len(value) != fmt.size:
+            raise ValueError(f"{self.path}: missing or invalid {name.decode()} field")
+        return fmt.unpack(value)
+
+    def _entries(self, fmt, data_pos, data_len, count):
+        """依次返回记录数据中的 count 个定长条目，数据长度不足时抛出 ValueError"""
+        if count * fmt.size > data_len:
+            raise self._truncated(data_pos)
+        for i in range(count):
+            yield fmt.unpack_from(self._map, data_pos + i * fmt.size)
+
+    def _read_index(self):
+        if self._map[:len(BAG_MAGIC)] != BAG_MAGIC:
+            raise ValueError(f"{self.path} is not a rosbag v2.0 file")
+        fields, _, _, _ = self._read_record(len(BAG_MAGIC))
+        if fields.get(b'op') != bytes([OP_BAG_HEADER]):
+            raise ValueError(f"{self.path}: missing bag header record")
+        index_pos = self._field(fields, b'index_pos', _UINT64)[0]
+        conn_count = self._field(fields, b'conn_count', _UINT32)[0]
+        chunk_count = self._field(fields, b'chunk_count', _UINT32)[0]
+        if index_pos == 0:
+            raise ValueError(f"{self.path} is not indexed, run 'rosbag reindex' first")
+
+        # 索引区依次为 conn_count 条连接记录和 chunk_count 条 chunk 信息记录
+        self.topics = {}
+        self.chunks = []
+        pos = index_pos
+        for _ in range(conn_count + chunk_count):
+            fields, data_pos, data_len, pos = self._read_record(pos)
+            op = fields.get(b'op')
+            if op == bytes([OP_CONNECTION]):
+                conn = self._field(fields, b'conn', _UINT32)[0]
+                if b'topic' not in fields:
+                    raise ValueError(f"{self.path}: connection record without topic")
+                topic = fields[b'topic'].decode('utf-8')
+                self.topics.setdefault(topic, set()).add(conn)
+            elif op == bytes([OP_CHUNK_INFO]):
+                chunk_pos = self._field(fields, b'chunk_pos', _UINT64)[0]
+                start_time = _to_seconds(*self._field(fields, b'start_time', _TIME))
+                end_time = _to_seconds(*self._field(fields, b'end_time', _TIME))
+                count = self._field(fields, b'count', _UINT32)[0]
+                conns = dict(self._entries(_CHUNK_INFO_ENTRY, data_pos, data_len, count))
+                self.chunks.append((chunk_pos, start_time, end_time, conns))
+        self.chunks.sort(key=lambda chunk: chunk[1])
+
+    @property
+    def start_time(self):
+        return min((chunk[1] for chunk in self.chunks), default=None)
+
+    @property
+    def end_time(self):
+        return max((chunk[2] for chunk in self.chunks), default=None)
+
+    @property
+    def duration(self):
+        if not self.chunks:
+            return 0.0
+        return self.end_time - self.start_time
+
+    def _chunk_index_times(self, chunk_pos, conns):
+        """读取 chunk 之后的索引记录，返回指定连接在该 chunk 中最早的消息时间"""
+        _, _, _, pos = self._read_record(chunk_pos)
+        earliest = None
+        while pos < len(self._map):
+            fields, data_pos, data_len, next_pos = self._read_record(pos)
+            if fields.get(b'op') != bytes([OP_INDEX_DATA]):
+                break
+            conn = self._field(fields, b'conn', _UINT32)[0]
+            if conn in conns:
+                count = self._field(fields, b'count', _UINT32)[0]
+                for sec, nsec, _ in self._entries(_INDEX_ENTRY, data_pos, data_len, count):
+                    # 索引记录按时间排序，但仍逐条比较以兼容未排序的写入
+                    if earliest is None or (sec, nsec) < earliest:
+                        earliest = (sec, nsec)
+            pos = next_pos
+        return earliest
+
+    def first_message_time(self, topic):
+        """返回 topic 第一条消息的时间戳（秒），bag 中没有该 topic 时返回 None"""
+        conns = self.topics.get(topic)
+        if not conns:
+            return None
+        earliest = None
+        for chunk_pos, start_time, _, chunk_conns in self.chunks:
+            # chunk 按开始时间排序，开始时间晚于已找到的结果时后面的 chunk 不可能更早
+            if earliest is not None and start_time > _to_seconds(*earliest):
+                break
+            if not conns.intersection(chunk_conns):
+                continue
+            found = self._chunk_index_times(chunk_pos, conns)
+            if found is not None and (earliest is None or found < earliest):
+                earliest = found
+        return _to_seconds(*earliest) if earliest is not None else None
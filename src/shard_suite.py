@@ -0,0 +1,194 @@
+import json
+import os
+import re
+import glob
+import heapq
+import logging
+import argparse
+from compact_suite import load_suite
+from file_utils import atomic_write
+from hash_bag_files import load_bag_file_index
+from rosbag_index import RosbagIndex
+
+# 分片清单格式变化时递增
+MANIFEST_VERSION = 1
+STRATEGIES = ('lpt', 'greedy')
+# BenchICT_Config.py 输出的套件文件名，见 CaseProcessor.OUTPUT_JSON
+SUITE_FILE_PATTERN = re.compile(r'generated_json_\d{8}_\d{6}(\.compact)?\.json(\.gz)?')
+# 用例耗时的估算参数（秒）：每次运行的固定开销、找不到本地 bag 时假定的 bag 时长、
+# 每个 input/output topic 增加的开销；无法读取 bag 索引时按文件大小和 BAG_BYTES_PER_SECOND 估算时长
+CASE_SETUP_SECONDS = 30.0
+DEFAULT_BAG_SECONDS = 60.0
+TOPIC_SECONDS = 0.1
+BAG_BYTES_PER_SECOND = 20 * 1024 * 1024
+
+
+def bag_seconds(bag_path):
+    """返回本地 bag 的时长（秒），优先读取 rosbag 索引，失败时按文件大小估算，文件不存在时返回 None"""
+    try:
+        with RosbagIndex(bag_path) as bag:
+            if bag.chunks:
+                return bag.duration
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        # 时长只用于估算耗时，损坏的 bag 不应中断分片
+        logging.warning(f"Warning: unable to read the index of {bag_path} ({type(e).__name__}: {e}), "
+                        f"estimating its duration from the file size")
+    try:
+        return os.path.getsize(bag_path) / BAG_BYTES_PER_SECOND
+    except OSError:
+        return None
+
+
+def load_bag_seconds(bag_files, md5s):
+    """bag_files 为 {md5: 本地 bag 路径}（见 hash_bag_files.load_bag_file_index），只读取 md5s 中用到的 bag"""
+    durations = {}
+    for md5 in md5s:
+        if md5 in bag_files and md5 not in durations:
+            seconds = bag_seconds(bag_files[md5])
+            if seconds is not None:
+                durations[md5] = seconds
+    return durations
+
+
+def estimate_case_cost(case, durations):
+    """估算用例在台架上的耗时（秒）：(固定开销 + bag 时长 + topic 开销) * times"""
+    simulator = case["config"]["function_simulator"]
+    topic_count = len(simulator.get("input_topic_list") or []) + len(simulator.get("output_topic_list") or [])
+    seconds = sum(durations.get(md5, DEFAULT_BAG_SECONDS) for md5 in case.get("bag_urls") or []) \
+        or DEFAULT_BAG_SECONDS
+    return (CASE_SETUP_SECONDS + seconds + TOPIC_SECONDS * topic_count) * max(1, case.get("times", 1))
+
+
+def assign_shards(costs, shard_count, strategy='lpt'):
+    """把用例分配到 shard_count 个分片，返回每个用例所在的分片下标
+
+    greedy 按原顺序把每个用例放入当前总耗时最小的分片；lpt 先按耗时从大到小排序再同样放入，
+    最慢分片的耗时不超过最优解的 4/3。总耗时相同的分片取下标较小的，结果是确定的。
+    """
+    if shard_count < 1:
+        raise ValueError("shard count must be at least 1")
+    order = list(range(len(costs)))
+    if strategy == 'lpt':
+        order.sort(key=lambda position: -costs[position])
+    elif strategy != 'greedy':
+        raise ValueError(f"Unknown sharding strategy: {strategy}")
+    loads = [(0.0, shard) for shard in range(shard_count)]
+    assignment = [0] * len(costs)
+    for position in order:
+        load, shard = heapq.heappop(loads)
+        assignment[position] = shard
+        heapq.heappush(loads, (load + costs[position], shard))
+    return assignment
+
+
+def shard_suite(suite, output_dir, shard_count, durations=None, strategy='lpt', suite_path=None):
+    """把测试套件拆分为 shard_count 个分片文件，写入 output_dir，返回清单文件路径
+
+    每个分片都是完整的测试套件，除 test_case_infos 外与原套件相同，用例保持原来的相对顺序。
+    清单 manifest.json 记录每个分片的文件、用例和估算耗时，以及 case_code 到分片的对应关系，
+    用于之后合并各台架的结果。
+    """
+    cases = suite['test_suite_info']['test_case_infos']
+    durations = durations or {}
+    costs = [estimate_case_cost(case, durations) for case in cases]
+    assignment = assign_shards(costs, shard_count, strategy)
+
+    # 一次遍历得到每个分片的用例下标（按原顺序），不必为每个分片重新扫描全部用例
+    shard_positions = [[] for _ in range(shard_count)]
+    for position, target in enumerate(assignment):
+        shard_positions[target].append(position)
+
+    os.makedirs(output_dir, exist_ok=True)
+    shards = []
+    for shard, positions in enumerate(shard_positions):
+        header = dict(suite)
+        header['test_suite_info'] = dict(suite['test_suite_info'])
+        header['test_suite_info']['test_case_infos'] = [cases[position] for position in positions]
+        file_name = f"shard_{shard + 1:02d}_of_{shard_count:02d}.json"
+        with atomic_write(os.path.join(output_dir, file_name)) as file:
+            json.dump(header, file, indent=2)
+        shards.append({
+            "file": file_name,
+            "case_count": len(positions),
+            "estimated_seconds": round(sum(costs[position] for position in positions), 3),
+            "case_codes": [cases[position]["case_code"] for position in positions]
+        })
+        logging.info(f"Shard {file_name}: {len(positions)} cases, estimated {shards[-1]['estimated_seconds']:.0f}s")
+
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "suite": os.path.abspath(suite_path) if suite_path else None,
+        "strategy": strategy,
+        "shard_count": shard_count,
+        "local_bags": len(durations),
+        "shards": shards,
+        "cases": {case_code: shard_index for shard_index, shard in enumerate(shards) for case_code in shard["case_codes"]}
+    }
+    manifest_path = os.path.join(output_dir, "manifest.json")
+    with atomic_write(manifest_path) as file:
+        json.dump(manifest, file, indent=2, ensure_ascii=False)
+    loads = [shard["estimated_seconds"] for shard in shards]
+    logging.info(f"Split {len(cases)} cases into {shard_count} shards ({strategy}), estimated seconds "
+                 f"max {max(loads):.0f} / mean {sum(loads) / shard_count:.0f}, manifest saved to {manifest_path}")
+    return manifest_path
+
+
+def shard_directory(suite_path):
+    """分片默认写入套件旁的 <套件名>_shards 目录，套件名不含 .json、.compact.json、.gz 等后缀"""
+    name = suite_path
+    for suffix in ('.gz', '.json', '.compact'):
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+    return name + "_shards"
+
+
+def shard_suite_file(suite_path, shard_count, bag_files=None, strategy='lpt', output_dir=None):
+    """读取生成的套件文件（完整或紧凑格式，可为 gzip 压缩）并拆分"""
+    suite = load_suite(suite_path)
+    md5s = {md5 for case in suite['test_suite_info']['test_case_infos'] for md5 in case.get('bag_urls') or []}
+    durations = load_bag_seconds(bag_files or {}, md5s)
+    output_dir = output_dir or shard_directory(suite_path)
+    return shard_suite(suite, output_dir, shard_count, durations, strategy, suite_path)
+
+
+def _resolve_path(path):
+    # 与各工具相同的相对路径规则：'../' 从 BenchICT_Scripts 的父目录开始，其他相对于 BenchICT_Scripts 目录
+    bench_ict_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if path.startswith('../'):
+        return os.path.normpath(os.path.join(os.path.dirname(bench_ict_dir), path[3:]))
+    if path.startswith('./'):
+        return os.path.normpath(os.path.join(bench_ict_dir, path[2:]))
+    return os.path.normpath(os.path.join(bench_ict_dir, path))
+
+
+def latest_suite(output_dir, exclude=None):
+    # 跳过 topic_index.py 生成的 *.topic_index.json 等附属文件；exclude 为本次正在生成的套件
+    suites = [path for path in glob.glob(os.path.join(output_dir, "generated_json_*"))
+              if SUITE_FILE_PATTERN.fullmatch(os.path.basename(path))
+              and not (exclude and os.path.abspath(path) == os.path.abspath(exclude))]
+    if not suites:
+        raise FileNotFoundError(f"No generated suite in {output_dir}")
+    return max(suites, key=os.path.getmtime)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="按估算耗时把生成的测试套件拆分为多个分片，分配到多台台架并行执行")
+    parser.add_argument('suite', nargs='?', default=None,
+                        help="生成的测试套件 JSON 文件，默认使用 OUTPUT_DIR 中最新的 generated_json_*.json(.gz)")
+    parser.add_argument('--shards', type=int, required=True, help="分片个数")
+    parser.add_argument('--strategy', choices=STRATEGIES, default='lpt',
+                        help="lpt 先按耗时从大到小排序再分配（默认），greedy 按原顺序分配")
+    parser.add_argument('--output-dir', default=None, help="分片和 manifest.json 的输出目录，默认为 <套件名>_shards")
+    parser.add_argument('--config', default='../config/test_case_template.json',
+                        help="配置文件路径，用于查找 OUTPUT_DIR 和 hash_bag_files.py 生成的本地 bag 索引")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    with open(os.path.normpath(os.path.join(script_dir, args.config)), 'r') as config_file:
+        output_root = _resolve_path(json.load(config_file)['paths']['OUTPUT_DIR'])
+    suite_path = args.suite or latest_suite(output_root)
+    bag_files = load_bag_file_index(os.path.join(output_root, "bag_md5_cache.json"))
+    print(f"Shard manifest saved to {shard_suite_file(suite_path, args.shards, bag_files, args.strategy, args.output_dir)}")
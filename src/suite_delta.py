@@ -0,0 +1,264 @@
+import os
+import copy
+import json
+import hashlib
+import logging
+import argparse
+from case_builder import suite_header
+from compact_suite import apply_case_delta, case_delta, read_json, read_suite, save_suite
+from suite_writer import open_suite_output
+
+# 逐用例差异格式的标识和版本，格式变化时递增 DELTA_VERSION
+DELTA_FORMAT = "benchict-delta"
+DELTA_VERSION = 1
+# compact 为逐用例差异，patch 为 RFC 6902 JSON Patch
+DELTA_FORMATS = ('compact', 'patch')
+CASES_POINTER = "/test_suite_info/test_case_infos"
+
+
+def case_hash(value):
+    """规范形式（紧凑分隔符、UTF-8）的 SHA-256；键的顺序是输出文件的一部分，因此保留键的顺序"""
+    text = json.dumps(value, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class _SuiteIndex:
+    """套件的 case_code 索引：每个用例只计算一次哈希，之后的比较都是查表"""
+
+    def __init__(self, suite):
+        self.suite = suite
+        self.cases = suite['test_suite_info']['test_case_infos']
+        self.codes = [case['case_code'] for case in self.cases]
+        self.hashes = [case_hash(case) for case in self.cases]
+        self.by_code = {}
+        for position, case_code in enumerate(self.codes):
+            previous = self.by_code.setdefault(case_code, position)
+            if self.hashes[previous] != self.hashes[position]:
+                raise ValueError(f"case_code {case_code} appears more than once with different content")
+
+    def case(self, case_code):
+        return self.cases[self.by_code[case_code]]
+
+    def hash(self, case_code):
+        return self.hashes[self.by_code[case_code]]
+
+    def digest(self):
+        """整个套件的摘要：表头和各用例的哈希依次组合，不需要再次序列化整个套件"""
+        digest = hashlib.sha256(case_hash(suite_header(self.suite)).encode('ascii'))
+        for value in self.hashes:
+            digest.update(value.encode('ascii'))
+        return digest.hexdigest()
+
+
+def diff_suites(baseline, target):
+    """按 case_code 比较两个套件，返回 {added, removed, modified, unchanged}，前三项为 case_code 列表"""
+    return _classify(_SuiteIndex(baseline), _SuiteIndex(target))
+
+
+def _classify(old, new):
+    added = [code for code in new.by_code if code not in old.by_code]
+    removed = [code for code in old.by_code if code not in new.by_code]
+    modified = [code for code in new.by_code if code in old.by_code and old.hash(code) != new.hash(code)]
+    return {
+        "added": added,
+        "removed": removed,
+        "modified": modified,
+        "unchanged": len(new.by_code) - len(added) - len(modified)
+    }
+
+
+def compact_delta(baseline, target, baseline_name=None):
+    """逐用例差异：新增的用例保存完整内容，修改的用例保存与旧用例的差异（见 compact_suite.case_delta），
+    case_codes 记录新套件中用例的顺序。baseline_digest / target_digest 用于在 apply 时确认基准和结果。
+    """
+    old, new = _SuiteIndex(baseline), _SuiteIndex(target)
+    summary = _classify(old, new)
+    return {
+        "format": DELTA_FORMAT,
+        "version": DELTA_VERSION,
+        "baseline": baseline_name,
+        "baseline_digest": old.digest(),
+        "target_digest": new.digest(),
+        "summary": {key: len(value) if isinstance(value, list) else value for key, value in summary.items()},
+        "suite": suite_header(target),
+        "case_codes": new.codes,
+        "added": {code: new.case(code) for code in summary['added']},
+        "removed": summary['removed'],
+        "modified": {code: case_delta(old.case(code), new.case(code)) for code in summary['modified']}
+    }
+
+
+def json_patch(baseline, target):
+    """RFC 6902 JSON Patch：依次删除、插入和替换 test_case_infos 中的用例，修改的用例只替换有变化的字段
+
+    保留下来的用例在新套件中的相对顺序有变化（或 case_code 重复的次数有变化）时，整体替换 test_case_infos。
+    """
+    old, new = _SuiteIndex(baseline), _SuiteIndex(target)
+    header_delta = case_delta(suite_header(baseline), suite_header(target))
+    # 表头的差异会整体替换 test_case_infos 所在的对象时，整体替换文档
+    if any(CASES_POINTER.startswith(pointer + '/') or pointer in ("", CASES_POINTER) for pointer in header_delta):
+        return [{"op": "replace", "path": "", "value": target}]
+    operations = [{"op": "replace", "path": pointer, "value": value} for pointer, value in header_delta.items()]
+
+    kept_old = [code for code in old.codes if code in new.by_code]
+    kept_new = [code for code in new.codes if code in old.by_code]
+    if kept_old != kept_new:
+        operations.append({"op": "replace", "path": CASES_POINTER, "value": new.cases})
+        return operations
+
+    # 从后往前删除，前面的位置不受影响
+    for position in reversed(range(len(old.codes))):
+        if old.codes[position] not in new.by_code:
+            operations.append({"op": "remove", "path": f"{CASES_POINTER}/{position}"})
+    # 之后按新套件的顺序处理：位置 position 之前的用例都已就位
+    for position, case_code in enumerate(new.codes):
+        path = f"{CASES_POINTER}/{position}"
+        if case_code not in old.by_code:
+            operations.append({"op": "add", "path": path, "value": new.cases[position]})
+        elif old.hash(case_code) != new.hashes[position]:
+            for pointer, value in case_delta(old.case(case_code), new.cases[position]).items():
+                operations.append({"op": "replace", "path": path + pointer, "value": value})
+    return operations
+
+
+def _tokens(pointer):
+    # JSON Pointer（RFC 6901）
+    if pointer == "":
+        return []
+    if not pointer.startswith('/'):
+        raise ValueError(f"Invalid JSON Pointer {pointer!r}")
+    return [token.replace('~1', '/').replace('~0', '~') for token in pointer.split('/')[1:]]
+
+
+def _child(container, token):
+    return container[int(token)] if isinstance(container, list) else container[token]
+
+
+def apply_patch(document, operations):
+    """在 document 上依次执行 add / remove / replace / test 操作（会修改 document），返回结果"""
+    for operation in operations:
+        op = operation['op']
+        tokens = _tokens(operation['path'])
+        if op == 'test':
+            target = document
+            for token in tokens:
+                target = _child(target, token)
+            if target != operation['value']:
+                raise ValueError(f"JSON Patch test failed at {operation['path']!r}")
+            continue
+        if op not in ('add', 'remove', 'replace'):
+            raise ValueError(f"Unsupported JSON Patch operation {op!r}")
+        if not tokens:
+            if op == 'remove':
+                raise ValueError("Cannot remove the whole document")
+            document = operation['value']
+            continue
+        parent = document
+        for token in tokens[:-1]:
+            parent = _child(parent, token)
+        last = tokens[-1]
+        if isinstance(parent, list):
+            index = len(parent) if last == '-' and op == 'add' else int(last)
+            if op == 'add':
+                parent.insert(index, operation['value'])
+            elif op == 'remove':
+                del parent[index]
+            else:
+                parent[index] = operation['value']
+        else:
+            if op != 'add' and last not in parent:
+                raise ValueError(f"JSON Patch path {operation['path']!r} does not exist")
+            if op == 'remove':
+                del parent[last]
+            else:
+                parent[last] = operation['value']
+    return document
+
+
+def apply_compact_delta(baseline, delta):
+    """compact_delta 的逆操作：由基准套件和逐用例差异重建新套件，基准或结果与差异记录的摘要不符时抛出 ValueError"""
+    if delta.get('version') != DELTA_VERSION:
+        raise ValueError(f"Unsupported delta version {delta.get('version')}, expected {DELTA_VERSION}")
+    old = _SuiteIndex(baseline)
+    if old.digest() != delta['baseline_digest']:
+        raise ValueError(f"The baseline does not match the one the delta was computed against ({delta.get('baseline')})")
+    cases = []
+    for case_code in delta['case_codes']:
+        if case_code in delta['added']:
+            cases.append(copy.deepcopy(delta['added'][case_code]))
+        elif case_code in delta['modified']:
+            cases.append(apply_case_delta(old.case(case_code), delta['modified'][case_code]))
+        else:
+            cases.append(old.case(case_code))
+    suite = dict(delta['suite'])
+    suite['test_suite_info'] = dict(suite['test_suite_info'])
+    suite['test_suite_info']['test_case_infos'] = cases
+    if _SuiteIndex(suite).digest() != delta['target_digest']:
+        raise ValueError("The rebuilt suite does not match the delta's target digest")
+    return suite
+
+
+def apply_delta(baseline, delta):
+    """delta 为 JSON Patch（列表）或逐用例差异，返回新套件；JSON Patch 会直接修改 baseline"""
+    if isinstance(delta, list):
+        return apply_patch(baseline, delta)
+    if isinstance(delta, dict) and delta.get('format') == DELTA_FORMAT:
+        return apply_compact_delta(baseline, delta)
+    raise ValueError("Not a JSON Patch or a suite delta")
+
+
+def delta_path(suite_path, delta_format='compact'):
+    """差异文件写在套件旁：generated_json_<时间>.delta.json 或 .patch.json，套件压缩时同样压缩"""
+    name = suite_path
+    for suffix in ('.gz', '.json', '.compact'):
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+    extension = ".delta.json" if delta_format == 'compact' else ".patch.json"
+    return name + extension + (".gz" if suite_path.endswith('.gz') else "")
+
+
+def save_delta(path, delta):
+    with open_suite_output(path) as file:
+        json.dump(delta, file, ensure_ascii=False)
+
+
+def write_suite_delta(baseline, target, output_path, delta_format='compact', baseline_path=None):
+    """比较 baseline 和 target，把差异写到 output_path，返回 diff_suites 的分类结果"""
+    if delta_format == 'compact':
+        delta = compact_delta(baseline, target, os.path.basename(baseline_path) if baseline_path else None)
+        summary = delta['summary']
+    else:
+        delta = json_patch(baseline, target)
+        summary = {key: len(value) if isinstance(value, list) else value
+                   for key, value in diff_suites(baseline, target).items()}
+    save_delta(output_path, delta)
+    logging.info(f"Delta against {baseline_path or 'baseline'}: {summary['added']} added, {summary['removed']} removed, "
+                 f"{summary['modified']} modified, {summary['unchanged']} unchanged, saved to {output_path}")
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="计算两个生成套件之间按 case_code 的差异，或由基准套件和差异重建完整套件")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    diff_parser = subparsers.add_parser('diff', help="比较基准套件和新套件并写出差异")
+    diff_parser.add_argument('baseline')
+    diff_parser.add_argument('target')
+    diff_parser.add_argument('--format', choices=DELTA_FORMATS, default='compact',
+                             help="compact 为逐用例差异（默认），patch 为 RFC 6902 JSON Patch")
+    diff_parser.add_argument('--output', default=None, help="默认写在新套件旁的 *.delta.json / *.patch.json")
+    apply_parser = subparsers.add_parser('apply', help="依次应用一个或多个差异，输出与 BenchICT_Config.py 相同格式的完整 JSON")
+    apply_parser.add_argument('baseline')
+    apply_parser.add_argument('deltas', nargs='+', metavar='delta')
+    apply_parser.add_argument('output')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    if args.command == 'diff':
+        output_path = args.output or delta_path(args.target, args.format)
+        write_suite_delta(read_suite(args.baseline)[0], read_suite(args.target)[0], output_path, args.format, args.baseline)
+    else:
+        suite = read_suite(args.baseline)[0]
+        for path in args.deltas:
+            suite = apply_delta(suite, read_json(path))
+        save_suite(args.output, suite)
+        print(f"Saved {len(suite['test_suite_info']['test_case_infos'])} cases to {args.output}")
@@ -0,0 +1,162 @@
+import re
+import json
+
+# 扫描时只关心字符串和结构字符，数字、true / false / null 和空白原样跳过；
+# 单独的 '"' 表示字符串在缓冲区末尾被截断，需要读入更多数据
+TOKEN_PATTERN = re.compile(rb'"(?:[^"\\]|\\.)*"|[\[\]{},:]|"')
+# 取得 case_code 后跳过用例的其余部分：一次匹配括号之间的全部内容（包括字符串），只逐个处理括号
+SKIP_PATTERN = re.compile(rb'(?:[^"\[\]{}]+|"(?:[^"\\]|\\.)*")*')
+CHUNK_SIZE = 1 << 20
+CASE_CODE_KEY = b'"case_code"'
+
+
+def _skip(buffer, position, depth):
+    """从 position 跳过用例中的内容，直到嵌套深度回到 0、缓冲区结束或遇到被截断的字符串，返回 (位置, 深度)"""
+    end = len(buffer)
+    while True:
+        position = SKIP_PATTERN.match(buffer, position).end()
+        if position >= end or buffer[position] == 0x22:
+            return position, depth
+        if buffer[position] in b'{[':
+            depth += 1
+        else:
+            depth -= 1
+        position += 1
+        if depth == 0:
+            return position, depth
+
+
+def iter_suite_parts(file, chunk_size=CHUNK_SIZE):
+    """增量扫描套件 JSON（二进制文件对象），依次产出 ('raw', 字节) 和 ('case', 字节, case_code, 缩进)
+
+    'case' 为 test_suite_info.test_case_infos 中的一个元素的原始字节，case_code 从元素顶层的键中取出，
+    不解码元素的其他部分；缩进为元素前一行的缩进（元素不在行首时为 None）。
+    其余字节作为 'raw' 原样产出，全部拼接后与输入完全相同。
+    内存占用为一个读取块加上最大的单个用例，与文件大小无关。
+    """
+    buffer = b''
+    position = 0
+    emitted = 0
+    # 对象的帧为 [当前键, 是否等待键]，数组的帧为 None
+    stack = []
+    in_cases = False
+    found = False
+    # 当前用例元素的起始位置、缩进、嵌套深度、顶层键的状态，以及上一个 '[' 或 ',' 的结束位置
+    case_start = None
+    indent = None
+    depth = 0
+    expect_key = False
+    key = None
+    case_code = None
+    separator_end = 0
+
+    while True:
+        chunk = file.read(chunk_size)
+        buffer += chunk
+        while True:
+            if case_start is not None and case_code is not None:
+                position, depth = _skip(buffer, position, depth)
+                if depth:
+                    break
+                yield 'raw', buffer[emitted:case_start]
+                yield 'case', buffer[case_start:position], case_code, indent
+                emitted = position
+                case_start = None
+                continue
+
+            match = TOKEN_PATTERN.search(buffer, position)
+            if match is None:
+                position = len(buffer)
+                break
+            token = match.group()
+            if token == b'"':
+                position = match.start()
+                break
+            position = match.end()
+
+            if case_start is not None:
+                if token in (b'{', b'['):
+                    depth += 1
+                elif token in (b'}', b']'):
+                    depth -= 1
+                    if depth == 0:
+                        # 没有 case_code 的元素
+                        yield 'raw', buffer[emitted:case_start]
+                        yield 'case', buffer[case_start:position], None, indent
+                        emitted = position
+                        case_start = None
+                elif depth == 1:
+                    if token == b',':
+                        expect_key = True
+                    elif token[0] == 0x22:
+                        if expect_key:
+                            key = token
+                            expect_key = False
+                        elif key == CASE_CODE_KEY:
+                            case_code = json.loads(token)
+                continue
+
+            if in_cases and token != b']':
+                if token == b'{':
+                    case_start = match.start()
+                    whitespace = buffer[separator_end:case_start]
+                    indent = len(whitespace) - whitespace.rindex(b'\n') - 1 if b'\n' in whitespace else None
+                    depth = 1
+                    expect_key = True
+                    key = case_code = None
+                elif token == b',':
+                    separator_end = match.end()
+                else:
+                    raise ValueError("Elements of test_case_infos must be objects")
+                continue
+
+            if token == b'{':
+                stack.append([None, True])
+            elif token == b'[':
+                if (len(stack) == 2 and stack[0] and stack[1] and stack[0][0] == 'test_suite_info'
+                        and stack[1][0] == 'test_case_infos'):
+                    in_cases = found = True
+                    separator_end = match.end()
+                stack.append(None)
+            elif token in (b'}', b']'):
+                stack.pop()
+                in_cases = False
+            elif token == b',':
+                if stack and stack[-1]:
+                    stack[-1][1] = True
+            elif token[0] == 0x22 and stack and stack[-1] and stack[-1][1]:
+                stack[-1][0] = json.loads(token)
+                stack[-1][1] = False
+
+        if not chunk:
+            break
+        # 当前用例之前的字节都已确定，产出后从缓冲区中丢弃；用例之间保留分隔符后的空白，用于确定下一个用例的缩进
+        if case_start is not None:
+            keep = case_start
+        elif in_cases:
+            keep = min(position, separator_end)
+        else:
+            keep = position
+        if keep > emitted:
+            yield 'raw', buffer[emitted:keep]
+            emitted = keep
+        buffer = buffer[emitted:]
+        position -= emitted
+        separator_end = max(separator_end - emitted, 0)
+        if case_start is not None:
+            case_start -= emitted
+        emitted = 0
+
+    if position < len(buffer) or case_start is not None or stack:
+        raise ValueError("Unexpected end of the suite file")
+    if not found:
+        raise ValueError("test_suite_info.test_case_infos not found, only full-format suite files can be edited in streaming mode")
+    if emitted < len(buffer):
+        yield 'raw', buffer[emitted:]
+
+
+def dumps_case(test_case_info, indent=None):
+    """按元素原来的缩进序列化用例：indent 不为 None 时与 json.dump(..., indent=2) 写出的嵌套元素逐字节一致"""
+    if indent is None:
+        return json.dumps(test_case_info, ensure_ascii=False)
+    return json.dumps(test_case_info, indent=2, ensure_ascii=False).replace('\n', '\n' + ' ' * indent)
@@ -0,0 +1,75 @@
+import io
+import gzip
+import json
+from contextlib import contextmanager
+from file_utils import atomic_write
+
+
+@contextmanager
+def open_suite_output(path):
+    """以 atomic_write 写入文本，路径以 .gz 结尾时使用 gzip 压缩（mtime 固定为 0，相同内容得到相同的文件）"""
+    if not path.endswith('.gz'):
+        with atomic_write(path, encoding='utf-8') as file:
+            yield file
+        return
+    with atomic_write(path, 'wb') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) as compressed:
+            with io.TextIOWrapper(compressed, encoding='utf-8') as file:
+                yield file
+
+
+class StreamingSuiteWriter:
+    """逐个写出 test_case_info 的测试套件 JSON 写入器
+
+    输出与 json.dump(output_json, file, indent=2) 逐字节一致，但每个用例生成后立即写盘，
+    内存占用与用例总数无关，路径以 .gz 结尾时输出 gzip 压缩文件。内容先写入临时文件，close() 时再 rename 到目标路径；
+    中途出错时调用 abort()（或在 with 语句中抛出异常）丢弃临时文件。
+    """
+
+    _MARKER = "__BENCHICT_TEST_CASE_INFOS__"
+
+    def __init__(self, output_path, suite_header, indent=2, ensure_ascii=True):
+        self.output_path = output_path
+        self.indent = indent
+        self.ensure_ascii = ensure_ascii
+        self.case_count = 0
+
+        # 用占位字符串代替 test_case_infos 序列化整个套件，再从占位处切分出头部和尾部
+        header = dict(suite_header)
+        header['test_suite_info'] = dict(header['test_suite_info'])
+        header['test_suite_info']['test_case_infos'] = self._MARKER
+        text = json.dumps(header, indent=indent, ensure_ascii=ensure_ascii)
+        self._prefix, self._suffix = text.split(json.dumps(self._MARKER), 1)
+        marker_line = self._prefix[self._prefix.rfind('\n') + 1:]
+        self._list_indent = marker_line[:len(marker_line) - len(marker_line.lstrip(' '))]
+        self._item_indent = self._list_indent + ' ' * indent
+
+        self._context = open_suite_output(output_path)
+        self._file = self._context.__enter__()
+        self._file.write(self._prefix + '[')
+
+    def write_case(self, test_case_info):
+        text = json.dumps(test_case_info, indent=self.indent, ensure_ascii=self.ensure_ascii)
+        separator = ',\n' if self.case_count else '\n'
+        self._file.write(separator + self._item_indent + text.replace('\n', '\n' + self._item_indent))
+        self.case_count += 1
+
+    def close(self):
+        if self.case_count:
+            self._file.write('\n' + self._list_indent)
+        self._file.write(']' + self._suffix)
+        self._context.__exit__(None, None, None)
+
+    def abort(self):
+        error = RuntimeError(f"Aborted writing {self.output_path}")
+        self._context.__exit__(RuntimeError, error, None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
@@ -0,0 +1,246 @@
+import json
+import os
+import argparse
+from collections import defaultdict
+from compact_suite import load_suite
+from file_utils import atomic_write
+
+# 索引文件格式变化时递增
+INDEX_VERSION = 1
+KINDS = ('input', 'output', 'remap')
+
+
+def _bits(value):
+    """依次返回整数中为 1 的位的下标"""
+    while value:
+        low = value & -value
+        yield low.bit_length() - 1
+        value ^= low
+
+
+def _bitset(positions):
+    """由位下标一次构造整数位图；逐位 |= 每次都要复制整个整数，位图很大时代价与位数成正比"""
+    if not positions:
+        return 0
+    buffer = bytearray((max(positions) >> 3) + 1)
+    for position in positions:
+        buffer[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(buffer, 'little')
+
+
+def _popcount(value):
+    return bin(value).count('1')
+
+
+def _case_topics(case):
+    simulator = case["config"]["function_simulator"]
+    remaps = case["config"].get("topic_remaps") or []
+    return {
+        "input": simulator.get("input_topic_list") or [],
+        "output": simulator.get("output_topic_list") or [],
+        "remap": [remap["from"] for remap in remaps]
+    }
+
+
+def case_has_topic(case, topic, kind='any'):
+    """单个用例是否在 kind（input / output / remap / any）中使用 topic，与 TopicIndex 的查询结果一致"""
+    topics = _case_topics(case)
+    return any(topic in topics[name] for name in (KINDS if kind == 'any' else (kind,)))
+
+
+class TopicIndex:
+    """生成的测试套件的 topic 倒排索引
+
+    每个 topic 字符串映射为整数 ID；每个用例按 input / output / remap（topic_remaps 的 from）
+    各保存一个以 topic ID 为位的整数位图，每个 topic 也各保存一个以用例下标为位的位图。
+    查询只做位运算，不需要重新扫描 JSON。
+    """
+
+    def __init__(self):
+        self.topics = []
+        self.topic_ids = {}
+        self.case_codes = []
+        # case_sets[kind][用例下标] -> topic 位图
+        self.case_sets = {kind: [] for kind in KINDS}
+        # postings[kind][topic ID] -> 用例位图
+        self.postings = {kind: {} for kind in KINDS}
+
+    @classmethod
+    def from_suite(cls, json_data):
+        index = cls()
+        index._add_cases((case["case_code"], {kind: [index.intern(topic) for topic in topics]
+                                              for kind, topics in _case_topics(case).items()})
+                         for case in json_data["test_suite_info"]["test_case_infos"])
+        return index
+
+    @classmethod
+    def for_suite_file(cls, suite_path, index_path=None):
+        """读取套件文件旁的索引缓存（<suite>.topic_index.json），套件文件变化后自动重建"""
+        index_path = index_path or f"{suite_path}.topic_index.json"
+        st = os.stat(suite_path)
+        stamp = [st.st_size, st.st_mtime_ns]
+        if os.path.exists(index_path):
+            try:
+                with open(index_path, 'r') as file:
+                    data = json.load(file)
+                if data.get('version') == INDEX_VERSION and data.get('suite') == stamp:
+                    return cls.from_dict(data)
+            except (OSError, ValueError, KeyError):
+                pass
+        index = cls.from_suite(load_suite(suite_path))
+        data = index.to_dict()
+        data['suite'] = stamp
+        with atomic_write(index_path) as file:
+            json.dump(data, file, separators=(',', ':'))
+        return index
+
+    def to_dict(self):
+        # 位图保存为有序的整数数组，便于阅读也足够紧凑
+        return {
+            "version": INDEX_VERSION,
+            "topics": self.topics,
+            "case_codes": self.case_codes,
+            "cases": {kind: [list(_bits(bitset)) for bitset in self.case_sets[kind]] for kind in KINDS}
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        index = cls()
+        index.topics = list(data['topics'])
+        index.topic_ids = {topic: topic_id for topic_id, topic in enumerate(index.topics)}
+        index._add_cases((case_code, {kind: data['cases'][kind][position] for kind in KINDS})
+                         for position, case_code in enumerate(data['case_codes']))
+        return index
+
+    def _add_cases(self, cases):
+        """批量追加 (case_code, {kind: [topic ID]})：先收集每个 topic 的用例下标，
+        最后每个 topic 的用例位图只构造一次，建立索引的时间与用例数成线性关系
+        """
+        positions = {kind: defaultdict(list) for kind in KINDS}
+        for position, (case_code, topic_ids) in enumerate(cases, len(self.case_codes)):
+            self.case_codes.append(case_code)
+            for kind in KINDS:
+                self.case_sets[kind].append(_bitset(topic_ids[kind]))
+                kind_positions = positions[kind]
+                for topic_id in topic_ids[kind]:
+                    kind_positions[topic_id].append(position)
+        for kind in KINDS:
+            postings = self.postings[kind]
+            for topic_id, case_positions in positions[kind].items():
+                postings[topic_id] = postings.get(topic_id, 0) | _bitset(case_positions)
+
+    def intern(self, topic):
+        topic_id = self.topic_ids.get(topic)
+        if topic_id is None:
+            topic_id = len(self.topics)
+            self.topic_ids[topic] = topic_id
+            self.topics.append(topic)
+        return topic_id
+
+    def add_case(self, case_code, input=(), output=(), remap=()):
+        position = len(self.case_codes)
+        self.case_codes.append(case_code)
+        for kind, topics in (("input", input), ("output", output), ("remap", remap)):
+            self.case_sets[kind].append(0)
+            for topic in topics:
+                self.add_topic(position, kind, topic)
+        return position
+
+    def add_topic(self, position, kind, topic):
+        topic_id = self.intern(topic)
+        self.case_sets[kind][position] |= 1 << topic_id
+        self.postings[kind][topic_id] = self.postings[kind].get(topic_id, 0) | (1 << position)
+
+    def remove_topic(self, position, kind, topic):
+        topic_id = self.topic_ids.get(topic)
+        if topic_id is None:
+            return
+        self.case_sets[kind][position] &= ~(1 << topic_id)
+        self.postings[kind][topic_id] = self.postings[kind].get(topic_id, 0) & ~(1 << position)
+
+    def _posting(self, topic, kind):
+        topic_id = self.topic_ids.get(topic)
+        if topic_id is None:
+            return 0
+        kinds = KINDS if kind == 'any' else (kind,)
+        bitset = 0
+        for name in kinds:
+            bitset |= self.postings[name].get(topic_id, 0)
+        return bitset
+
+    def positions_with_topic(self, topic, kind='any'):
+        return list(_bits(self._posting(topic, kind)))
+
+    def cases_with_topic(self, topic, kind='any'):
+        return [self.case_codes[position] for position in self.positions_with_topic(topic, kind)]
+
+    def topic_frequency(self, kind='any'):
+        """返回 [(topic, 使用该 topic 的用例数)]，按用例数从多到少排序"""
+        counts = []
+        for topic_id, topic in enumerate(self.topics):
+            count = _popcount(self._posting(topic, kind))
+            if count:
+                counts.append((topic, count))
+        counts.sort(key=lambda item: (-item[1], item[0]))
+        return counts
+
+    def conflicts(self):
+        """检查整个套件中的 topic 冲突
+
+        input_output: 同一用例中既在 input 又在 output 列表中的 topic；
+        forwarded_outputs: 某个用例输出、同时被另一个用例 forward（remap）的 topic。
+        """
+        input_output = []
+        for position, case_code in enumerate(self.case_codes):
+            overlap = self.case_sets["input"][position] & self.case_sets["output"][position]
+            if overlap:
+                input_output.append({"case_code": case_code,
+                                     "topics": [self.topics[topic_id] for topic_id in _bits(overlap)]})
+        forwarded_outputs = []
+        for topic_id, producers in self.postings["output"].items():
+            forwarders = self.postings["remap"].get(topic_id, 0)
+            if producers and forwarders and _popcount(producers | forwarders) > 1:
+                forwarded_outputs.append({
+                    "topic": self.topics[topic_id],
+                    "output_cases": [self.case_codes[position] for position in _bits(producers)],
+                    "forwarding_cases": [self.case_codes[position] for position in _bits(forwarders)]
+                })
+        forwarded_outputs.sort(key=lambda item: item["topic"])
+        return {"input_output": input_output, "forwarded_outputs": forwarded_outputs}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="查询生成的测试套件中 topic 与用例的对应关系")
+    parser.add_argument('suite', help="生成的测试套件 JSON 文件")
+    parser.add_argument('--json', action='store_true', help="以 JSON 格式输出结果")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    cases_parser = subparsers.add_parser('cases', help="列出使用指定 topic 的用例")
+    cases_parser.add_argument('topic')
+    cases_parser.add_argument('--kind', choices=KINDS + ('any',), default='any')
+    freq_parser = subparsers.add_parser('freq', help="统计每个 topic 被多少个用例使用")
+    freq_parser.add_argument('--kind', choices=KINDS + ('any',), default='any')
+    freq_parser.add_argument('--top', type=int, default=0, help="只输出前 N 个，0 表示全部")
+    subparsers.add_parser('conflicts', help="检查 input / output 冲突以及被其他用例 forward 的输出 topic")
+    args = parser.parse_args()
+
+    index = TopicIndex.for_suite_file(args.suite)
+    if args.command == 'cases':
+        result = index.cases_with_topic(args.topic, args.kind)
+        lines = result
+    elif args.command == 'freq':
+        result = index.topic_frequency(args.kind)
+        if args.top:
+            result = result[:args.top]
+        lines = [f"{count}\t{topic}" for topic, count in result]
+    else:
+        result = index.conflicts()
+        lines = [f"{item['case_code']}: {', '.join(item['topics'])} in both input and output"
+                 for item in result["input_output"]]
+        lines += [f"{item['topic']}: output by {', '.join(item['output_cases'])}; "
+                  f"forwarded by {', '.join(item['forwarding_cases'])}"
+                  for item in result["forwarded_outputs"]]
+    if args.json:
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+    else:
+        for line in lines:
+            print(line)
@@ -1,20 +1,45 @@
 import os
+import re
 import sys
 import json
+import shutil
+import asyncio
+import argparse
 import subprocess
 from datetime import datetime
 import logging
+import time
+from instrumentation import Metrics, add_arguments as add_metrics_arguments
+from log_setup import log_file_path, setup_logging, add_arguments as add_log_arguments
 
-# 配置信息
-MFF_REPO = "/mnt/data/mff"
-MFF_BRANCH = "BYUNS/rc/main"
-FUNCTION_SPEC_REPO = "/mnt/data/function_spec"
-FUNCTION_SPEC_BRANCH = "mff_hmi_main_check"
-SOURCE_PATH = os.path.join(MFF_REPO, "hmi_function_test/adaptor/aion_a02")
-DEST_PATH = os.path.join(FUNCTION_SPEC_REPO, "BYUNS")
+# 默认配置，可以在配置文件的 repo_sync 部分覆盖
+# source_path 相对于 mff 仓库，dest_path 相对于 function_spec 仓库；
+# *_url 用于仓库不存在时自动克隆，depth 为克隆深度（0 表示完整历史）
+DEFAULT_REPO_SYNC = {
+    "mff_repo": "/mnt/data/mff",
+    "mff_url": "",
+    "mff_branch": "BYUNS/rc/main",
+    "function_spec_repo": "/mnt/data/function_spec",
+    "function_spec_url": "",
+    "function_spec_branch": "mff_hmi_main_check",
+    "source_path": "hmi_function_test/adaptor/aion_a02",
+    "dest_path": "BYUNS",
+    "depth": 50
+}
+# 浅克隆中找不到上次同步的提交时，最多加深历史的次数
+MAX_DEEPEN_STEPS = 10
+# 提交信息中记录本次同步对应的 mff 提交，下次同步时只处理两次提交之间的差异
+SYNC_TRAILER = "Mff-Commit"
+# 单条 git 命令中传入的路径个数上限，避免超出命令行长度限制
+PATH_BATCH_SIZE = 500
+# 单条命令的默认超时时间（秒），0 表示不限制
+COMMAND_TIMEOUT = 600
+# 逐行读取命令输出时单行的长度上限
+STREAM_LINE_LIMIT = 1024 * 1024
 
 class RepoSynchronizer:
-    def __init__(self, config_path='../config/test_case_template.json'):
+    def __init__(self, config_path='../config/test_case_template.json', full_sync=False, timeout=COMMAND_TIMEOUT,
+                 metrics=None, log_format='text'):
         self.script_dir = os.path.dirname(os.path.abspath(__file__))
         self.bench_ict_dir = os.path.dirname(self.script_dir)
         self.parent_dir = os.path.dirname(self.bench_ict_dir)
@@ -38,66 +63,296 @@ class RepoSynchronizer:
                 self.paths[key] = os.path.normpath(os.path.join(self.bench_ict_dir, path))
 
         self.TIMESTAMP = datetime.now().strftime("%Y%m%d_%H%M%S")
-        self.LOG_FILE = os.path.join(self.paths['LOG_DIR'], f"RepoSync_{self.TIMESTAMP}.log")
+        self.log_format = log_format
+        self.LOG_FILE = log_file_path(os.path.join(self.paths['LOG_DIR'], f"RepoSync_{self.TIMESTAMP}.log"), log_format)
         
         self.setup_logging()
 
-        # 使用全局配置
-        self.MFF_REPO = MFF_REPO
-        self.MFF_BRANCH = MFF_BRANCH
-        self.FUNCTION_SPEC_REPO = FUNCTION_SPEC_REPO
-        self.FUNCTION_SPEC_BRANCH = FUNCTION_SPEC_BRANCH
-        self.SOURCE_PATH = SOURCE_PATH
-        self.DEST_PATH = DEST_PATH
+        # 仓库路径、分支和克隆深度来自配置文件的 repo_sync 部分，未设置的项使用默认值
+        repo_sync = dict(DEFAULT_REPO_SYNC, **self.config.get('repo_sync', {}))
+        self.MFF_REPO = repo_sync['mff_repo']
+        self.MFF_URL = repo_sync['mff_url']
+        self.MFF_BRANCH = repo_sync['mff_branch']
+        self.FUNCTION_SPEC_REPO = repo_sync['function_spec_repo']
+        self.FUNCTION_SPEC_URL = repo_sync['function_spec_url']
+        self.FUNCTION_SPEC_BRANCH = repo_sync['function_spec_branch']
+        self.SOURCE_PATH = os.path.normpath(os.path.join(self.MFF_REPO, repo_sync['source_path']))
+        self.DEST_PATH = os.path.normpath(os.path.join(self.FUNCTION_SPEC_REPO, repo_sync['dest_path']))
+        self.depth = int(repo_sync['depth'] or 0)
+
+        # 为 True 时总是使用 rsync 全量同步
+        self.full_sync = full_sync
+        # 本次同步的 mff 提交，以及增量同步时改动过的目标路径（None 表示全量同步）
+        self.mff_head = None
+        self.changed_paths = None
+        self.timeout = timeout or None
+        # 阶段耗时与每条命令的耗时记录，见 instrumentation.py
+        self.metrics = metrics or Metrics('update_from_mff_to_function_spec')
 
     def setup_logging(self):
-        os.makedirs(os.path.dirname(self.LOG_FILE), exist_ok=True)
-        logging.basicConfig(filename=self.LOG_FILE, level=logging.INFO,
-                            format='%(asctime)s - %(levelname)s - %(message)s',
-                            datefmt='%Y-%m-%d %H:%M:%S')
-        console = logging.StreamHandler()
-        console.setLevel(logging.INFO)
-        logging.getLogger('').addHandler(console)
+        # 终端只显示消息本身，日志文件带时间和级别
+        setup_logging(self.LOG_FILE, self.log_format, console=True, console_format='%(message)s',
+                      datefmt='%Y-%m-%d %H:%M:%S')
 
     def log(self, message):
         logging.info(message)
 
-    def run_command(self, command, cwd=None):
+    def run_command(self, command, cwd=None, stream=False, timeout=None, quiet=False):
+        return asyncio.run(self.run_command_async(command, cwd, stream=stream, timeout=timeout, quiet=quiet))
+
+    async def _read_lines(self, reader, lines, label):
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            text = line.decode(errors='replace').rstrip('\r\n')
+            lines.append(text)
+            self.log(f"[{label}] {text}")
+
+    async def run_command_async(self, command, cwd=None, stream=False, timeout=None, quiet=False):
+        """执行命令并返回去掉首尾空白的标准输出
+
+        stream 为 True 时逐行读取标准输出和标准错误并立即写入日志；超过超时时间（默认 self.timeout）
+        或所在任务被取消时终止子进程，超时抛出 subprocess.TimeoutExpired。
+        quiet 为 True 时命令失败不写错误日志，用于预期可能失败的检查命令。
+        """
+        timeout = self.timeout if timeout is None else timeout
+        start = time.perf_counter()
+        process = await asyncio.create_subprocess_exec(*command, cwd=cwd, stdout=asyncio.subprocess.PIPE,
+                                                       stderr=asyncio.subprocess.PIPE, limit=STREAM_LINE_LIMIT)
         try:
-            process = subprocess.Popen(command, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
-            stdout, stderr = process.communicate()
-            if process.returncode != 0:
-                raise subprocess.CalledProcessError(process.returncode, command, stdout, stderr)
-            return stdout.strip()
-        except subprocess.CalledProcessError as e:
-            self.log(f"Error executing command: {e}")
-            self.log(f"Error output: {e.stderr}")
+            if stream:
+                label = os.path.basename(cwd) if cwd else command[0]
+                stdout_lines, stderr_lines = [], []
+                await asyncio.wait_for(asyncio.gather(self._read_lines(process.stdout, stdout_lines, label),
+                                                      self._read_lines(process.stderr, stderr_lines, label),
+                                                      process.wait()), timeout)
+                stdout, stderr = "\n".join(stdout_lines), "\n".join(stderr_lines)
+            else:
+                stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+                stdout, stderr = stdout.decode(errors='replace'), stderr.decode(errors='replace')
+        except asyncio.TimeoutError:
+            await self._kill(process)
+            self.log(f"Error executing command: {command} timed out after {timeout} seconds")
+            raise subprocess.TimeoutExpired(command, timeout)
+        except asyncio.CancelledError:
+            await self._kill(process)
+            self.log(f"Command canceled: {command}")
             raise
+        # 两个仓库的命令并发执行，这里只记录每条命令的耗时，不使用嵌套阶段
+        self.metrics.observe('command', " ".join(command), time.perf_counter() - start)
+        if process.returncode != 0:
+            e = subprocess.CalledProcessError(process.returncode, command, stdout, stderr)
+            if not quiet:
+                self.log(f"Error executing command: {e}")
+                self.log(f"Error output: {e.stderr}")
+            raise e
+        return stdout.strip()
+
+    @staticmethod
+    async def _kill(process):
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+
+    async def clone_repository_async(self, repo_path, branch_name, url, sparse_path):
+        """只克隆一个分支的最近 depth 个提交，不下载文件内容（blobless），工作区只检出 sparse_path"""
+        self.log(f"Cloning {url} (branch: {branch_name}) into {repo_path}")
+        command = ['git', 'clone', '--filter=blob:none', '--no-checkout', '--single-branch', '--branch', branch_name]
+        if self.depth:
+            command += ['--depth', str(self.depth)]
+        await self.run_command_async(command + [url, repo_path], stream=True)
+        await self.run_command_async(['git', 'sparse-checkout', 'set', '--cone', sparse_path], repo_path)
+        await self.run_command_async(['git', 'checkout', branch_name], repo_path, stream=True)
 
-    def update_repository(self, repo_path, branch_name):
+    async def update_sparse_checkout_async(self, repo_path, sparse_path):
+        """已启用 sparse checkout 的仓库确保同步路径在检出范围内，完整检出的仓库保持不变"""
+        enabled = await self.run_command_async(['git', 'config', '--bool', '--default', 'false',
+                                                'core.sparseCheckout'], repo_path)
+        if enabled != 'true':
+            return
+        patterns = (await self.run_command_async(['git', 'sparse-checkout', 'list'], repo_path)).splitlines()
+        if sparse_path not in patterns:
+            await self.run_command_async(['git', 'sparse-checkout', 'add', sparse_path], repo_path)
+
+    async def update_repository_async(self, repo_path, branch_name, url=None, sparse_path=None):
+        if url and not os.path.exists(os.path.join(repo_path, '.git')):
+            await self.clone_repository_async(repo_path, branch_name, url, sparse_path)
+            return
         self.log(f"Updating repository: {repo_path}, branch: {branch_name}")
-        self.run_command(['git', 'checkout', branch_name], repo_path)
-        self.run_command(['git', 'pull'], repo_path)
+        if sparse_path:
+            await self.update_sparse_checkout_async(repo_path, sparse_path)
+        await self.run_command_async(['git', 'checkout', branch_name], repo_path, stream=True)
+        # 浅克隆中 pull 只获取新增的提交，不会补全更早的历史
+        await self.run_command_async(['git', 'pull'], repo_path, stream=True)
+
+    def update_repository(self, repo_path, branch_name, url=None, sparse_path=None):
+        asyncio.run(self.update_repository_async(repo_path, branch_name, url, sparse_path))
+
+    async def _update_repositories(self):
+        tasks = [asyncio.create_task(self.update_repository_async(
+                     self.MFF_REPO, self.MFF_BRANCH, self.MFF_URL,
+                     os.path.relpath(self.SOURCE_PATH, self.MFF_REPO))),
+                 asyncio.create_task(self.update_repository_async(
+                     self.FUNCTION_SPEC_REPO, self.FUNCTION_SPEC_BRANCH, self.FUNCTION_SPEC_URL,
+                     os.path.relpath(self.DEST_PATH, self.FUNCTION_SPEC_REPO)))]
+        # 任意一个仓库更新失败时取消另一个，不必等待它完成
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        for task in tasks:
+            if task in done and task.exception() is not None:
+                raise task.exception()
+
+    def update_repositories(self):
+        """同时更新 mff 和 function_spec 两个仓库"""
+        asyncio.run(self._update_repositories())
+
+    def get_last_synced_commit(self):
+        """从 function_spec 仓库最近一次同步提交的 Mff-Commit 记录中读取上次同步的 mff 提交"""
+        try:
+            message = self.run_command(['git', 'log', '-1', '--format=%B', f'--grep=^{SYNC_TRAILER}: '],
+                                       self.FUNCTION_SPEC_REPO)
+        except subprocess.CalledProcessError:
+            return None
+        matches = re.findall(rf'^{SYNC_TRAILER}: ([0-9a-f]{{7,40}})\s*$', message, re.MULTILINE)
+        if not matches:
+            return None
+        commit = matches[-1]
+        # 上次同步的提交必须在当前 mff 仓库中存在（例如没有被强制推送覆盖）
+        if not self.ensure_commit(self.MFF_REPO, commit):
+            self.log(f"Last synchronized mff commit {commit} is not available in {self.MFF_REPO}")
+            return None
+        return commit
+
+    def has_commit(self, repo_path, commit):
+        try:
+            self.run_command(['git', 'cat-file', '-e', f'{commit}^{{commit}}'], repo_path, quiet=True)
+            return True
+        except subprocess.CalledProcessError:
+            return False
+
+    def ensure_commit(self, repo_path, commit):
+        """浅克隆中缺少 commit 时按 depth 逐步加深历史，直到找到该提交或历史已经完整"""
+        for _ in range(MAX_DEEPEN_STEPS):
+            if self.has_commit(repo_path, commit):
+                return True
+            if self.run_command(['git', 'rev-parse', '--is-shallow-repository'], repo_path) != 'true':
+                return False
+            step = self.depth or DEFAULT_REPO_SYNC['depth']
+            self.log(f"{commit} is not in the shallow history of {repo_path}, fetching {step} more commits")
+            self.run_command(['git', 'fetch', f'--deepen={step}'], repo_path, stream=True)
+        return self.has_commit(repo_path, commit)
+
+    def get_changed_files(self, old_commit, new_commit):
+        """返回 SOURCE_PATH 下两个提交之间的改动 [(状态, 旧路径, 新路径)]，路径相对于 SOURCE_PATH"""
+        source_prefix = os.path.relpath(self.SOURCE_PATH, self.MFF_REPO).replace(os.sep, '/')
+        output = self.run_command(['git', 'diff', '--name-status', '-z', '-M', old_commit, new_commit,
+                                   '--', source_prefix], self.MFF_REPO)
+        tokens = output.split('\0')
+        changes = []
+        index = 0
+        while index < len(tokens) and tokens[index]:
+            status = tokens[index][0]
+            if status in 'RC':
+                old_path, new_path = tokens[index + 1], tokens[index + 2]
+                index += 3
+            else:
+                old_path = new_path = tokens[index + 1]
+                index += 2
+            changes.append((status, self._relative_to_source(old_path, source_prefix),
+                            self._relative_to_source(new_path, source_prefix)))
+        return changes
+
+    @staticmethod
+    def _relative_to_source(path, source_prefix):
+        # 从 SOURCE_PATH 外部重命名进来的文件，旧路径不在同步范围内
+        if path == source_prefix or not path.startswith(source_prefix + '/'):
+            return None
+        return path[len(source_prefix) + 1:]
+
+    def _copy_file(self, relative_path):
+        source = os.path.join(self.SOURCE_PATH, relative_path)
+        dest = os.path.join(self.DEST_PATH, relative_path)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        if os.path.islink(dest):
+            os.remove(dest)
+        shutil.copy2(source, dest, follow_symlinks=False)
+        return dest
+
+    def _remove_file(self, relative_path):
+        dest = os.path.join(self.DEST_PATH, relative_path)
+        if os.path.lexists(dest):
+            os.remove(dest)
+        # 清理删除文件后留下的空目录，与 rsync --delete 的结果保持一致
+        directory = os.path.dirname(dest)
+        while directory != self.DEST_PATH and directory.startswith(self.DEST_PATH + os.sep):
+            try:
+                os.rmdir(directory)
+            except OSError:
+                break
+            directory = os.path.dirname(directory)
+        return dest
+
+    def synchronize_incremental(self, old_commit, new_commit):
+        self.log(f"Incremental synchronization from mff {old_commit} to {new_commit}")
+        changed_paths = []
+        counts = {}
+        for status, old_path, new_path in self.get_changed_files(old_commit, new_commit):
+            counts[status] = counts.get(status, 0) + 1
+            if status == 'D':
+                changed_paths.append(self._remove_file(old_path))
+                continue
+            if status == 'R' and old_path is not None:
+                changed_paths.append(self._remove_file(old_path))
+            if new_path is not None:
+                changed_paths.append(self._copy_file(new_path))
+        self.log("Changed files: " + (", ".join(f"{count} {status}" for status, count in sorted(counts.items())) or "none"))
+        return changed_paths
 
     def synchronize_files(self):
         self.log("Starting to synchronize files...")
-        self.run_command(['rsync', '-av', '--delete', f"{self.SOURCE_PATH}/", self.DEST_PATH])
+        self.mff_head = self.run_command(['git', 'rev-parse', 'HEAD'], self.MFF_REPO)
+        last_commit = None if self.full_sync else self.get_last_synced_commit()
+        if last_commit:
+            self.changed_paths = self.synchronize_incremental(last_commit, self.mff_head)
+        else:
+            self.log("No usable record of the last synchronized mff commit, running a full synchronization")
+            self.run_command(['rsync', '-av', '--delete', f"{self.SOURCE_PATH}/", self.DEST_PATH], stream=True)
+            self.changed_paths = None
         self.log("File synchronization completed")
 
+    def stage_changes(self):
+        if self.changed_paths is None:
+            self.run_command(['git', 'add', self.DEST_PATH], self.FUNCTION_SPEC_REPO)
+            return
+        # 增量同步时只暂存改动过的路径，-A 同时记录删除
+        paths = [os.path.relpath(path, self.FUNCTION_SPEC_REPO) for path in dict.fromkeys(self.changed_paths)]
+        for start in range(0, len(paths), PATH_BATCH_SIZE):
+            self.run_command(['git', 'add', '-A', '--'] + paths[start:start + PATH_BATCH_SIZE], self.FUNCTION_SPEC_REPO)
+
     def commit_changes(self):
         self.log("Committing changes...")
         dest_folder = os.path.basename(self.DEST_PATH)
-        self.run_command(['git', 'add', self.DEST_PATH], self.FUNCTION_SPEC_REPO)
+        self.stage_changes()
         try:
-            self.run_command(['git', 'diff', '--cached', '--quiet'], self.FUNCTION_SPEC_REPO)
+            # 有暂存的改动时 git diff --quiet 以 1 退出，这是正常情况，不写错误日志；其他退出码才是真正的错误
+            self.run_command(['git', 'diff', '--cached', '--quiet'], self.FUNCTION_SPEC_REPO, quiet=True)
             self.log("No changes to commit in the function_spec repository")
-        except subprocess.CalledProcessError:
+        except subprocess.CalledProcessError as e:
+            if e.returncode != 1:
+                self.log(f"Error executing command: {e}")
+                self.log(f"Error output: {e.stderr}")
+                raise
             commit_message = f"Synchronized from the mff repository ({self.MFF_BRANCH}) to {dest_folder} {datetime.now().strftime('%Y-%m-%d')}"
+            if self.mff_head:
+                commit_message += f"\n\n{SYNC_TRAILER}: {self.mff_head}"
             self.run_command(['git', 'commit', '-m', commit_message], self.FUNCTION_SPEC_REPO)
 
     def push_changes(self):
         self.log(f"Pushing changes to {self.FUNCTION_SPEC_BRANCH}...")
-        self.run_command(['git', 'push', 'origin', self.FUNCTION_SPEC_BRANCH], self.FUNCTION_SPEC_REPO)
+        self.run_command(['git', 'push', 'origin', self.FUNCTION_SPEC_BRANCH], self.FUNCTION_SPEC_REPO, stream=True)
 
     def process(self):
         try:
@@ -111,8 +366,10 @@ class RepoSynchronizer:
                 self.log("User canceled the operation because the branches are incorrect")
                 return
 
-            # 检查仓库是否存在
-            for repo in [self.MFF_REPO, self.FUNCTION_SPEC_REPO]:
+            # 检查仓库是否存在，配置了 url 的仓库不存在时在更新时自动克隆
+            for repo, url in [(self.MFF_REPO, self.MFF_URL), (self.FUNCTION_SPEC_REPO, self.FUNCTION_SPEC_URL)]:
+                if url and not os.path.exists(repo):
+                    continue
                 if not os.path.exists(repo):
                     self.log(f"Error: The repository path does not exist: {repo}")
                     return
@@ -120,13 +377,13 @@ class RepoSynchronizer:
                     self.log(f"Error: {repo} is not a valid git repository")
                     return
 
+            # 更新仓库
+            with self.metrics.phase('update_repositories', io=True):
+                self.update_repositories()
+
             # 确保目标文件夹存在
             os.makedirs(self.DEST_PATH, exist_ok=True)
 
-            # 更新仓库
-            self.update_repository(self.MFF_REPO, self.MFF_BRANCH)
-            self.update_repository(self.FUNCTION_SPEC_REPO, self.FUNCTION_SPEC_BRANCH)
-
             # 显示将要同步的路径并请求确认
             print(f"Files will be synchronized from {self.SOURCE_PATH} to {self.DEST_PATH}")
             if not self.get_user_confirmation("Continue?"):
@@ -134,10 +391,14 @@ class RepoSynchronizer:
                 return
 
             # 同步文件
-            self.synchronize_files()
+            with self.metrics.phase('synchronize_files', io=True):
+                self.synchronize_files()
+            if self.changed_paths is not None:
+                self.metrics.count('changed_paths', len(self.changed_paths))
 
             # 提交更改
-            self.commit_changes()
+            with self.metrics.phase('commit_changes', io=True):
+                self.commit_changes()
 
             # 再次确认 push 操作
             print(f"About to push the changes to the {self.FUNCTION_SPEC_BRANCH} branch of the function_spec repository")
@@ -146,7 +407,8 @@ class RepoSynchronizer:
                 return
 
             # 推送更改
-            self.push_changes()
+            with self.metrics.phase('push_changes', io=True):
+                self.push_changes()
 
             self.log(f"Changes have been committed and pushed to the {os.path.basename(self.DEST_PATH)} folder of the function_spec repository (Branch: {self.FUNCTION_SPEC_BRANCH})")
             self.log("Synchronization operation completed")
@@ -164,9 +426,23 @@ class RepoSynchronizer:
             print("Please enter 'y' or 'n'.")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="将 mff 仓库的用例同步到 function_spec 仓库")
+    parser.add_argument('--config', default='../config/test_case_template.json',
+                        help="配置文件路径，相对路径以脚本所在目录为基准")
+    parser.add_argument('--full-sync', action='store_true',
+                        help="忽略上次同步记录，使用 rsync 全量同步")
+    parser.add_argument('--timeout', type=float, default=COMMAND_TIMEOUT,
+                        help=f"单条 git/rsync 命令的超时时间（秒），0 表示不限制，默认 {COMMAND_TIMEOUT}")
+    add_metrics_arguments(parser)
+    add_log_arguments(parser)
+    args = parser.parse_args()
+
     try:
-        synchronizer = RepoSynchronizer()
-        synchronizer.process()
+        metrics = Metrics.from_args(args, 'update_from_mff_to_function_spec')
+        synchronizer = RepoSynchronizer(args.config, full_sync=args.full_sync, timeout=args.timeout, metrics=metrics,
+                                        log_format=args.log_format)
+        with metrics.session(synchronizer.paths['LOG_DIR'], f"RepoSync_{synchronizer.TIMESTAMP}"):
+            synchronizer.process()
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
         sys.exit(1)
\ No newline at end of file
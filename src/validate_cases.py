@@ -0,0 +1,184 @@
+import os
+import json
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from bag_store import TriggerTimeLookup
+from file_utils import atomic_write
+from yaml_header import CASE_KEYS, scan_yaml_header
+
+# 校验报告格式变化时递增
+REPORT_VERSION = 1
+# 读取 YAML、列目录和解析 extend / topic_list 文件都是 I/O，网络存储上用较多的线程
+DEFAULT_WORKERS = 16
+CHECKS = ('yaml_missing', 'yaml_unreadable', 'missing_keys', 'bag_not_registered', 'trigger_time_missing',
+          'extend_missing', 'topic_list_missing', 'input_output_overlap')
+
+
+def list_directories(directories, workers=DEFAULT_WORKERS):
+    """批量检查文件是否存在：每个目录只用 os.scandir 列一次，返回 {目录: 文件名集合}，目录不存在时为空集合"""
+    def scan(directory):
+        try:
+            with os.scandir(directory) as entries:
+                return {entry.name for entry in entries if entry.is_file()}
+        except OSError:
+            return set()
+
+    directories = sorted(set(directories))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return dict(zip(directories, executor.map(scan, directories)))
+
+
+class CaseSetValidator:
+    """一次检查整个用例集，收集全部问题后统一报告，不生成输出
+
+    依次并发读取所有 YAML 的顶层键、按目录批量检查 extend / topic_list 文件是否存在、
+    每个共享文件只解析一次，最后检查 bag 注册表和 topic 重叠。每个问题记录为
+    {case_code, yaml_file, check, severity, message}，error 表示生成时会失败的问题，warning 表示生成时会跳过或按空列表处理。
+    """
+
+    def __init__(self, processor, workers=DEFAULT_WORKERS):
+        self.processor = processor
+        self.paths = processor.paths
+        self.workers = max(1, workers)
+        self.findings = []
+
+    def _add(self, case_code, yaml_file, check, message, severity='error'):
+        self.findings.append({"case_code": case_code, "yaml_file": yaml_file, "check": check,
+                              "severity": severity, "message": message})
+
+    def _read_header(self, yaml_file):
+        try:
+            return scan_yaml_header(yaml_file)[0], None
+        except Exception as e:
+            return None, f"{type(e).__name__}: {e}"
+
+    @staticmethod
+    def _parse(parse, path):
+        try:
+            return parse(path), None
+        except Exception as e:
+            return None, f"{type(e).__name__}: {e}"
+
+    def _parse_files(self, parse, paths):
+        paths = sorted(paths)
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            return dict(zip(paths, executor.map(lambda path: self._parse(parse, path), paths)))
+
+    def validate(self, case_list, bag_info):
+        yaml_files = [os.path.join(self.paths['YAML_DIR'], yaml_file) for yaml_file in dict.fromkeys(case_list)]
+        case_codes = {yaml_file: os.path.splitext(os.path.basename(yaml_file))[0] for yaml_file in yaml_files}
+
+        listing = list_directories((os.path.dirname(path) for path in yaml_files), self.workers)
+        existing = [path for path in yaml_files if os.path.basename(path) in listing[os.path.dirname(path)]]
+        for yaml_file in yaml_files:
+            if os.path.basename(yaml_file) not in listing[os.path.dirname(yaml_file)]:
+                # 与生成时相同，不存在的 YAML 跳过并给出警告
+                self._add(case_codes[yaml_file], yaml_file, 'yaml_missing', f"{yaml_file} does not exist", 'warning')
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            headers = dict(zip(existing, executor.map(self._read_header, existing)))
+
+        cases = []
+        for yaml_file in existing:
+            case_code = case_codes[yaml_file]
+            header, error = headers[yaml_file]
+            if error is not None:
+                self._add(case_code, yaml_file, 'yaml_unreadable', f"Unable to read {yaml_file}: {error}")
+                continue
+            missing = [key for key in CASE_KEYS if not header.get(key)]
+            if missing:
+                self._add(case_code, yaml_file, 'missing_keys', f"Missing required keys: {', '.join(missing)}")
+            cases.append((yaml_file, case_code, header))
+
+        # bag 注册表：使用数据库时一次批量查询全部 md5
+        md5s = {header['bag_md5'] for _, _, header in cases if header.get('bag_md5')}
+        if isinstance(bag_info, TriggerTimeLookup):
+            bag_info.prefetch(md5s)
+        for yaml_file, case_code, header in cases:
+            if not header.get('bag_md5'):
+                continue
+            bag_md5 = header['bag_md5']
+            if bag_md5 not in bag_info:
+                self._add(case_code, yaml_file, 'bag_not_registered', f"bag_md5 {bag_md5} not found in the bag registry")
+            elif bag_info[bag_md5] is None:
+                self._add(case_code, yaml_file, 'trigger_time_missing', f"trigger_time for bag_md5 {bag_md5} is None")
+
+        # extend / topic_list 文件：按目录批量检查存在性，每个文件只解析一次
+        base_path = self.paths['BASE_PATH']
+        references = []
+        for yaml_file, case_code, header in cases:
+            extend_file = os.path.join(base_path, str(header['mfl_extend_path'])) if header.get('mfl_extend_path') else None
+            topic_list_file = os.path.join(base_path, str(header['play_topic_list'])) if header.get('play_topic_list') else None
+            references.append((yaml_file, case_code, extend_file, topic_list_file))
+        files = {path for _, _, extend_file, topic_list_file in references
+                 for path in (extend_file, topic_list_file) if path}
+        listing = list_directories((os.path.dirname(path) for path in files), self.workers)
+        present = {path for path in files if os.path.basename(path) in listing[os.path.dirname(path)]}
+        extend_infos = self._parse_files(self.processor._parse_extend_file,
+                                         {extend_file for _, _, extend_file, _ in references if extend_file in present})
+        topic_lists = self._parse_files(self.processor._parse_topic_list,
+                                        {topic_list_file for _, _, _, topic_list_file in references if topic_list_file in present})
+
+        for yaml_file, case_code, extend_file, topic_list_file in references:
+            extend_info = self._check_file(case_code, yaml_file, 'extend_missing', extend_file, present, extend_infos)
+            input_topics = self._check_file(case_code, yaml_file, 'topic_list_missing', topic_list_file, present, topic_lists)
+            if extend_info is None or input_topics is None:
+                continue
+            # 与生成时相同：play_topic_list 和 forward 的 topic 为输入，send 的 topic 为输出，重叠的 topic 会被从输入中去掉
+            overlap = sorted((set(input_topics) | set(extend_info.forward_topics)) & set(extend_info.output_topics))
+            if overlap:
+                self._add(case_code, yaml_file, 'input_output_overlap',
+                          f"Topics both played/forwarded and sent by the extend file: {', '.join(overlap)}", 'warning')
+
+        # 各项检查分批进行，报告中按 case_list 的顺序列出
+        order = {yaml_file: position for position, yaml_file in enumerate(yaml_files)}
+        self.findings.sort(key=lambda finding: order[finding['yaml_file']])
+        return self.report(len(yaml_files))
+
+    def _check_file(self, case_code, yaml_file, check, path, present, parsed):
+        if path is None:
+            return None
+        if path not in present:
+            # 生成时文件不存在只给出警告并按空列表处理
+            self._add(case_code, yaml_file, check, f"{path} does not exist", 'warning')
+            return None
+        value, error = parsed[path]
+        if error is not None:
+            self._add(case_code, yaml_file, check, f"Unable to parse {path}: {error}")
+        return value
+
+    def report(self, case_count):
+        errors = sum(1 for finding in self.findings if finding['severity'] == 'error')
+        failed_cases = {finding['yaml_file'] for finding in self.findings if finding['severity'] == 'error'}
+        counts = Counter(finding['check'] for finding in self.findings)
+        return {
+            "version": REPORT_VERSION,
+            "case_count": case_count,
+            "failed_cases": len(failed_cases),
+            "errors": errors,
+            "warnings": len(self.findings) - errors,
+            "by_check": {check: counts[check] for check in CHECKS if counts[check]},
+            "findings": self.findings
+        }
+
+
+def format_report(report):
+    """返回报告的文本形式：先按检查项汇总，再逐个列出问题"""
+    lines = [f"Validated {report['case_count']} cases: {report['failed_cases']} cases with errors, "
+             f"{report['errors']} errors, {report['warnings']} warnings"]
+    for check in CHECKS:
+        if check in report['by_check']:
+            lines.append(f"  {check}: {report['by_check'][check]}")
+    for finding in report['findings']:
+        lines.append(f"[{finding['severity'].upper()}] {finding['case_code']} ({finding['check']}): {finding['message']}")
+    return lines
+
+
+def save_report(report, base_path):
+    """保存 <base_path>.json 和文本形式的 <base_path>.txt，返回两个路径"""
+    json_path, text_path = f"{base_path}.json", f"{base_path}.txt"
+    with atomic_write(json_path, encoding='utf-8') as file:
+        json.dump(report, file, indent=2, ensure_ascii=False)
+    with atomic_write(text_path, encoding='utf-8') as file:
+        file.write("\n".join(format_report(report)) + "\n")
+    return json_path, text_path
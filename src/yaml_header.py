@@ -0,0 +1,160 @@
+import re
+import yaml
+
+# 生成配置时需要从用例 YAML 中读取的顶层键
+CASE_KEYS = ('mfl_case_path', 'mfl_extend_path', 'bag_md5', 'play_topic_list')
+# 按源文本读取的键：未加引号的 md5 可能被 YAML 解析为整数（前导 0 按八进制处理）或浮点数，str() 无法还原
+TEXT_KEYS = ('bag_md5',)
+
+# 优先使用 libyaml 的 C 实现，未编译 libyaml 时退回纯 Python 实现
+if hasattr(yaml, 'CSafeLoader'):
+    _FALLBACK_LOADER, _FALLBACK_METHOD = yaml.CSafeLoader, 'libyaml'
+else:
+    _FALLBACK_LOADER, _FALLBACK_METHOD = yaml.SafeLoader, 'python'
+
+_KEY_LINE = re.compile(r'([A-Za-z_][A-Za-z0-9_.\-]*)[ \t]*:(?:[ \t]+(.*))?$')
+_DOUBLE_QUOTED = re.compile(r'"([^"\\]*)"')
+_SINGLE_QUOTED = re.compile(r"'((?:[^']|'')*)'")
+_STR_TAG = 'tag:yaml.org,2002:str'
+_NULL_TAG = 'tag:yaml.org,2002:null'
+_RESOLVER = yaml.resolver.Resolver()
+
+
+class _Unsupported(Exception):
+    """行扫描器无法确定结果，需要交给完整的 YAML 解析器"""
+
+
+class YAMLHeaderError(yaml.YAMLError, ValueError):
+    """TEXT_KEYS 中的键的值不是标量（列表、映射等）"""
+
+
+def _strip_comment(raw):
+    for index, char in enumerate(raw):
+        if char == '#' and (index == 0 or raw[index - 1] in ' \t'):
+            return raw[:index].rstrip()
+    return raw.rstrip()
+
+
+def _scalar_value(raw, text=False):
+    value = _strip_comment(raw)
+    if not value:
+        # 值为空说明是嵌套结构或 null，交给完整解析器
+        raise _Unsupported()
+    first = value[0]
+    if first == '"':
+        match = _DOUBLE_QUOTED.fullmatch(value)
+        if not match:
+            raise _Unsupported()
+        return match.group(1)
+    if first == "'":
+        match = _SINGLE_QUOTED.fullmatch(value)
+        if not match:
+            raise _Unsupported()
+        return match.group(1).replace("''", "'")
+    # 锚点、别名、标签、块标量、流式集合等结构不在扫描器处理范围内
+    if first in '&*!|>[{@`%,' or (first in '-?:' and (len(value) == 1 or value[1] in ' \t')):
+        raise _Unsupported()
+    if ': ' in value or value.endswith(':'):
+        raise _Unsupported()
+    # 数字、布尔值、null 等会被 YAML 解析为非字符串类型，保持与 safe_load 一致；TEXT_KEYS 只有 null 例外
+    tag = _RESOLVER.resolve(yaml.ScalarNode, value, (True, False))
+    if tag != _STR_TAG and (not text or tag == _NULL_TAG):
+        raise _Unsupported()
+    return value
+
+
+def _check_other_value(raw):
+    # 不关心的键只需确认其值不会跨行延续到顶层，否则后续行无法正确识别
+    value = _strip_comment(raw)
+    if not value:
+        return
+    if value[0] == '"' and not re.fullmatch(r'"(?:[^"\\]|\\.)*"', value):
+        raise _Unsupported()
+    if value[0] == "'" and not _SINGLE_QUOTED.fullmatch(value):
+        raise _Unsupported()
+    if value[0] == '[' and not value.endswith(']'):
+        raise _Unsupported()
+    if value[0] == '{' and not value.endswith('}'):
+        raise _Unsupported()
+
+
+def _scan(file, keys):
+    wanted = set(keys)
+    values = {}
+    last_key_wanted = False
+    seen_content = False
+    for line_number, line in enumerate(file):
+        if line_number == 0 and line.startswith('\ufeff'):
+            line = line[1:]
+        line = line.rstrip('\r\n')
+        stripped = line.strip()
+        if not stripped:
+            continue
+        if line[0] in ' \t':
+            # 缩进行属于上一个顶层键的值；若该键是需要读取的键，说明是多行值
+            if last_key_wanted:
+                raise _Unsupported()
+            continue
+        if stripped.startswith('#'):
+            continue
+        if len(values) == len(wanted):
+            # 所有键都已找到，且最后一个值没有延续到下一行
+            break
+        if line.startswith('---'):
+            if seen_content or stripped != '---':
+                raise _Unsupported()
+            continue
+        match = _KEY_LINE.match(line)
+        if not match:
+            raise _Unsupported()
+        seen_content = True
+        key, raw = match.group(1), match.group(2) or ''
+        last_key_wanted = key in wanted
+        if last_key_wanted:
+            if key in values:
+                raise _Unsupported()
+            values[key] = _scalar_value(raw, key in TEXT_KEYS)
+        else:
+            _check_other_value(raw)
+    if len(values) != len(wanted):
+        # 缺少键时用完整解析器确认，避免把扫描器看漏的写法当成缺失
+        raise _Unsupported()
+    return values
+
+
+def _source_texts(yaml_file, document, keys):
+    """返回映射 document 中 keys 对应的标量的源文本，值不是标量时抛出 YAMLHeaderError"""
+    texts = {}
+    if isinstance(document, yaml.MappingNode):
+        for key_node, value_node in document.value:
+            if key_node.value not in keys:
+                continue
+            if not isinstance(value_node, yaml.ScalarNode):
+                raise YAMLHeaderError(f"{key_node.value} in {yaml_file} must be a string, not a {value_node.id}")
+            texts[key_node.value] = value_node.value
+    return texts
+
+
+def scan_yaml_header(yaml_file, keys=CASE_KEYS):
+    """只读取 YAML 文件中指定的顶层标量键
+
+    返回 ({key: value}, method)。method 为 'scan' 表示由行扫描器读取（找齐所有键后立即停止），
+    文件包含锚点、多行标量等扫描器不处理的写法或缺少键时，使用 libyaml（'libyaml'）
+    或纯 Python 解析器（'python'）完整解析。缺少的键对应的值为 None。
+    TEXT_KEYS 中的键（bag_md5）总是返回字符串（按源文本）或 None，生成和检查用例时看到的值相同。
+    """
+    with open(yaml_file, 'r') as file:
+        try:
+            return _scan(file, keys), 'scan'
+        except _Unsupported:
+            pass
+        file.seek(0)
+        data = yaml.load(file, Loader=_FALLBACK_LOADER)
+        if not isinstance(data, dict):
+            data = {}
+        values = {key: data.get(key) for key in keys}
+        converted = [key for key in keys if key in TEXT_KEYS and values[key] is not None and not isinstance(values[key], str)]
+        if converted:
+            file.seek(0)
+            values.update(_source_texts(yaml_file, yaml.compose(file, Loader=_FALLBACK_LOADER), converted))
+    return values, _FALLBACK_METHOD